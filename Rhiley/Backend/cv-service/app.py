@@ -1,9 +1,20 @@
 from flask import Flask, request, jsonify
-import cv2
 import numpy as np
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # Rhiley/Backend, for cvcore
+from cvcore import batch, serving
+from cvcore.cache import InvalidImage, ResultCache
+from cvcore.pipeline import Perception
 
 app = Flask(__name__)
+results = ResultCache.from_env()
+
+def detect_blocks(img):
+    # Contours over 10000 px, nested boxes dropped, top to bottom (cvcore.pipeline)
+    return {'blocks': Perception.of(img).blocks}
 
 @app.route('/detect', methods=['POST'])
 def detect_layout():
@@ -15,45 +26,28 @@ def detect_layout():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
-        # Read image
-        filestr = file.read()
-        nparr = np.frombuffer(filestr, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
+        # Same bytes seen before -> cached blocks, no decode
+        try:
+            return jsonify(results.get_or_compute('cv-detect', file.read(), detect_blocks,
+                                                     decoder=Perception.from_bytes))
+        except InvalidImage:
             return jsonify({'error': 'Invalid image'}), 400
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Edge detection
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # Find contours
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter small contours
-        min_area = 10000  # Minimum area threshold
-        blocks = []
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > min_area:
-                x, y, w, h = cv2.boundingRect(contour)
-                blocks.append({
-                    'x': int(x),
-                    'y': int(y),
-                    'width': int(w),
-                    'height': int(h)
-                })
-        
-        # Sort by Y coordinate (top to bottom)
-        blocks.sort(key=lambda b: b['y'])
-        
-        return jsonify({'blocks': blocks})
-        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(results.stats())
+
+@app.route('/detect/batch', methods=['POST'])
+def detect_batch():
+    # Many images (multipart and/or .zip) -> NDJSON, one line per image as it finishes;
+    # shares cached results with /detect
+    return batch.stream_response(detect_blocks, request, results, 'cv-detect')
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    if '--prod' in sys.argv:
+        serving.serve(app, port=5002, warm=lambda: detect_blocks(np.zeros((64, 64, 3), np.uint8)))
+    else:
+        app.run(host='0.0.0.0', port=5002, debug=True)
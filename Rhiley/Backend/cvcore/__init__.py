@@ -0,0 +1,6 @@
+# Shared OpenCV/NumPy helpers for the Python CV services:
+#   cv-service/app.py                       (/detect,  port 5002)
+#   design-engine/opencv_service.py         (/analyze, /analyze/frames, port 5003)
+#   engine/perception/perception_service.py (/analyze, /perceive, port 5001)
+# All three read stages of cvcore.pipeline.Perception (one decode per screenshot).
+# Each service puts Rhiley/Backend on sys.path and imports from here.
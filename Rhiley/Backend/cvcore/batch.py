@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+from cvcore.pipeline import Perception
+
+# Many images per call, fanned out to one process per core so OpenCV/k-means
+# work is not serialized on the request thread. Results stream back as each
+# image finishes (NDJSON over HTTP), not in upload order.
+#
+# Uploads are listed up front (zips from their directory, nothing inflated) and
+# checked against the limits below, then read one image at a time as the pool
+# takes them: at most WINDOW images are held in memory per batch. Each image is
+# looked up in the service's ResultCache first and stored there once analyzed.
+#
+#   CV_BATCH_MB      whole request, and all images once zips are expanded (default 512)
+#   CV_BATCH_FILES   images per batch (default 500)
+IMAGE_EXT = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff"}
+BATCH_MAX_MB = int(os.environ.get("CV_BATCH_MB", 512))
+BATCH_MAX_FILES = int(os.environ.get("CV_BATCH_FILES", 500))
+WINDOW = 2 * (os.cpu_count() or 1)
+
+class BatchTooLarge(ValueError):
+    pass
+
+_POOL = None
+
+def get_pool():
+    # One pool per service process, created on the first batch
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _POOL
+
+def _analyze_one(fn, name, data):
+    # Runs in a worker: decode + analyze, never raises so one bad file can't sink the batch
+    started = time.perf_counter()
+    try:
+        record = {"name": name, "result": fn(Perception.from_bytes(data))}
+    except Exception as e:
+        record = {"name": name, "error": str(e)}
+    record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+def run(fn, images, pool=None, cache=None, namespace=None):
+    # fn: module-level function taking a decoded cvcore.pipeline.Perception (large
+    # images come reduced) and returning a JSON-able dict
+    # images: iterable of (name, bytes), consumed WINDOW images ahead of the results
+    # cache / namespace: a ResultCache and the namespace the single-image route uses,
+    # so both routes share results. Yields result records as they complete
+    pool = pool or get_pool()
+    images, pending, more = iter(images), {}, True
+    while True:
+        while more and len(pending) < WINDOW:
+            item = next(images, None)
+            if item is None:
+                more = False
+                break
+            name, data = item
+            started = time.perf_counter()
+            key = cache.key(namespace, data) if cache is not None else None
+            hit = cache.lookup(key) if key else None
+            if hit is not None:
+                yield {"name": name, "result": hit, "cached": True,
+                       "ms": round((time.perf_counter() - started) * 1000, 1)}
+                continue
+            pending[pool.submit(_analyze_one, fn, name, data)] = key
+        if not pending:
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            record, key = fut.result(), pending.pop(fut)
+            if key and "result" in record:
+                cache.store(key, record["result"])
+            yield record
+
+def expand(name, data):
+    # A .zip upload contributes every image inside it; anything else is one image
+    if name.lower().endswith(".zip") or data[:4] == b"PK\x03\x04":
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXT:
+                    yield info.filename, zf.read(info)
+    else:
+        yield name, data
+
+def _entries(name, stream):
+    # (name, size, read) per image in one upload; a zip is only listed here
+    head = stream.read(4)
+    stream.seek(0)
+    if name.lower().endswith(".zip") or head == b"PK\x03\x04":
+        zf = zipfile.ZipFile(stream)
+        for info in zf.infolist():
+            if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXT:
+                yield info.filename, info.file_size, partial(zf.read, info)
+    else:
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        yield name, size, partial(_read_all, stream)
+
+def _read_all(stream):
+    stream.seek(0)
+    return stream.read()
+
+def from_request(request, max_files=None, max_mb=None):
+    # Every uploaded file (any field name: image, images, file...), zips expanded:
+    # [(name, read)], where read() returns the image bytes. Raises BatchTooLarge past
+    # max_files images or max_mb of images before anything is read.
+    max_files, max_mb = max_files or BATCH_MAX_FILES, max_mb or BATCH_MAX_MB
+    images, total = [], 0
+    for field in request.files:
+        for f in request.files.getlist(field):
+            for name, size, read in _entries(f.filename or field, f.stream):
+                images.append((name, read))
+                total += size
+                if len(images) > max_files:
+                    raise BatchTooLarge(f"Too many images (max {max_files} per batch)")
+                if total > max_mb * 1024 * 1024:
+                    raise BatchTooLarge(f"Images too large (max {max_mb:g} MB per batch)")
+    return images
+
+def from_path(path):
+    # Python API: a folder of screenshots or a .zip of them
+    path = Path(path)
+    if path.is_dir():
+        for p in sorted(path.iterdir()):
+            if p.suffix.lower() in IMAGE_EXT:
+                yield p.name, p.read_bytes()
+    else:
+        yield from expand(path.name, path.read_bytes())
+
+def keep_uploads(request):
+    # The request closes its uploads when the view returns, before a streamed response
+    # has read them; detach them and return a function that closes them instead
+    from werkzeug.datastructures import MultiDict
+    files, request.files = request.files, MultiDict()
+
+    def close():
+        for field in files:
+            for f in files.getlist(field):
+                f.close()
+    return close
+
+def ndjson(records):
+    # One JSON object per line, then a summary line
+    started, count, failed = time.perf_counter(), 0, 0
+    for record in records:
+        count += 1
+        failed += "error" in record
+        yield json.dumps(record) + "\n"
+    yield json.dumps({"done": True, "count": count, "errors": failed,
+                      "seconds": round(time.perf_counter() - started, 3)}) + "\n"
+
+def stream_response(fn, request, cache=None, namespace=None):
+    # Flask view body for POST .../batch (multipart files and/or a zip). Images are
+    # read while the response streams, see keep_uploads.
+    from flask import Response, jsonify
+    request.max_content_length = BATCH_MAX_MB * 1024 * 1024
+    try:
+        images = from_request(request)
+    except (BatchTooLarge, zipfile.BadZipFile) as e:
+        return jsonify({"error": str(e)}), 413 if isinstance(e, BatchTooLarge) else 400
+    if not images:
+        return jsonify({"error": "No images provided"}), 400
+    close = keep_uploads(request)
+
+    def lines():
+        try:
+            yield from ndjson(run(fn, ((name, read()) for name, read in images), cache=cache, namespace=namespace))
+        finally:
+            close()
+    return Response(lines(), mimetype="application/x-ndjson")
@@ -0,0 +1,158 @@
+import time
+
+import numpy as np
+
+# Layout block post-processing shared by /detect (5002) and /analyze (5003).
+# Blocks are N x 4 int64 arrays of (x, y, width, height) in image pixels; to_dicts
+# turns them into the JSON shape the services return.
+#
+# Containment: "inside an earlier kept block" (the old largest-first loop) is the
+# same as "inside any other block", because a block that was dropped sits inside a
+# kept one and containment is transitive. So each block needs one yes/no query,
+# answered a tile of blocks at a time against the boxes that span the whole tile.
+
+def to_array(blocks):
+    # [{x, y, width, height}, ...] -> N x 4
+    return np.array([[b["x"], b["y"], b["width"], b["height"]] for b in blocks], np.int64).reshape(-1, 4)
+
+def to_dicts(rects):
+    return [{"x": x, "y": y, "width": w, "height": h} for x, y, w, h in np.asarray(rects).tolist()]
+
+def contained(rects, chunk=64, cell=128):
+    # Mask of blocks lying inside another one; of identical copies the first is kept
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    n = len(rects)
+    inside = np.ones(n, bool)
+    if not n:
+        return inside
+    inside[np.unique(rects, axis=0, return_index=True)[1]] = False
+    x1, y1 = rects[:, 0], rects[:, 1]
+    x2, y2 = x1 + rects[:, 2], y1 + rects[:, 3]
+
+    # Possible containers (one per distinct box), sorted by left edge
+    cand = np.flatnonzero(~inside)
+    cand = cand[np.argsort(x1[cand], kind="stable")]
+    cx1, cx2, cy1, cy2 = x1[cand], x2[cand], y1[cand], y2[cand]
+    # Blocks are checked a tile at a time, so the chunk's bounds stay tight
+    order = np.lexsort((x1, y1 // cell, x1 // cell))
+    for start in range(0, n, chunk):
+        idx = order[start:start + chunk]
+        # A container starts left of / above every block it holds and ends past it
+        end = np.searchsorted(cx1, x1[idx].max(), side="right")
+        near = cand[:end][(cx2[:end] >= x2[idx].min()) & (cy1[:end] <= y1[idx].max()) & (cy2[:end] >= y2[idx].min())]
+        rows = idx[:, None]
+        hit = ((x1[near] <= x1[rows]) & (x2[near] >= x2[rows]) &
+               (y1[near] <= y1[rows]) & (y2[near] >= y2[rows]) & (near != rows))
+        inside[idx] |= hit.any(axis=1)
+    return inside
+
+def remove_nested(rects):
+    # Drops blocks inside another block, order of the rest unchanged
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    return rects[~contained(rects)]
+
+def merge_vertical(rects):
+    # Sorted by y, a block overlapping the previous (grown) one by more than 40% of
+    # the smaller height is folded into it. Each step depends on what the previous
+    # merges produced, so this stays one pass, over plain ints.
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    merged = []
+    for x, y, w, h in rects[np.argsort(rects[:, 1], kind="stable")].tolist():
+        if merged:
+            last = merged[-1]
+            bottom = last[1] + last[3]
+            overlap = min(bottom, y + h) - max(last[1], y)
+            if overlap > 0.4 * min(last[3], h):
+                last[1] = min(last[1], y)
+                last[3] = max(bottom, y + h) - last[1]
+                last[2] = max(last[2], w)
+                continue
+        merged.append([x, y, w, h])
+    return np.array(merged, np.int64).reshape(-1, 4)
+
+def detect_blocks(rects, areas, min_area):
+    # /detect: contours with area above min_area, nested boxes dropped, top to bottom
+    rects = remove_nested(np.asarray(rects, np.int64).reshape(-1, 4)[np.asarray(areas) > min_area])
+    return rects[np.argsort(rects[:, 1], kind="stable")]
+
+def layout_blocks(rects, min_area):
+    # Boxes above min_area, largest first, nested ones dropped, then merged vertically
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    area = rects[:, 2] * rects[:, 3]
+    rects = rects[area > min_area]
+    rects = rects[np.argsort(-(rects[:, 2] * rects[:, 3]), kind="stable")]
+    return merge_vertical(remove_nested(rects))
+
+# ------------------------------------------------------------
+# Benchmark: python -m cvcore.blocks [-n 10000]
+# ------------------------------------------------------------
+
+def _legacy_layout(rects, min_area):
+    # The old dict-based analyze_image post-processing, kept only for comparison
+    blocks = [{"x": x, "y": y, "width": w, "height": h}
+              for x, y, w, h in np.asarray(rects).tolist() if w * h > min_area]
+    blocks.sort(key=lambda b: b["width"] * b["height"], reverse=True)
+    inside = lambda a, b: (a["x"] >= b["x"] and a["y"] >= b["y"] and
+                           a["x"] + a["width"] <= b["x"] + b["width"] and
+                           a["y"] + a["height"] <= b["y"] + b["height"])
+    filtered = []
+    for block in blocks:
+        if not any(inside(block, kept) for kept in filtered):
+            filtered.append(block)
+    filtered.sort(key=lambda b: b["y"])
+    merged = []
+    for block in filtered:
+        if merged:
+            last = merged[-1]
+            overlap = min(last["y"] + last["height"], block["y"] + block["height"]) - max(last["y"], block["y"])
+            if overlap > 0.4 * min(last["height"], block["height"]):
+                bottom = max(last["y"] + last["height"], block["y"] + block["height"])
+                last["y"] = min(last["y"], block["y"])
+                last["height"] = bottom - last["y"]
+                last["width"] = max(last["width"], block["width"])
+                continue
+        merged.append(block)
+    return merged
+
+def synthetic(n=10_000, width=1440, height=12_000, seed=0):
+    # Dense UI page: cards holding rows holding widgets, plus duplicates and strays
+    rng = np.random.default_rng(seed)
+    rects = []
+    while len(rects) < n:
+        cw, ch = int(rng.integers(200, 700)), int(rng.integers(120, 600))
+        cx, cy = int(rng.integers(0, width - cw)), int(rng.integers(0, height - ch))
+        rects.append((cx, cy, cw, ch))
+        for _ in range(int(rng.integers(3, 25))):
+            w, h = int(rng.integers(8, cw)), int(rng.integers(8, max(9, ch // 3)))
+            rects.append((cx + int(rng.integers(0, cw - w + 1)), cy + int(rng.integers(0, ch - h + 1)), w, h))
+        if rng.random() < 0.2:
+            rects.append(rects[-1])
+        for _ in range(int(rng.integers(0, 8))):
+            w, h = int(rng.integers(8, 120)), int(rng.integers(8, 60))
+            rects.append((int(rng.integers(0, width - w)), int(rng.integers(0, height - h)), w, h))
+    return np.array(rects[:n], np.int64)
+
+def bench(n=10_000, repeat=3, min_area=0):
+    rects = synthetic(n)
+    timings = {}
+    for name, fn in (("legacy", lambda: _legacy_layout(rects, min_area)),
+                     ("arrays", lambda: to_dicts(layout_blocks(rects, min_area)))):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - started)
+        timings[name] = (best, out)
+    (old, old_out), (new, new_out) = timings["legacy"], timings["arrays"]
+    print(f"{n} boxes -> {len(new_out)} layout blocks")
+    print(f"legacy {old * 1000:.0f} ms  arrays {new * 1000:.0f} ms  ({old / new:.1f}x)  identical: {old_out == new_out}")
+    return old_out == new_out
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Benchmark layout block filtering on synthetic boxes")
+    ap.add_argument("-n", type=int, default=10_000, help="number of boxes (default 10000)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--min-area", type=int, default=0)
+    args = ap.parse_args()
+    bench(args.n, args.repeat, args.min_area)
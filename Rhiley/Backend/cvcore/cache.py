@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Analysis results keyed by what was analyzed, not by request. The key is the
+# SHA-256 of the uploaded bytes, so a repeat upload costs a hash and a lookup. With
+# perceptual keys on, a re-encoded copy (PNG -> JPEG, re-saved screenshot) also
+# hits via a 64-bit dHash plus the image size. Size matters because results carry
+# pixel coordinates.
+#
+# Memory tier: LRU bounded by serialized bytes, per process.
+# Disk tier (optional): one JSON file per key, shared by every worker process.
+#
+#   CV_CACHE_MB          memory tier size (default 64, 0 disables caching)
+#   CV_CACHE_DIR         enable the disk tier in this folder
+#   CV_CACHE_DISK_MB     disk tier size (default 512)
+#   CV_CACHE_PERCEPTUAL  1 to also match re-encoded copies
+
+class InvalidImage(ValueError):
+    pass
+
+def dhash(image, size=8):
+    # Difference hash: brightness gradient of a 9x8 thumbnail, 64 bits
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int("".join("1" if b else "0" for b in bits), 2)
+
+class ResultCache:
+
+    def __init__(self, max_bytes=64 << 20, disk_dir=None, disk_bytes=512 << 20, perceptual=False):
+        self.max_bytes, self.disk_bytes, self.perceptual = max_bytes, disk_bytes, perceptual
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "disk_hits": 0, "perceptual_hits": 0, "misses": 0, "evictions": 0}
+        self.disk = Path(disk_dir) if disk_dir else None
+        if self.disk:
+            self.disk.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_bytes=int(float(os.environ.get("CV_CACHE_MB", 64)) * (1 << 20)),
+            disk_dir=os.environ.get("CV_CACHE_DIR") or None,
+            disk_bytes=int(float(os.environ.get("CV_CACHE_DISK_MB", 512)) * (1 << 20)),
+            perceptual=os.environ.get("CV_CACHE_PERCEPTUAL") == "1",
+        )
+
+    # ---- tiers ----
+
+    def _get(self, key):
+        with self.lock:
+            blob = self.entries.get(key)
+            if blob is not None:
+                self.entries.move_to_end(key)
+                return blob, "hits"
+        if self.disk:
+            try:
+                blob = (self.disk / f"{key}.json").read_bytes()
+            except OSError:
+                return None, None
+            self._put_memory(key, blob)
+            return blob, "disk_hits"
+        return None, None
+
+    def _put_memory(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self.entries[key] = blob
+            self.bytes += len(blob)
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.counts["evictions"] += 1
+
+    def _put_disk(self, key, blob):
+        path = self.disk / f"{key}.json"
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        files = sorted(self.disk.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for p in files:
+            if total <= self.disk_bytes:
+                break
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+
+    def _put(self, key, blob):
+        self._put_memory(key, blob)
+        if self.disk:
+            try:
+                self._put_disk(key, blob)
+            except OSError:
+                pass
+
+    # ---- public ----
+
+    def key(self, namespace, data):
+        return f"{namespace}-{hashlib.sha256(data).hexdigest()}"
+
+    def lookup(self, key):
+        # Cached result for an exact key (see key()), or None. For callers that compute
+        # elsewhere (batch workers), so no decode and no perceptual match here.
+        if not self.max_bytes:
+            return None
+        blob, tier = self._get(key)
+        if blob is None:
+            return None
+        self._count(tier)
+        return json.loads(blob)
+
+    def store(self, key, result):
+        # Result of a lookup() miss, computed elsewhere
+        if not self.max_bytes:
+            return
+        self._count("misses")
+        self._put(key, json.dumps(result, separators=(",", ":")).encode())
+
+    def get_or_compute(self, namespace, data, compute, decoder=None):
+        # namespace: unique per service + endpoint, since the disk tier can be shared
+        # data: uploaded image bytes; compute(decoder(data)) runs only on a miss.
+        # decoder defaults to a full-size BGR decode; it may return an object with
+        # an .image array instead (cvcore.pipeline.Perception.from_bytes).
+        # Raises InvalidImage when the bytes do not decode.
+        decoder = decoder or decode
+        if not self.max_bytes:
+            return compute(decoder(data))
+        exact = self.key(namespace, data)
+        blob, tier = self._get(exact)
+        if blob is not None:
+            self._count(tier)
+            return json.loads(blob)
+
+        decoded = decoder(data)
+        similar = None
+        if self.perceptual:
+            image = getattr(decoded, "image", decoded)
+            h, w = image.shape[:2]
+            w, h = getattr(decoded, "width", w), getattr(decoded, "height", h)  # original size
+            similar = f"{namespace}-p{w}x{h}-{dhash(image):016x}"
+            blob, tier = self._get(similar)
+            if blob is not None:
+                self._count("perceptual_hits")
+                self._put(exact, blob)
+                return json.loads(blob)
+
+        self._count("misses")
+        result = compute(decoded)
+        blob = json.dumps(result, separators=(",", ":")).encode()
+        self._put(exact, blob)
+        if similar:
+            self._put(similar, blob)
+        return result
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = sum(v for k, v in self.counts.items() if k != "evictions")
+            hits = lookups - self.counts["misses"]
+            return dict(self.counts, entries=len(self.entries), bytes=self.bytes,
+                        hit_rate=round(hits / lookups, 3) if lookups else 0.0,
+                        disk=str(self.disk) if self.disk else None, perceptual=self.perceptual)
+
+def decode(data):
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise InvalidImage("Invalid image")
+    return image
@@ -0,0 +1,402 @@
+import json
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from cvcore import batch, blocks as layout
+from cvcore.cache import InvalidImage, decode
+from cvcore.palette import bin_totals, cluster_bins, hex_colors, sample_pixels
+from cvcore.pipeline import DETECT_MIN_AREA, LAYOUT_MIN_SHARE, Perception
+
+# Screen recordings: frames are decoded one at a time and compared with the
+# previous one. Only the changed parts are re-analyzed:
+#
+#   dirty regions  pixels differing by more than DIFF_THRESHOLD in any channel,
+#                  grouped on a CELL grid and grown over every tracked contour box
+#                  they touch (plus MARGIN), so a box is either wholly recomputed
+#                  or wholly kept
+#   blocks         Canny + contours on the dirty crops only; boxes inside a region
+#                  are replaced, /detect blocks and layout blocks are re-derived
+#                  from the box list (cheap, see cvcore.blocks)
+#   colors         the 5-bit color histogram of the every-10th-pixel grid is kept
+#                  as running totals; dirty samples are subtracted and re-added,
+#                  then k-means runs on the occupied bins
+#
+# Output is a timeline: a keyframe with the full state, then per-frame deltas.
+# A full pass runs again when most of the frame changed, the size changed, or
+# every KEYFRAME_EVERY frames (contours that newly join across a region border
+# are only picked up there).
+DIFF_THRESHOLD = 12
+CELL = 16
+MARGIN = 8
+COLOR_STEP = 10
+KEYFRAME_SHARE = 0.5
+KEYFRAME_EVERY = 300
+MAX_FRAMES = int(os.environ.get("CV_MAX_FRAMES", 3600))
+VIDEO_EXT = {".mp4", ".webm", ".mov", ".mkv", ".avi", ".gif", ".m4v"}
+
+def video_frames(path, every=1, max_frames=MAX_FRAMES):
+    # (index, milliseconds, BGR frame), decoded one at a time; skipped frames are only grabbed
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise InvalidImage("Could not read video")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    try:
+        index = yielded = 0
+        while yielded < max_frames:
+            if index % every:
+                if not cap.grab():
+                    break
+            else:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                t = index * 1000 / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC)
+                yield index, t, frame
+                yielded += 1
+            index += 1
+    finally:
+        cap.release()
+
+def image_frames(images, fps=30, every=1, max_frames=MAX_FRAMES):
+    # Frame sequence from (name, bytes) pairs, in name order. The bytes may also be a
+    # reader (batch.from_request), called only for the frames that are kept.
+    kept = sorted(images, key=lambda item: item[0])[::every][:max_frames]
+    for index, (_, data) in enumerate(kept):
+        yield index * every, index * every * 1000 / fps, decode(data() if callable(data) else data)
+
+def _overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def _union(a, b):
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+def _merge(regions):
+    # Union overlapping (x0, y0, x1, y1) regions until they are disjoint
+    out = []
+    for region in regions:
+        region = list(region)
+        merged = True
+        while merged:
+            merged = False
+            for other in out:
+                if _overlap(region, other):
+                    out.remove(other)
+                    region = _union(region, other)
+                    merged = True
+                    break
+        out.append(region)
+    return out
+
+class FrameTracker:
+
+    def __init__(self):
+        self.frame = None
+        self.since_key = 0
+
+    # ---- state ----
+
+    def keyframe(self, frame):
+        perception = Perception(frame)
+        self.frame = frame
+        self.contours = list(perception.contours)
+        self.rects, self.areas = self._measure(self.contours)
+        # Where the tracked contours are: 0 outside, 1 inside a filled contour, 2 outline
+        self.cover = np.zeros(frame.shape[:2], np.uint8)
+        self._draw(self.cover, self.contours)
+        self.samples = sample_pixels(frame, COLOR_STEP).reshape(
+            -(-frame.shape[0] // COLOR_STEP), -(-frame.shape[1] // COLOR_STEP), 3)
+        self.counts, self.sums = bin_totals(self.samples.reshape(-1, 3))
+        self.palette = None
+        self.since_key = 0
+        self._derive()
+
+    @staticmethod
+    def _measure(contours):
+        if not contours:
+            return np.zeros((0, 4), np.int64), np.zeros(0)
+        return (np.array([cv2.boundingRect(c) for c in contours], np.int64),
+                np.array([cv2.contourArea(c) for c in contours]))
+
+    @staticmethod
+    def _draw(cover, contours, offset=(0, 0)):
+        cv2.drawContours(cover, contours, -1, 1, -1, offset=offset)
+        cv2.drawContours(cover, contours, -1, 2, 1, offset=offset)
+
+    def _derive(self):
+        h, w = self.frame.shape[:2]
+        self.blocks = layout.detect_blocks(self.rects, self.areas, DETECT_MIN_AREA)
+        self.layout = layout.layout_blocks(self.rects, w * h * LAYOUT_MIN_SHARE)
+
+    def colors(self, k=5):
+        # Same result as palette.dominant_colors(frame, k, step=COLOR_STEP); k-means
+        # only runs again after the totals changed
+        if self.palette is None:
+            if self.counts.sum() < k:
+                self.palette = ["#000000"] * k
+            else:
+                occupied = np.flatnonzero(self.counts)
+                weights = self.counts[occupied].astype(np.float64)
+                centers, _ = cluster_bins(self.sums[occupied] / weights[:, None], weights, k)
+                self.palette = hex_colors(centers, k)
+        return self.palette
+
+    def state(self):
+        h, w = self.frame.shape[:2]
+        return {"width": w, "height": h, "blocks": layout.to_dicts(self.blocks),
+                "layoutBlocks": layout.to_dicts(self.layout), "dominantColors": self.colors()}
+
+    # ---- incremental update ----
+
+    def dirty(self, frame):
+        # Changed CELL x CELL cells -> (x0, y0, x1, y1) boxes, one per connected group
+        h, w = frame.shape[:2]
+        # Channels side by side (h x 3w): any channel over the threshold counts
+        _, changed = cv2.threshold(cv2.absdiff(frame, self.frame).reshape(h, w * 3),
+                                   DIFF_THRESHOLD, 255, cv2.THRESH_BINARY)
+        if not cv2.countNonZero(changed):
+            return []
+        # Row bands first (contiguous, cheap), then columns only in bands that changed
+        gh, gw = -(-h // CELL), -(-w // CELL)
+        bands = np.maximum.reduceat(changed.max(axis=1), np.arange(0, h, CELL))
+        cells = np.zeros((gh, gw), np.uint8)
+        columns = np.zeros(gw * 3 * CELL, np.uint8)
+        for band in np.flatnonzero(bands):
+            columns[:w * 3] = changed[band * CELL:(band + 1) * CELL].max(axis=0)
+            cells[band] = columns.reshape(gw, 3 * CELL).max(axis=1)
+        contours, _ = cv2.findContours(cells, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        regions = []
+        for c in contours:
+            cx, cy, cw, ch = cv2.boundingRect(c)
+            regions.append([cx * CELL, cy * CELL, min(w, (cx + cw) * CELL), min(h, (cy + ch) * CELL)])
+        return regions
+
+    def _crosses(self, i, region):
+        # Does contour i's outline pass through the region?
+        x0, y0, x1, y1 = region
+        mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        cv2.drawContours(mask, self.contours, i, 1, 1, offset=(-x0, -y0))
+        return cv2.countNonZero(mask) > 0
+
+    def _grow(self, regions):
+        # Each (padded) region takes in every tracked contour whose outline passes
+        # through it, until nothing changes. External contours never nest, so one
+        # that only surrounds or sits beside a region cannot change.
+        x1, y1 = self.rects[:, 0], self.rects[:, 1]
+        x2, y2 = x1 + self.rects[:, 2], y1 + self.rects[:, 3]
+        while True:
+            grown = []
+            for r in regions:
+                near = np.flatnonzero((x1 < r[2]) & (x2 > r[0]) & (y1 < r[3]) & (y2 > r[1]))
+                for i in near:
+                    if not (x1[i] >= r[0] and y1[i] >= r[1] and x2[i] <= r[2] and y2[i] <= r[3]) and self._crosses(i, r):
+                        grown += self._pad([[int(x1[i]), int(y1[i]), int(x2[i]), int(y2[i])]])
+                grown.append(r)
+            grown = sorted(_merge(grown))
+            if grown == sorted(regions):
+                return grown
+            regions = grown
+
+    def hidden(self, region):
+        # Wholly inside filled contours and clear of their outlines: new edges there
+        # can only form holes, which external contours never report
+        x0, y0, x1, y1 = region
+        return self.cover[y0:y1, x0:x1].min() == 1 and self.cover[y0:y1, x0:x1].max() == 1
+
+    def _pad(self, regions):
+        h, w = self.frame.shape[:2]
+        return _merge([[max(0, r[0] - MARGIN), max(0, r[1] - MARGIN), min(w, r[2] + MARGIN), min(h, r[3] + MARGIN)]
+                       for r in regions])
+
+    def _redo(self, frame, region):
+        # Contours of one grown region, from the new frame; boxes wholly inside are replaced
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = region
+        rx1, ry1 = self.rects[:, 0] + self.rects[:, 2], self.rects[:, 1] + self.rects[:, 3]
+        inside = (self.rects[:, 0] >= x0) & (self.rects[:, 1] >= y0) & (rx1 <= x1) & (ry1 <= y1)
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        contours, _ = cv2.findContours(cv2.Canny(gray, 50, 150), cv2.RETR_EXTERNAL,
+                                       cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
+        found = []
+        for c in contours:
+            x, y, cw, ch = cv2.boundingRect(c)
+            # Cut by the crop edge: part of a box outside the region, which is kept
+            if (x == x0 > 0) or (y == y0 > 0) or (x + cw == x1 < w) or (y + ch == y1 < h):
+                continue
+            found.append(c)
+        rects, areas = self._measure(found)
+        self.contours = [c for c, drop in zip(self.contours, inside) if not drop] + found
+        self.rects = np.concatenate([self.rects[~inside], rects])
+        self.areas = np.concatenate([self.areas[~inside], areas])
+
+        # Redraw the cover map here from every contour reaching into the region
+        touching = (self.rects[:, 0] < x1) & (self.rects[:, 0] + self.rects[:, 2] > x0) & \
+                   (self.rects[:, 1] < y1) & (self.rects[:, 1] + self.rects[:, 3] > y0)
+        cover = self.cover[y0:y1, x0:x1]
+        cover[:] = 0
+        self._draw(cover, [self.contours[i] for i in np.flatnonzero(touching)], offset=(-x0, -y0))
+
+    def _recolor(self, frame, region):
+        # Color totals: swap the old samples in this region for the new ones
+        x0, y0, x1, y1 = region
+        sy0, sx0 = -(-y0 // COLOR_STEP), -(-x0 // COLOR_STEP)
+        sy1, sx1 = -(-y1 // COLOR_STEP), -(-x1 // COLOR_STEP)
+        new = frame[sy0 * COLOR_STEP:y1:COLOR_STEP, sx0 * COLOR_STEP:x1:COLOR_STEP, 2::-1]
+        old = self.samples[sy0:sy1, sx0:sx1]
+        if np.array_equal(new, old):
+            return
+        old_counts, old_sums = bin_totals(old.reshape(-1, 3))
+        new_counts, new_sums = bin_totals(new.reshape(-1, 3))
+        self.counts += new_counts - old_counts
+        self.sums += new_sums - old_sums
+        self.samples[sy0:sy1, sx0:sx1] = new
+        self.palette = None
+
+    def update(self, frame):
+        # -> (changed regions as (x0, y0, x1, y1), True if a full pass ran instead)
+        h, w = frame.shape[:2]
+        self.since_key += 1
+        if self.frame is None or frame.shape != self.frame.shape or self.since_key >= KEYFRAME_EVERY:
+            self.keyframe(frame)
+            return [], True
+        regions = self.dirty(frame)
+        if not regions:
+            self.frame = frame
+            return [], False
+        regions = self._pad(regions)
+        visible = [r for r in regions if not self.hidden(r)]
+        grown = self._grow(visible) if visible else []
+        if sum((r[2] - r[0]) * (r[3] - r[1]) for r in grown) > KEYFRAME_SHARE * w * h:
+            self.keyframe(frame)
+            return regions, True
+
+        for region in grown:
+            self._redo(frame, region)
+        changed = _merge(regions + grown)
+        for region in changed:
+            self._recolor(frame, region)
+        self.frame = frame
+        if grown:
+            self._derive()
+        return changed, False
+
+def _delta(before, after):
+    old = {tuple(r) for r in before.tolist()}
+    new = {tuple(r) for r in after.tolist()}
+    delta = {}
+    if new - old:
+        delta["added"] = layout.to_dicts(sorted(new - old, key=lambda r: (r[1], r[0])))
+    if old - new:
+        delta["removed"] = layout.to_dicts(sorted(old - new, key=lambda r: (r[1], r[0])))
+    return delta
+
+def timeline(frames, tracker=None):
+    # frames: (index, ms, BGR frame); yields one record per frame, then a summary
+    tracker = tracker or FrameTracker()
+    started = time.perf_counter()
+    count = keyframes = 0
+    dirty_pixels = total_pixels = 0
+    for index, t, frame in frames:
+        count += 1
+        if tracker.frame is not None:
+            blocks, layout_rects, colors = tracker.blocks, tracker.layout, tracker.colors()
+        regions, full = tracker.update(frame)
+        record = {"frame": index, "t": round(t, 1)}
+        h, w = frame.shape[:2]
+        total_pixels += w * h
+        if full:
+            keyframes += 1
+            dirty_pixels += w * h
+            record["keyframe"] = True
+            record.update(tracker.state())
+        elif regions:
+            dirty_pixels += sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+            record["dirty"] = [{"x": x0, "y": y0, "width": x1 - x0, "height": y1 - y0} for x0, y0, x1, y1 in regions]
+            for key, before, after in (("blocks", blocks, tracker.blocks), ("layoutBlocks", layout_rects, tracker.layout)):
+                delta = _delta(before, after)
+                if delta:
+                    record[key] = delta
+            if tracker.colors() != colors:
+                record["dominantColors"] = tracker.colors()
+        yield record
+    seconds = time.perf_counter() - started
+    yield {"done": True, "frames": count, "keyframes": keyframes,
+           "dirty_share": round(dirty_pixels / total_pixels, 3) if total_pixels else 0.0,
+           "seconds": round(seconds, 3), "fps": round(count / seconds, 1) if seconds else 0.0}
+
+def from_request(request, every=1):
+    # One video file, or images / a .zip of frames. Returns (frames, cleanup)
+    uploads = [f for field in request.files for f in request.files.getlist(field)]
+    videos = [f for f in uploads if Path(f.filename or "").suffix.lower() in VIDEO_EXT]
+    if videos:
+        # VideoCapture needs a file; it is removed once the timeline is done
+        fd, path = tempfile.mkstemp(suffix=Path(videos[0].filename).suffix.lower())
+        with os.fdopen(fd, "wb") as out:
+            videos[0].save(out)
+        return video_frames(path, every), lambda: os.unlink(path)
+    images = batch.from_request(request, max_files=MAX_FRAMES * every)
+    return (image_frames(images, every=every) if images else None), batch.keep_uploads(request)
+
+def stream_response(request):
+    # Flask view body for POST .../frames -> NDJSON timeline
+    from flask import Response, jsonify
+    request.max_content_length = batch.BATCH_MAX_MB * 1024 * 1024
+    try:
+        every = max(1, int(request.form.get("every", 1)))
+    except ValueError:
+        return jsonify({"error": "every must be a whole number"}), 400
+    try:
+        frames, cleanup = from_request(request, every)
+    except batch.BatchTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except zipfile.BadZipFile as e:
+        return jsonify({"error": str(e)}), 400
+    if frames is None:
+        return jsonify({"error": "No video or frames provided"}), 400
+
+    def lines():
+        try:
+            for record in timeline(frames):
+                yield json.dumps(record) + "\n"
+        except InvalidImage as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            cleanup()
+    return Response(lines(), mimetype="application/x-ndjson")
+
+# ------------------------------------------------------------
+# Throughput: python -m cvcore.frames VIDEO [--every N]
+# ------------------------------------------------------------
+
+def bench(path, every=1):
+    started = time.perf_counter()
+    decoded = sum(1 for _ in video_frames(path, every))
+    decode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    records = list(timeline(video_frames(path, every)))
+    incremental_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _, _, frame in video_frames(path, every):
+        Perception(frame).result(("blocks", "layoutBlocks", "dominantColors"))
+    full_s = time.perf_counter() - started
+
+    summary = records[-1]
+    print(f"{decoded} frames, {summary['keyframes']} keyframes, {summary['dirty_share']:.1%} of pixels re-analyzed")
+    for label, seconds in (("decode only", decode_s), ("timeline", incremental_s), ("full per frame", full_s)):
+        print(f"{label:15} {seconds:6.2f}s  {decoded / seconds:7.1f} fps")
+    return records
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Compare the frame timeline with a full analysis per frame")
+    ap.add_argument("video")
+    ap.add_argument("--every", type=int, default=1, help="analyze every Nth frame")
+    args = ap.parse_args()
+    bench(args.video, args.every)
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Colors are quantized to 5 bits per channel (32^3 bins) and k-means runs on the
+# occupied bins weighted by pixel count: a few hundred to a few thousand points
+# instead of every pixel. Each bin keeps the true mean of its pixels, so centers
+# are as exact as clustering the raw samples.
+BITS = 5
+MAX_SAMPLES = 40_000
+SEED = 42
+
+def rgb_to_hex(r, g, b):
+    return "#" + "".join(f"{x:02x}" for x in [r, g, b])
+
+def sample_pixels(image, step=None, max_samples=MAX_SAMPLES):
+    # Strided view of an HxWx3 BGR image -> Nx3 RGB; step defaults to whatever
+    # keeps roughly max_samples pixels
+    h, w = image.shape[:2]
+    if step is None:
+        step = max(1, int(np.ceil(np.sqrt(h * w / max_samples))))
+    return image[::step, ::step, 2::-1].reshape(-1, 3)
+
+def bin_totals(pixels):
+    # -> (pixel count, RGB sum) for every one of the 32^3 bins; running totals can
+    # be updated by adding and subtracting these (cvcore.frames)
+    px = pixels.astype(np.int64)
+    shift = 8 - BITS
+    idx = ((px[:, 0] >> shift) << (2 * BITS)) | ((px[:, 1] >> shift) << BITS) | (px[:, 2] >> shift)
+    counts = np.bincount(idx, minlength=1 << (3 * BITS))
+    sums = np.stack([np.bincount(idx, weights=px[:, c], minlength=counts.size) for c in range(3)], axis=1)
+    return counts, sums
+
+def bin_pixels(pixels):
+    # -> (mean RGB per occupied bin, pixel count per bin)
+    counts, sums = bin_totals(pixels)
+    occupied = np.flatnonzero(counts)
+    weights = counts[occupied].astype(np.float64)
+    return sums[occupied] / weights[:, None], weights
+
+def weighted_kmeans(points, weights, k, iters=30, seed=SEED):
+    # k-means++ seeding from a fixed RandomState, then Lloyd iterations on weighted points
+    rng = np.random.RandomState(seed)
+    centers = [points[np.argmax(weights)]]
+    d2 = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, min(k, len(points))):
+        p = d2 * weights
+        if p.sum() <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=p / p.sum())])
+        d2 = np.minimum(d2, ((points - centers[-1]) ** 2).sum(axis=1))
+    centers = np.array(centers, dtype=np.float64)
+
+    for _ in range(iters):
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        mass = np.bincount(labels, weights=weights, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=weights * points[:, c], minlength=len(centers)) for c in range(3)], axis=1)
+        moved = np.where(mass[:, None] > 0, sums / np.maximum(mass, 1e-12)[:, None], centers)
+        if np.abs(moved - centers).max() < 0.5:
+            centers = moved
+            break
+        centers = moved
+
+    labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    mass = np.bincount(labels, weights=weights, minlength=len(centers))
+    return centers, mass
+
+def cluster_bins(points, weights, k=5):
+    # -> (k x 3 RGB centers, pixel share per center), most common color first
+    centers, mass = weighted_kmeans(points, weights, k)
+    order = np.argsort(-mass, kind="stable")
+    return centers[order], mass[order] / mass.sum()
+
+def palette(image, k=5, step=None, max_samples=MAX_SAMPLES):
+    # -> (k x 3 RGB centers, pixel share per center), most common color first
+    pixels = sample_pixels(image, step, max_samples)
+    if len(pixels) == 0:
+        return np.zeros((0, 3)), np.zeros(0)
+    return cluster_bins(*bin_pixels(pixels), k)
+
+def hex_colors(centers, k=5):
+    colors = [rgb_to_hex(*(int(c) for c in center)) for center in centers]
+    # Fewer distinct colors than k: repeat the last one, as k-means would
+    return colors + colors[-1:] * (k - len(colors))
+
+def dominant_colors(image, k=5, step=10):
+    # Design-engine palette: k hex colors, most common first
+    h, w = image.shape[:2]
+    if ((h + step - 1) // step) * ((w + step - 1) // step) < k:
+        return ["#000000"] * k
+    centers, _ = palette(image, k, step=step)
+    return hex_colors(centers, k)
+
+def dominant_color(region, k=3):
+    # Perception: the center of the largest of k clusters
+    centers, _ = palette(region, k)
+    if len(centers) == 0:
+        return "#000000"
+    return rgb_to_hex(*(int(c) for c in centers[0]))
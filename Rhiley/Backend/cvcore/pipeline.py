@@ -0,0 +1,140 @@
+from functools import cached_property
+
+import cv2
+import numpy as np
+
+from cvcore import blocks as layout, tiling
+from cvcore.palette import dominant_color, dominant_colors
+from cvcore.regions import RegionColors
+
+# One screenshot, decoded once. Every stage is computed on first access and kept,
+# so later stages reuse the arrays of earlier ones:
+#
+#   image -> gray -> edges -> contours -> rects -> blocks        (/detect, 5002)
+#                                              \-> layoutBlocks  (/analyze, 5003)
+#   image -> dominantColors                                      (/analyze, 5003)
+#   image -> structural_colors                                   (/analyze, 5001)
+#   image -> region index -> regions (palette of each layout block)
+#
+# The old endpoints read one or two stages; /perceive returns any subset of STAGES.
+# Large uploads are decoded reduced and tall ones tiled (cvcore.tiling); stages
+# still report sizes and coordinates in original pixels.
+STAGES = ("blocks", "layoutBlocks", "dominantColors", "structural_colors", "regions")
+DEFAULT_STAGES = STAGES[:4]  # the union of the three services' responses
+
+DETECT_MIN_AREA = 10000   # /detect: contour area in pixels
+LAYOUT_MIN_SHARE = 0.05   # /analyze: bounding box area as a share of the image
+
+class Perception:
+
+    def __init__(self, image, scale=1.0, size=None):
+        # image: BGR ndarray, possibly reduced; scale: its pixels per original pixel
+        self.image, self.scale = image, scale
+        self.width, self.height = size or (image.shape[1], image.shape[0])
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(*tiling.decode(data))
+
+    @classmethod
+    def of(cls, image):
+        # Views accept either an ndarray or an already built Perception
+        return image if isinstance(image, cls) else cls(image)
+
+    # ---- shared intermediates ----
+
+    @cached_property
+    def gray(self):
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def edges(self):
+        return cv2.Canny(self.gray, 50, 150)
+
+    @cached_property
+    def contours(self):
+        contours, _ = cv2.findContours(self.edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
+
+    @cached_property
+    def boxes(self):
+        # (N x 4 bounding boxes, N contour areas) in processed pixels
+        if self.image.shape[0] > 2 * tiling.STRIP:
+            return tiling.contour_boxes(self.image)
+        if not self.contours:
+            return np.zeros((0, 4), np.int64), np.zeros(0)
+        return (np.array([cv2.boundingRect(c) for c in self.contours], np.int64),
+                np.array([cv2.contourArea(c) for c in self.contours]))
+
+    @property
+    def rects(self):
+        return self.boxes[0]
+
+    def original(self, rects):
+        return tiling.to_original(rects, self.scale, self.width, self.height)
+
+    @cached_property
+    def region_index(self):
+        # Queried in original pixels
+        return RegionColors(self.image, size=(self.width, self.height))
+
+    # ---- stages ----
+
+    @cached_property
+    def blocks(self):
+        # Contours with area above DETECT_MIN_AREA (original pixels), boxes inside another
+        # dropped, top to bottom
+        rects = layout.detect_blocks(*self.boxes, DETECT_MIN_AREA * self.scale ** 2)
+        return layout.to_dicts(self.original(rects))
+
+    @cached_property
+    def layout_rects(self):
+        # Boxes above 5% of the image, largest first, nested ones dropped, then merged vertically
+        height, width = self.image.shape[:2]
+        return layout.layout_blocks(self.rects, width * height * LAYOUT_MIN_SHARE)
+
+    @cached_property
+    def layout_blocks(self):
+        return layout.to_dicts(self.original(self.layout_rects))
+
+    @cached_property
+    def dominant_colors(self):
+        # Every 10th pixel, binned and clustered (most common color first)
+        return dominant_colors(self.image, 5, step=10)
+
+    @cached_property
+    def structural_colors(self):
+        height, width = self.image.shape[:2]
+        # Top region (likely title area), center region (likely subject)
+        top_region = self.image[0:int(height * 0.25), :]
+        center_region = self.image[int(height * 0.3):int(height * 0.7),
+                                   int(width * 0.3):int(width * 0.7)]
+        return {
+            "background": dominant_color(top_region),
+            "primary_mass": dominant_color(center_region)
+        }
+
+    @cached_property
+    def regions(self):
+        return self.region_index.query(self.layout_blocks)
+
+    # ---- responses ----
+
+    def stage(self, name):
+        if name not in STAGES:
+            raise KeyError(name)
+        return getattr(self, {"layoutBlocks": "layout_blocks", "dominantColors": "dominant_colors"}.get(name, name))
+
+    def result(self, stages=DEFAULT_STAGES):
+        out = {"width": self.width, "height": self.height}
+        for name in stages:
+            out[name] = self.stage(name)
+        return out
+
+def parse_stages(value):
+    # "blocks,dominantColors" -> tuple in STAGES order; empty -> DEFAULT_STAGES
+    names = [s.strip() for s in (value or "").split(",") if s.strip()]
+    unknown = [s for s in names if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    return tuple(s for s in STAGES if s in names) or DEFAULT_STAGES
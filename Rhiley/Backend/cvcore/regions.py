@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+from cvcore.palette import BITS, palette, rgb_to_hex, sample_pixels
+
+# The image is quantized once to a small palette on a downscaled copy, and an
+# integral histogram (one summed-area table per palette index) is built over the
+# label map. The color histogram of any rectangle is then four lookups per index,
+# so a hundred regions cost about the same as one clustering pass.
+PALETTE_SIZE = 16
+MAX_PIXELS = 250_000
+
+class RegionColors:
+
+    def __init__(self, image, k=PALETTE_SIZE, max_pixels=MAX_PIXELS, size=None):
+        # size: (width, height) of the original when image was decoded reduced
+        # (cvcore.tiling); rectangles are then given in original pixels
+        self.height, self.width = image.shape[:2]
+        self.scale = min(1.0, np.sqrt(max_pixels / float(self.width * self.height)))
+        small = image
+        if self.scale < 1.0:
+            small_size = (max(1, int(self.width * self.scale)), max(1, int(self.height * self.scale)))
+            small = cv2.resize(image, small_size, interpolation=cv2.INTER_AREA)
+        self.small_h, self.small_w = small.shape[:2]
+        if size is not None:
+            self.scale *= self.width / float(size[0])
+            self.width, self.height = size
+
+        self.colors, _ = palette(small, k)
+        # Every histogram bin maps to its nearest palette color, so labelling is a table lookup
+        shift = 8 - BITS
+        levels = (np.arange(1 << BITS) << shift) + (1 << shift) // 2
+        r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+        bins = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1).astype(np.float64)
+        lut = ((bins[:, None, :] - self.colors[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+
+        px = sample_pixels(small, step=1).astype(np.int64)
+        idx = ((px[:, 0] >> shift) << (2 * BITS)) | ((px[:, 1] >> shift) << BITS) | (px[:, 2] >> shift)
+        labels = lut[idx].reshape(self.small_h, self.small_w)
+
+        n = len(self.colors)
+        self.integral = np.zeros((n, self.small_h + 1, self.small_w + 1), dtype=np.int32)
+        for i in range(n):
+            self.integral[i, 1:, 1:] = (labels == i).cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+
+    def hex_colors(self):
+        return [rgb_to_hex(*(int(c) for c in color)) for color in self.colors]
+
+    def _small_box(self, rects):
+        # Original-pixel {x, y, width, height} -> clamped, non-empty boxes on the small grid
+        r = np.array([[b["x"], b["y"], b["x"] + b["width"], b["y"] + b["height"]] for b in rects], dtype=np.float64)
+        x0 = np.clip(np.floor(r[:, 0] * self.scale), 0, self.small_w - 1).astype(int)
+        y0 = np.clip(np.floor(r[:, 1] * self.scale), 0, self.small_h - 1).astype(int)
+        x1 = np.clip(np.ceil(r[:, 2] * self.scale), x0 + 1, self.small_w).astype(int)
+        y1 = np.clip(np.ceil(r[:, 3] * self.scale), y0 + 1, self.small_h).astype(int)
+        return x0, y0, x1, y1
+
+    def histograms(self, rects):
+        # -> R x palette pixel counts, all rectangles at once
+        if not rects:
+            return np.zeros((0, len(self.colors)), dtype=np.int64)
+        x0, y0, x1, y1 = self._small_box(rects)
+        ii = self.integral
+        counts = ii[:, y1, x1].astype(np.int64) - ii[:, y0, x1] - ii[:, y1, x0] + ii[:, y0, x0]
+        return counts.T
+
+    def query(self, rects, top=3):
+        results = []
+        for rect, counts in zip(rects, self.histograms(rects)):
+            total = max(int(counts.sum()), 1)
+            order = np.argsort(-counts, kind="stable")[:top]
+            swatches = [{"color": rgb_to_hex(*(int(c) for c in self.colors[i])), "share": round(counts[i] / total, 3)}
+                        for i in order if counts[i] > 0]
+            results.append({
+                "x": int(rect["x"]), "y": int(rect["y"]),
+                "width": int(rect["width"]), "height": int(rect["height"]),
+                "color": swatches[0]["color"] if swatches else "#000000",
+                "palette": swatches,
+            })
+        return results
+
+    def grid(self, rows, cols):
+        xs = np.linspace(0, self.width, cols + 1).astype(int)
+        ys = np.linspace(0, self.height, rows + 1).astype(int)
+        return [{"x": int(xs[c]), "y": int(ys[r]), "width": int(xs[c + 1] - xs[c]), "height": int(ys[r + 1] - ys[r])}
+                for r in range(rows) for c in range(cols)]
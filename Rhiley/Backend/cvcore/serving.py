@@ -0,0 +1,253 @@
+import os
+import queue
+import signal
+import threading
+import time
+
+# Production entry point shared by the three CV services (`python app.py --prod`).
+# Analysis is CPU-bound, so each process runs a handful of requests at once and
+# keeps a short waiting line; anything beyond that gets 503 + Retry-After right
+# away instead of piling up behind one huge screenshot.
+#
+# Every request has a CV_TIMEOUT deadline, enforced by Admission on all three
+# servers. A response not ready by then becomes a 504. A streamed response (NDJSON
+# batches) is cut off when no next line arrives within the deadline. OpenCV work
+# can't be interrupted, so the overrunning handler keeps its slot until it ends.
+#
+#   gunicorn (Linux/macOS)  prefork, preloaded + warmed app, gthread workers; a worker
+#                           with an overrun is recycled (graceful exit, then replaced)
+#   waitress (Windows)      one process, bounded thread pool
+#   werkzeug                same admission rules, for when neither is installed
+#
+# Tunable through the environment: CV_WORKERS, CV_INFLIGHT, CV_QUEUE, CV_QUEUE_WAIT,
+# CV_TIMEOUT.
+WORKERS = int(os.environ.get("CV_WORKERS", os.cpu_count() or 1))
+INFLIGHT = int(os.environ.get("CV_INFLIGHT", 1))       # requests analyzed at once per worker
+QUEUE = int(os.environ.get("CV_QUEUE", 4))             # requests allowed to wait per worker
+QUEUE_WAIT = float(os.environ.get("CV_QUEUE_WAIT", 10))  # seconds a request may wait for a slot
+TIMEOUT = int(os.environ.get("CV_TIMEOUT", 60))        # seconds a request may run before it gets 504
+RETRY_AFTER = 2
+CHUNKS = 64   # streamed chunks buffered between a handler thread and its connection
+
+_START, _END = object(), object()
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+class Admission:
+    # WSGI middleware: INFLIGHT running, QUEUE waiting, everything else 503. Admitted
+    # requests run on their own thread so the connection can give up at the deadline;
+    # on_timeout is called for each overrun.
+
+    def __init__(self, app, inflight=INFLIGHT, queue=QUEUE, wait=QUEUE_WAIT, timeout=TIMEOUT, on_timeout=None):
+        self.app, self.queue, self.wait = app, queue, wait
+        self.timeout, self.on_timeout = timeout, on_timeout
+        self.slots = threading.BoundedSemaphore(inflight)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def busy(self, start_response):
+        with self.lock:
+            self.rejected += 1
+        start_response("503 Service Unavailable", [
+            ("Content-Type", "application/json"),
+            ("Retry-After", str(RETRY_AFTER)),
+        ])
+        return [b'{"error": "Server busy, retry shortly"}']
+
+    def timed_out(self):
+        with self.lock:
+            self.timeouts += 1
+        if self.on_timeout:
+            self.on_timeout()
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            full = self.waiting >= self.queue
+            if not full:
+                self.waiting += 1
+        if full:
+            return self.busy(start_response)
+        try:
+            admitted = self.slots.acquire(timeout=self.wait)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if not admitted:
+            return self.busy(start_response)
+        return self.run(environ, start_response)
+
+    def run(self, environ, start_response):
+        # The handler thread produces the response into `chunks` and holds the slot until
+        # the app is done, timed out or not; this thread waits at most `timeout` per step
+        chunks, gone, response = queue.Queue(CHUNKS), threading.Event(), []
+
+        def put(item):
+            while not gone.is_set():
+                try:
+                    chunks.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def handle():
+            result = None
+            try:
+                result = self.app(environ, lambda status, headers, exc_info=None: response.append((status, headers)))
+                if put(_START):
+                    for chunk in result:
+                        if not put(chunk):
+                            break
+                    put(_END)
+            except BaseException as e:
+                put(_Failed(e))
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+                self.slots.release()
+
+        threading.Thread(target=handle, daemon=True).start()
+        try:
+            first = chunks.get(timeout=self.timeout)
+        except queue.Empty:
+            gone.set()
+            self.timed_out()
+            start_response("504 Gateway Timeout", [("Content-Type", "application/json")])
+            return [b'{"error": "Analysis timed out"}']
+        if isinstance(first, _Failed):
+            gone.set()
+            raise first.error
+        start_response(*response[-1])
+
+        def body():
+            # Streamed bodies (NDJSON batches) get the deadline per chunk
+            try:
+                while True:
+                    try:
+                        item = chunks.get(timeout=self.timeout)
+                    except queue.Empty:
+                        self.timed_out()
+                        return
+                    if item is _END:
+                        return
+                    if isinstance(item, _Failed):
+                        raise item.error
+                    yield item
+            finally:
+                gone.set()
+        return body()
+
+def recycle_worker():
+    # gunicorn: finish what else is in flight, then exit; the arbiter forks a fresh
+    # worker, and the overrunning handler thread goes with the old one
+    os.kill(os.getpid(), signal.SIGTERM)
+
+def serve(app, port, host="0.0.0.0", warm=None):
+    # Imports and first-call OpenCV setup happen once, before any worker forks
+    if warm:
+        started = time.perf_counter()
+        warm()
+        print(f"Warmed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        wsgi = Admission(app, on_timeout=recycle_worker)
+        threads = INFLIGHT + QUEUE + 2  # two spare threads per worker to answer 503s
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in {
+                    "bind": f"{host}:{port}", "workers": WORKERS, "worker_class": "gthread",
+                    # gunicorn's own timeout is only a heartbeat: it replaces a worker
+                    # process that stops responding, not a slow request
+                    "threads": threads, "preload_app": True, "timeout": TIMEOUT,
+                    "graceful_timeout": TIMEOUT, "backlog": WORKERS * threads * 4,
+                }.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return wsgi
+
+        print(f"gunicorn: {WORKERS} workers x {INFLIGHT} in flight + {QUEUE} queued on :{port}")
+        Server().run()
+        return
+
+    # Single process: OpenCV releases the GIL, so one process gets every worker's share
+    inflight, queue = WORKERS * INFLIGHT, WORKERS * QUEUE
+    wsgi = Admission(app, inflight=inflight, queue=queue)
+    try:
+        import waitress
+    except ImportError:
+        waitress = None
+    if waitress is not None:
+        print(f"waitress: {inflight} in flight + {queue} queued on :{port}")
+        waitress.serve(wsgi, host=host, port=port, threads=inflight + queue + 2, channel_timeout=TIMEOUT)
+        return
+
+    from werkzeug.serving import make_server
+    print(f"werkzeug (install gunicorn or waitress for production): {inflight} in flight + {queue} queued on :{port}")
+    make_server(host, port, wsgi, threaded=True).serve_forever()
+
+# ------------------------------------------------------------
+# Load test: python -m cvcore.serving URL IMAGE [-c 16] [-n 200]
+# ------------------------------------------------------------
+
+def _multipart(path):
+    boundary = "----rhiley%d" % int(time.time() * 1000)
+    with open(path, "rb") as f:
+        data = f.read()
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"{os.path.basename(path)}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def loadtest(url, image, concurrency=16, requests=200):
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    body, content_type = _multipart(image)
+
+    def one(_):
+        started = time.perf_counter()
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(req, timeout=TIMEOUT * 2) as res:
+                res.read()
+                status = res.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = 0
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = sorted(t for status, t in results if status == 200)
+    counts = {}
+    for status, _ in results:
+        counts[status] = counts.get(status, 0) + 1
+    pct = lambda p: ok[min(len(ok) - 1, int(p * len(ok)))] * 1000 if ok else float("nan")
+    print(f"{requests} requests, concurrency {concurrency}, {elapsed:.1f}s ({len(ok) / elapsed:.1f} ok/s)")
+    print("status: " + ", ".join(f"{k or 'error'}={v}" for k, v in sorted(counts.items())))
+    print(f"latency ms (200s): p50 {pct(0.50):.0f}  p95 {pct(0.95):.0f}  p99 {pct(0.99):.0f}  max {pct(1.0):.0f}")
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Load test a CV service endpoint")
+    ap.add_argument("url", help="e.g. http://localhost:5002/detect")
+    ap.add_argument("image")
+    ap.add_argument("-c", "--concurrency", type=int, default=16)
+    ap.add_argument("-n", "--requests", type=int, default=200)
+    args = ap.parse_args()
+    loadtest(args.url, args.image, args.concurrency, args.requests)
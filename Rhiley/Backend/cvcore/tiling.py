@@ -0,0 +1,169 @@
+import os
+import struct
+
+import cv2
+import numpy as np
+
+from cvcore.cache import InvalidImage
+
+# Large screenshots (4K retina, 1440x20000 full-page captures) without full-size
+# intermediates:
+#
+#   decode        above MAX_PIXELS the upload is decoded at 1/2, 1/4 or 1/8 with
+#                 IMREAD_REDUCED_* (libjpeg scales while decoding; PNG is resized
+#                 after), picked from the size in the file header
+#   contour_boxes tall images get gray/Canny/contours one strip of rows at a time,
+#                 neighbouring strips sharing OVERLAP rows; contours cut by a strip
+#                 edge are stitched back together across that band
+#   to_original   boxes found on the reduced image, in original pixels
+#
+# Thresholds given in original pixels are scaled by scale**2 (areas) by the caller.
+#
+#   CV_MAX_PIXELS  decode reduced above this many pixels (default 8M, 0 = never)
+#   CV_STRIP       rows per strip (default 4096); images over two strips are tiled
+MAX_PIXELS = int(os.environ.get("CV_MAX_PIXELS", 8_000_000))
+STRIP = int(os.environ.get("CV_STRIP", 4096))
+OVERLAP = 64
+REDUCED = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def image_size(data):
+    # (width, height) from a PNG or JPEG header, None for anything else
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):  # start of frame
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        else:
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def reduction(width, height, max_pixels=MAX_PIXELS):
+    # 1, 2, 4 or 8: the smallest factor bringing the image under max_pixels
+    factor = 1
+    while factor < 8 and max_pixels and width * height > max_pixels * factor * factor:
+        factor *= 2
+    return factor
+
+def decode(data, max_pixels=MAX_PIXELS):
+    # -> (BGR image, scale, (width, height) of the original); scale = decoded / original
+    size = image_size(data)
+    factor = reduction(*size, max_pixels) if size else 1
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED.get(factor, cv2.IMREAD_COLOR))
+    if image is None:
+        raise InvalidImage("Invalid image")
+    height, width = image.shape[:2]
+    if factor == 1:
+        return image, 1.0, (width, height)
+    # EXIF orientation may have swapped the axes relative to the header
+    if (size[0] >= size[1]) != (width >= height):
+        size = size[::-1]
+    return image, width / size[0], tuple(size)
+
+def to_original(rects, scale, width, height):
+    # Processed-pixel boxes -> original pixels, grown outward to whole pixels
+    rects = np.asarray(rects, np.int64).reshape(-1, 4)
+    if scale == 1.0:
+        return rects
+    x0 = np.floor(rects[:, 0] / scale)
+    y0 = np.floor(rects[:, 1] / scale)
+    x1 = np.minimum(np.ceil((rects[:, 0] + rects[:, 2]) / scale), width)
+    y1 = np.minimum(np.ceil((rects[:, 1] + rects[:, 3]) / scale), height)
+    return np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).astype(np.int64)
+
+def _band_span(contour, top, bottom):
+    # x range of a contour's points within rows [top, bottom) (window coordinates)
+    points = contour[:, 0, :]
+    xs = points[(points[:, 1] >= top) & (points[:, 1] < bottom), 0]
+    return (int(xs.min()), int(xs.max())) if len(xs) else None
+
+def _owned_area(contour, x, y, w, h, cut_top, cut_bottom, own_top, own_bottom):
+    # Filled area of a cut contour, closed along the strip edges that cut it and
+    # counted only over rows [own_top, own_bottom), so stitched pieces add up
+    # (window coordinates)
+    mask = np.zeros((h, w), np.uint8)
+    cv2.drawContours(mask, [contour - (x, y)], -1, 255, -1)
+    for row, cut in ((0, cut_top), (h - 1, cut_bottom)):
+        xs = np.flatnonzero(mask[row])
+        if cut and len(xs):
+            mask[row, xs[0]:xs[-1] + 1] = 255
+    outline, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cv2.drawContours(mask, outline, -1, 255, -1)
+    return int(np.count_nonzero(mask[max(0, own_top - y):max(0, own_bottom - y)]))
+
+def contour_boxes(image, strip=STRIP, overlap=OVERLAP):
+    # -> (N x 4 bounding boxes, N contour areas) of the external Canny contours,
+    # like findContours over the whole image but with strip-sized buffers.
+    # Window k covers rows [y0 - overlap, y0 + strip + overlap). A contour wholly
+    # inside window k-1 is left to it; a piece cut by a window edge is kept for
+    # stitching unless the next window holds its whole top. Window k owns rows
+    # [y0, y0 + strip) for the areas of stitched pieces.
+    height = image.shape[0]
+    rects, areas = [], []
+    pieces, spans = [], {}  # pieces: [x, y, w, h, owned area]; spans[(boundary, side)]: [(piece, x0, x1)]
+    for k, y0 in enumerate(range(0, height, strip)):
+        top, bottom = max(0, y0 - overlap), min(height, y0 + strip + overlap)
+        prev_bottom, next_top = y0 + overlap, y0 + strip - overlap
+        gray = cv2.cvtColor(image[top:bottom], cv2.COLOR_BGR2GRAY)
+        contours, _ = cv2.findContours(cv2.Canny(gray, 50, 150), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        for c in contours:
+            x, y, w, h = cv2.boundingRect(c)
+            y += top
+            if k and y + h < prev_bottom:
+                continue
+            cut_top, cut_bottom = top > 0 and y == top, bottom < height and y + h == bottom
+            if cut_bottom and y >= next_top:
+                continue
+            if not (cut_top or cut_bottom):
+                rects.append((x, y, w, h))
+                areas.append(cv2.contourArea(c))
+                continue
+            piece = len(pieces)
+            area = _owned_area(c, x, y - top, w, h, cut_top, cut_bottom, y0 - top, y0 + strip - top)
+            pieces.append([x, y, w, h, area])
+            if cut_top:
+                span = _band_span(c, 0, prev_bottom - top)
+                if span:
+                    spans.setdefault((k, "below"), []).append((piece, *span))
+            if cut_bottom:
+                span = _band_span(c, next_top - top, bottom - top)
+                if span:
+                    spans.setdefault((k + 1, "above"), []).append((piece, *span))
+        del gray, contours
+
+    # Pieces meeting in a band with overlapping x ranges are one contour
+    parent = list(range(len(pieces)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for (boundary, side), above in spans.items():
+        if side != "above":
+            continue
+        for a, ax0, ax1 in above:
+            for b, bx0, bx1 in spans.get((boundary, "below"), ()):
+                if ax0 <= bx1 and bx0 <= ax1:
+                    parent[find(a)] = find(b)
+
+    groups = {}
+    for i in range(len(pieces)):
+        groups.setdefault(find(i), []).append(pieces[i])
+    for group in groups.values():
+        x0 = min(p[0] for p in group)
+        y0 = min(p[1] for p in group)
+        x1 = max(p[0] + p[2] for p in group)
+        y1 = max(p[1] + p[3] for p in group)
+        rects.append((x0, y0, x1 - x0, y1 - y0))
+        areas.append(sum(p[4] for p in group))
+    return np.array(rects, np.int64).reshape(-1, 4), np.array(areas, np.float64)
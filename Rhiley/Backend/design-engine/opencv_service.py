@@ -1,126 +1,34 @@
 import cv2
 import numpy as np
 import json
+import sys
+from pathlib import Path
 from flask import Flask, request, jsonify
-from sklearn.cluster import KMeans
+from werkzeug.exceptions import HTTPException
 
-app = Flask(__name__)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # Rhiley/Backend, for cvcore
+from cvcore import batch, frames, serving
+from cvcore.cache import InvalidImage, ResultCache
+from cvcore.palette import dominant_colors
+from cvcore.pipeline import Perception
 
-def rgb_to_hex(r, g, b):
-    return "#" + "".join(f"{x:02x}" for x in [r, g, b])
+app = Flask(__name__)
+results = ResultCache.from_env()
+MAX_UPLOAD_MB = 25
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024  # larger uploads get 413 before any decode
 
 def extract_dominant_colors(image, k=5):
-    pixels = []
-    h, w = image.shape[:2]
-    for y in range(0, h, 10):
-        for x in range(0, w, 10):
-            b, g, r = image[y, x]
-            pixels.append([r, g, b])
-    
-    if len(pixels) < k:
-        return ["#000000"] * k
-    
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    kmeans.fit(pixels)
-    
-    colors = []
-    for center in kmeans.cluster_centers_:
-        hex_color = rgb_to_hex(int(center[0]), int(center[1]), int(center[2]))
-        colors.append(hex_color)
-    
-    return colors
-
-def is_inside(inner, outer):
-    return (
-        inner['x'] >= outer['x'] and
-        inner['y'] >= outer['y'] and
-        inner['x'] + inner['width'] <= outer['x'] + outer['width'] and
-        inner['y'] + inner['height'] <= outer['y'] + outer['height']
-    )
-
-def merge_vertical_blocks(blocks):
-    # Sort by Y coordinate
-    blocks.sort(key=lambda b: b["y"])
-    
-    merged = []
-    
-    for block in blocks:
-        if len(merged) == 0:
-            merged.append(block)
-            continue
-        
-        last = merged[-1]
-        
-        # Calculate vertical overlap
-        overlap = min(last["y"] + last["height"], block["y"] + block["height"]) - max(last["y"], block["y"])
-        min_height = min(last["height"], block["height"])
-        
-        # Merge if significant overlap (>40% of min height)
-        if overlap > 0.4 * min_height:
-            new_y = min(last["y"], block["y"])
-            new_bottom = max(last["y"] + last["height"], block["y"] + block["height"])
-            
-            last["y"] = new_y
-            last["height"] = new_bottom - new_y
-            last["width"] = max(last["width"], block["width"])
-        else:
-            merged.append(block)
-    
-    return merged
+    # Every 10th pixel, binned and clustered by cvcore.palette (most common color first)
+    return dominant_colors(image, k, step=10)
 
-def analyze_image(image_path):
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError("Could not read image")
-    
-    height, width = image.shape[:2]
-    
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    edges = cv2.Canny(gray, 50, 150)
-    
-    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Filter meaningful layout regions
-    total_area = width * height
-    min_area = total_area * 0.05  # 5% of total area minimum
-    
-    blocks = []
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-        area = w * h
-        if area > min_area:
-            blocks.append({
-                "x": int(x),
-                "y": int(y),
-                "width": int(w),
-                "height": int(h)
-            })
-    
-    # Sort by area (largest first)
-    blocks.sort(key=lambda b: b["width"] * b["height"], reverse=True)
-    
-    # Remove nested rectangles
-    filtered = []
-    for i in range(len(blocks)):
-        keep = True
-        for j in range(len(filtered)):
-            if is_inside(blocks[i], filtered[j]):
-                keep = False
-                break
-        if keep:
-            filtered.append(blocks[i])
-    
-    # Merge vertically overlapping blocks
-    layout_blocks = merge_vertical_blocks(filtered)
-    
-    dominant_colors = extract_dominant_colors(image)
-    
-    return {
-        "width": width,
-        "height": height,
-        "dominantColors": dominant_colors,
-        "layoutBlocks": layout_blocks
-    }
+def analyze_image(image):
+    # image: the decoded upload (Perception or BGR ndarray); a path is still accepted for scripts
+    if isinstance(image, str):
+        image = cv2.imread(image)
+        if image is None:
+            raise ValueError("Could not read image")
+    # Layout blocks + palette from one pass over the image (cvcore.pipeline)
+    return Perception.of(image).result(("dominantColors", "layoutBlocks"))
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
@@ -132,18 +40,40 @@ def analyze():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
         
-        temp_path = "temp_image.jpg"
-        file.save(temp_path)
-        
-        result = analyze_image(temp_path)
-        
-        import os
-        os.remove(temp_path)
-        
-        return jsonify(result)
+        # Decoded straight from the upload buffer (no temp file); repeats come from the cache
+        try:
+            return jsonify(results.get_or_compute("design-analyze", file.read(), analyze_image,
+                                                         decoder=Perception.from_bytes))
+        except InvalidImage:
+            return jsonify({"error": "Could not read image"}), 400
         
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(results.stats())
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    # Many images (multipart and/or .zip) -> NDJSON, one line per image as it finishes;
+    # shares cached results with /analyze
+    return batch.stream_response(analyze_image, request, results, "design-analyze")
+
+@app.route('/analyze/frames', methods=['POST'])
+def analyze_frames():
+    # Screen recording (or ordered frames / .zip) -> NDJSON: full state on keyframes,
+    # block and color changes in between
+    return frames.stream_response(request)
+
+@app.errorhandler(413)
+def too_large(e):
+    return jsonify({"error": f"Image too large (max {MAX_UPLOAD_MB} MB)"}), 413
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5003, debug=True)
+    if '--prod' in sys.argv:
+        serving.serve(app, port=5003, warm=lambda: analyze_image(np.zeros((64, 64, 3), np.uint8)))
+    else:
+        app.run(host='0.0.0.0', port=5003, debug=True)
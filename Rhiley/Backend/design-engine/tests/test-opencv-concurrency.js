@@ -0,0 +1,70 @@
+const axios = require("axios");
+const FormData = require("form-data");
+
+// Requires the OpenCV service: python opencv_service.py (port 5003)
+const API_URL = "http://localhost:5003/analyze";
+const PARALLEL = 24;
+
+// Minimal 24-bit BMP so every request carries a distinct image without fixtures
+function makeBmp(width, height, color) {
+  const rowSize = Math.ceil((width * 3) / 4) * 4;
+  const size = 54 + rowSize * height;
+  const buf = Buffer.alloc(size);
+  buf.write("BM", 0);
+  buf.writeUInt32LE(size, 2);
+  buf.writeUInt32LE(54, 10);
+  buf.writeUInt32LE(40, 14);
+  buf.writeInt32LE(width, 18);
+  buf.writeInt32LE(height, 22);
+  buf.writeUInt16LE(1, 26);
+  buf.writeUInt16LE(24, 28);
+  buf.writeUInt32LE(rowSize * height, 34);
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x++) {
+      const o = 54 + y * rowSize + x * 3;
+      buf[o] = color[2];
+      buf[o + 1] = color[1];
+      buf[o + 2] = color[0];
+    }
+  }
+  return buf;
+}
+
+async function analyze(i) {
+  const width = 320 + i * 7;
+  const height = 200 + i * 5;
+  const color = [(i * 37) % 256, (i * 91) % 256, (i * 53) % 256];
+  const hex = "#" + color.map((c) => c.toString(16).padStart(2, "0")).join("");
+
+  const formData = new FormData();
+  formData.append("image", makeBmp(width, height, color), {
+    filename: `image-${i}.bmp`,
+    contentType: "image/bmp"
+  });
+
+  const res = await axios.post(API_URL, formData, { headers: formData.getHeaders(), timeout: 30000 });
+  const ok = res.data.width === width && res.data.height === height && res.data.dominantColors[0] === hex;
+  if (!ok) {
+    console.log(`❌ Request ${i}: expected ${width}x${height} ${hex}, got ${res.data.width}x${res.data.height} ${res.data.dominantColors[0]}`);
+  }
+  return ok;
+}
+
+async function runConcurrencyTest() {
+  console.log(`🚀 Firing ${PARALLEL} parallel /analyze requests with distinct images...`);
+  try {
+    const results = await Promise.all(Array.from({ length: PARALLEL }, (_, i) => analyze(i)));
+    const passed = results.filter(Boolean).length;
+    if (passed === PARALLEL) {
+      console.log(`✅ Every response matched its own image (${passed}/${PARALLEL})`);
+    } else {
+      console.log(`❌ ${PARALLEL - passed} responses belonged to another request`);
+      process.exitCode = 1;
+    }
+  } catch (err) {
+    console.log("❌ Test failed:", err.message);
+    process.exitCode = 1;
+  }
+}
+
+runConcurrencyTest();
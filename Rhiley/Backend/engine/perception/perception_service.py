@@ -1,56 +1,100 @@
-import cv2
+import hashlib
+import json
 import numpy as np
+import sys
+from pathlib import Path
 from flask import Flask, request, jsonify
 
-app = Flask(__name__)
-
-def dominant_color(region):
-    pixels = region.reshape((-1, 3))
-    pixels = np.float32(pixels)
-
-    _, labels, palette = cv2.kmeans(
-        pixels,
-        3,
-        None,
-        (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2),
-        10,
-        cv2.KMEANS_RANDOM_CENTERS
-    )
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # Rhiley/Backend, for cvcore
+from cvcore import batch, serving
+from cvcore.cache import InvalidImage, ResultCache
+from cvcore.pipeline import Perception, parse_stages
+from cvcore.regions import RegionColors
 
-    _, counts = np.unique(labels, return_counts=True)
-    dominant = palette[np.argmax(counts)]
+app = Flask(__name__)
+results = ResultCache.from_env()
+MAX_GRID = 64  # /regions: rows and cols each
 
-    return "#{:02x}{:02x}{:02x}".format(
-        int(dominant[2]),
-        int(dominant[1]),
-        int(dominant[0])
-    )
+def structural_colors(img):
+    # Top quarter (likely title area) and center (likely subject), see cvcore.pipeline
+    return {"structural_colors": Perception.of(img).structural_colors}
 
 @app.route("/analyze", methods=["POST"])
 def analyze():
     file = request.files["image"]
-    img = cv2.imdecode(
-        np.frombuffer(file.read(), np.uint8),
-        cv2.IMREAD_COLOR
-    )
-
-    height, width, _ = img.shape
-
-    # Top region (likely title area)
-    top_region = img[0:int(height * 0.25), :]
-    background_color = dominant_color(top_region)
-
-    # Center region (likely subject)
-    center_region = img[int(height*0.3):int(height*0.7),
-                        int(width*0.3):int(width*0.7)]
-    primary_color = dominant_color(center_region)
-
-    return jsonify({
-        "structural_colors": {
-            "background": background_color,
-            "primary_mass": primary_color
+    try:
+        return jsonify(results.get_or_compute("perception-analyze", file.read(), structural_colors,
+                                                     decoder=Perception.from_bytes))
+    except InvalidImage:
+        return jsonify({"error": "Invalid image"}), 400
+
+@app.route("/perceive", methods=["POST"])
+def perceive():
+    # Everything the three services report, from one decode. Form field stages
+    # (comma separated, default all but regions) picks what gets computed:
+    #   blocks (/detect on 5002), layoutBlocks + dominantColors (/analyze on 5003),
+    #   structural_colors (/analyze here), regions (palette of each layout block)
+    if "image" not in request.files:
+        return jsonify({"error": "No image file provided"}), 400
+    try:
+        stages = parse_stages(request.form.get("stages") or request.args.get("stages"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(results.get_or_compute(
+            "perception-perceive-" + "+".join(stages), request.files["image"].read(),
+            lambda perception: perception.result(stages), decoder=Perception.from_bytes))
+    except InvalidImage:
+        return jsonify({"error": "Invalid image"}), 400
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(results.stats())
+
+@app.route("/analyze/batch", methods=["POST"])
+def analyze_batch():
+    # Many images (multipart and/or .zip) -> NDJSON, one line per image as it finishes;
+    # shares cached results with /analyze
+    return batch.stream_response(structural_colors, request, results, "perception-analyze")
+
+@app.route("/regions", methods=["POST"])
+def regions():
+    # Dominant color for many rectangles from one quantization pass.
+    # Form fields: image, plus rects (JSON list of {x, y, width, height} in image
+    # pixels, e.g. layoutBlocks from /analyze on 5003) and/or grid ("ROWSxCOLS",
+    # each at most MAX_GRID).
+    if "image" not in request.files:
+        return jsonify({"error": "No image file provided"}), 400
+    try:
+        rects = json.loads(request.form.get("rects", "[]"))
+        grid = request.form.get("grid")
+        rows, cols = (int(n) for n in grid.lower().split("x")) if grid else (0, 0)
+        rects = [{k: float(r[k]) for k in ("x", "y", "width", "height")} for r in rects]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return jsonify({"error": "rects must be a JSON list and grid ROWSxCOLS"}), 400
+    if rows > MAX_GRID or cols > MAX_GRID:
+        return jsonify({"error": f"grid is limited to {MAX_GRID}x{MAX_GRID}"}), 400
+
+    def compute(perception):
+        index = RegionColors(perception.image, size=(perception.width, perception.height))
+        grid_rects = index.grid(rows, cols) if rows > 0 and cols > 0 else []
+        return {
+            "width": index.width,
+            "height": index.height,
+            "palette": index.hex_colors(),
+            "regions": index.query(rects + grid_rects)
         }
-    })
+
+    # The query is part of the key: same image, different rects is a different result
+    query = hashlib.sha256(json.dumps([rects, rows, cols]).encode()).hexdigest()[:16]
+    try:
+        return jsonify(results.get_or_compute("perception-regions-" + query, request.files["image"].read(),
+                                              compute, decoder=Perception.from_bytes))
+    except InvalidImage:
+        return jsonify({"error": "Invalid image"}), 400
 
 if __name__ == "__main__":
-    app.run(port=5001)
+    if "--prod" in sys.argv:
+        serving.serve(app, port=5001, warm=lambda: structural_colors(np.zeros((64, 64, 3), np.uint8)))
+    else:
+        app.run(port=5001)
@@ -7,9 +7,13 @@ Run: python mega_scraper.py
 ============================================================
 """
 
-import os, json, time, re, sys, subprocess
+import os, io, json, time, re, sys, signal, subprocess, threading, heapq, itertools, random, hashlib, tarfile, queue, bisect
+from collections import defaultdict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from urllib.parse import urljoin, urlparse
+from html.parser import HTMLParser
+from urllib.parse import quote, urljoin, urlparse
 
 # ============================================================
 # ⚙️  CONFIG — CHANGE THESE 2 LINES ONLY
@@ -214,11 +218,16 @@ SITES = [
 INCLUDE_EXT   = {".tsx", ".ts", ".jsx", ".js", ".css", ".scss", ".html"}
 SKIP_DIRS     = {"node_modules", ".git", "dist", "build", ".next", "coverage", "__tests__", ".turbo", "out"}
 MAX_FILE_SIZE = 80_000
+MIN_FILE_SIZE = 80        # is_good_code needs 80+ characters, so smaller blobs never pass
 MAX_PER_REPO  = 150
 MIN_CSS       = 200
 MIN_JS        = 100
 SKIP_JS       = ["gtag", "analytics", "facebook", "twitter", "ads", "tracking", "hotjar", "clarity", "heap"]
 
+GITHUB_API = "https://api.github.com"
+GITHUB_RAW = "https://raw.githubusercontent.com"
+CODELOAD   = "https://codeload.github.com"   # repo tarballs (--source tarball)
+
 GH_HEADERS = {
     "Authorization": f"Bearer {GITHUB_TOKEN}",
     "Accept": "application/vnd.github.v3+json",
@@ -229,26 +238,773 @@ WEB_HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
 
+# ============================================================
+# HTTP ENGINE — pooled keep-alive session + per-host limits
+# ============================================================
+
+FILE_WORKERS = 16     # parallel blob downloads
+TREE_WORKERS = 4      # parallel tree listings (also how far ahead trees are prefetched)
+PER_HOST     = 8      # max in-flight requests per host
+REPO_WINDOW  = 6      # repos downloading at once before the oldest is collected
+SITE_WORKERS = 6      # design sites crawled at once
+ARCHIVE_WORKERS = 3   # repo tarballs / local clones streamed at once (--source)
+ASSET_WORKERS = 16    # parallel stylesheet/script downloads across those sites
+HOST_RATES   = {      # (requests/sec, burst) until the host's X-RateLimit-* headers say otherwise
+    "api.github.com":            (10, 20),
+    "raw.githubusercontent.com": (60, 60),
+    "codeload.github.com":       (2, 4),
+}
+DEFAULT_RATE = (5, 1)     # any other host (design sites, CDNs): one request per 0.2s
+PACE_WAIT    = 5.0    # seconds; a bucket that would sleep longer parks the work item instead
+MAX_RETRIES  = 5      # rate-limited work items are parked and retried this many times
+BACKOFF_BASE = 2.0    # seconds; doubled per attempt when the host gives no reset time
+BACKOFF_CAP  = 300.0
+
+STOP       = threading.Event()   # set on Ctrl-C / crash: workers drain, nothing new starts
+STATE_LOCK = threading.Lock()     # guards the GitHub manifest while a checkpoint serialises it
+PRINT_LOCK = threading.Lock()
+
+def say(*lines):
+    # Progress from worker / collector threads: each repo or site block is printed whole,
+    # so the GitHub and site crawls running side by side never interleave mid-block
+    with PRINT_LOCK: print("\n".join(lines), flush=True)
+
+class FetchFailed(Exception):
+    # A tree listing or site page could not be fetched. Raised in the fetch thread and
+    # reported inside that repo's / site's block; the repo or site counts as crawled
+    pass
+
+class RateLimited(Exception):
+    def __init__(self, host, retry_at):
+        super().__init__(f"{host} rate limited until {time.strftime('%H:%M:%S', time.localtime(retry_at))}")
+        self.host, self.retry_at = host, retry_at
+
+def retry_at(r):
+    # When a 403/429 is a quota response, work out when the host opens again
+    if r.status_code not in (403, 429): return None
+    h = r.headers
+    if h.get("Retry-After"):
+        try: return time.time() + float(h["Retry-After"])
+        except ValueError: pass
+    if h.get("X-RateLimit-Remaining") == "0" and h.get("X-RateLimit-Reset"):
+        try: return float(h["X-RateLimit-Reset"])
+        except ValueError: pass
+    return time.time() + BACKOFF_BASE if r.status_code == 429 else None
+
+class TokenBucket:
+    def __init__(self, host, rate, burst):
+        self.host, self.base = host, float(rate)
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens, self.stamp = float(burst), time.monotonic()
+        self.window_end = 0.0   # when the quota observe() paced against resets
+        self.exhausted = False  # observe() saw Remaining: 0 — nothing until window_end
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Short pacing waits sleep here; a spent quota or a long wait raises RateLimited
+        # so the Scheduler parks the item and the worker thread moves on
+        waited = 0.0
+        while True:
+            with self.lock:
+                now, wall = time.monotonic(), time.time()
+                if wall >= self.window_end: self.exhausted = False
+                if self.exhausted: raise RateLimited(self.host, self.window_end)
+                if self.rate < self.base and wall >= self.window_end: self.rate = self.base
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                if delay > PACE_WAIT: raise RateLimited(self.host, wall + delay)
+            time.sleep(delay)
+            waited += delay
+
+    def observe(self, headers):
+        # Spread whatever quota is left evenly over the rest of the window
+        remaining, reset = headers.get("X-RateLimit-Remaining"), headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None: return
+        try: remaining, reset = int(remaining), float(reset)
+        except ValueError: return
+        window = max(reset - time.time(), 1.0)
+        with self.lock:
+            self.rate = min(self.base, max(remaining, 1) / window)
+            self.tokens = min(self.tokens, remaining)
+            self.window_end = reset
+            self.exhausted = remaining <= 0
+
+class HttpEngine:
+    def __init__(self, pool_size=FILE_WORKERS + TREE_WORKERS + ASSET_WORKERS):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.parked = {}
+        self.recorder = None   # Cassette: save every response (--record)
+        self.rewrite = None    # url -> url actually fetched (--replay); limits stay keyed by the real host
+        self.stats = defaultdict(lambda: {"requests": 0, "bytes": 0, "wait_s": 0.0, "parked_s": 0.0, "rate_limited": 0,
+                                          "latency_s": 0.0, "latency": histogram()})
+
+    def host(self, netloc):
+        with self.lock:
+            if netloc not in self.hosts:
+                rate, burst = HOST_RATES.get(netloc, DEFAULT_RATE)
+                self.hosts[netloc] = (TokenBucket(netloc, rate, burst), threading.BoundedSemaphore(PER_HOST))
+            return self.hosts[netloc]
+
+    def park(self, netloc, until):
+        with self.lock:
+            now, prev = time.time(), self.parked.get(netloc, 0)
+            if until > max(now, prev):
+                self.stats[netloc]["parked_s"] += until - max(now, prev)
+                self.parked[netloc] = until
+            self.stats[netloc]["rate_limited"] += 1
+
+    def check_parked(self, netloc):
+        until = self.parked.get(netloc, 0)
+        if until > time.time(): raise RateLimited(netloc, until)
+
+    def get(self, url, scope=None, **kw):
+        # scope: ("github", repo) or ("sites", url) the request is counted under in TELEMETRY.
+        # Latency is headers + body, or headers only with stream=True (the caller counts
+        # the streamed bytes)
+        netloc = urlparse(url).netloc
+        bucket, slots = self.host(netloc)
+        self.check_parked(netloc)
+        try: waited = bucket.acquire()
+        except RateLimited as e: self.park(netloc, e.retry_at); raise
+        self.check_parked(netloc)
+        with slots:
+            started = time.perf_counter()
+            target = self.rewrite(url) if self.rewrite else url
+            r = self.recorder.record(self.session, url, target, kw) if self.recorder else self.session.get(target, **kw)
+            nbytes = 0 if kw.get("stream") else len(r.content)
+            elapsed = time.perf_counter() - started
+        bucket.observe(r.headers)
+        with self.lock:
+            st = self.stats[netloc]
+            st["requests"] += 1
+            st["wait_s"] += waited
+            st["bytes"] += nbytes
+            st["latency_s"] += elapsed
+            observe(st["latency"], elapsed)
+        TELEMETRY.request(scope, elapsed, nbytes, waited)
+        until = retry_at(r)
+        if until is not None:
+            self.park(netloc, until)
+            raise RateLimited(netloc, until)
+        return r
+
+    def report(self):
+        print("\n⏱  Per-host wait time")
+        for netloc, st in sorted(self.stats.items()):
+            print(f"   {netloc:<32} {st['requests']:>6} req {st['bytes'] / 1e6:8.1f} MB   "
+                  f"p95 {percentile(st['latency'], 0.95):>6}   throttled {st['wait_s']:7.1f}s   "
+                  f"parked {st['parked_s']:7.1f}s   ({st['rate_limited']} limited)")
+
+    def summary(self):
+        with self.lock:
+            return {netloc: dict(st, wait_s=round(st["wait_s"], 2), parked_s=round(st["parked_s"], 2),
+                                 latency_s=round(st["latency_s"], 2), latency=labelled(st["latency"]))
+                    for netloc, st in sorted(self.stats.items())}
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+def http():
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None: _ENGINE = HttpEngine()
+    return _ENGINE
+
+def replay_rewrite(base):
+    # --replay: every URL goes to the stub server (scraper_bench.py serve) as one quoted path
+    base = base.rstrip("/")
+    return lambda url: f"{base}/{quote(url, safe='')}"
+
+class Cassette:
+    # Responses saved by --record and served again by scraper_bench.py. index.json
+    # maps URL -> {status, headers, body}; bodies sit beside it as <sha1(url)>.body.
+    # Recording asks without validators so every body is captured in full, and
+    # leaves rate-limit answers (403/429) out.
+    KEEP_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.folder / "index.json"
+        self.entries = read_json(self.index_path, {})
+        self.lock = threading.Lock()
+
+    def add(self, url, status, headers, body):
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".body"
+        (self.folder / name).write_bytes(body)
+        headers = {k: headers[k] for k in self.KEEP_HEADERS if headers.get(k) is not None}
+        with self.lock: self.entries[url] = {"status": status, "headers": headers, "body": name}
+
+    def record(self, session, url, target, kw):
+        # target: where url is really fetched from (itself, or the --replay server)
+        stream = kw.get("stream")
+        headers = {k: v for k, v in (kw.get("headers") or {}).items() if k not in ("If-None-Match", "If-Modified-Since")}
+        r = session.get(target, **dict(kw, headers=headers, stream=False))
+        if r.status_code not in (403, 429): self.add(url, r.status_code, r.headers, r.content)
+        if stream: r.raw = io.BytesIO(r.content)
+        return r
+
+    def lookup(self, url):
+        # -> (status, headers, body bytes) or None
+        with self.lock: e = self.entries.get(url)
+        if e is None: return None
+        return e["status"], e["headers"], (self.folder / e["body"]).read_bytes()
+
+    def save(self):
+        with self.lock: write_json_atomic(self.index_path, self.entries)
+
+# Thread pool whose work items are parked, not slept on, when their host is
+# rate limited. A parked item goes onto a timer heap and is resubmitted once the
+# host reopens (plus jittered backoff), so workers stay free for other hosts.
+class Scheduler:
+
+    def __init__(self, workers, name=None):
+        self.pool = ThreadPoolExecutor(workers)
+        self.heap, self.cv, self.seq = [], threading.Condition(), itertools.count()
+        self.closed = False
+        self.queued, self.peak, self.done = 0, 0, 0   # queued: submitted, not settled (running, waiting or parked)
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+        if name: PIPELINE[name] = self
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc):
+        with self.cv:
+            self.closed = True
+            self.cv.notify()
+        self.dispatcher.join()
+        self.pool.shutdown(wait=True)
+
+    def submit(self, fn, *args):
+        fut = Future()
+        with self.cv:
+            self.queued += 1
+            self.peak = max(self.peak, self.queued)
+        fut.add_done_callback(self._settled)
+        self.pool.submit(self._run, fut, fn, args, 0)
+        return fut
+
+    def _settled(self, fut):
+        with self.cv: self.queued -= 1; self.done += 1
+
+    def depth(self):
+        return self.queued
+
+    def _run(self, fut, fn, args, attempt):
+        if STOP.is_set(): self._cancel(fut); return
+        try:
+            fut.set_result(fn(*args))
+        except RateLimited as e:
+            if attempt >= MAX_RETRIES: fut.set_exception(e); return
+            backoff = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+            at = max(e.retry_at, time.time()) + random.uniform(0.5, 1.5) * backoff
+            with self.cv:
+                heapq.heappush(self.heap, (at, next(self.seq), fut, fn, args, attempt + 1))
+                self.cv.notify()
+        except Exception as e:
+            fut.set_exception(e)
+
+    @staticmethod
+    def _cancel(fut):
+        # cancel() alone leaves waiters (concurrent.futures.wait) hanging
+        if fut.cancel(): fut.set_running_or_notify_cancel()
+
+    def _dispatch(self):
+        with self.cv:
+            while True:
+                if STOP.is_set():
+                    for item in self.heap: self._cancel(item[2])
+                    self.heap.clear()
+                if not self.heap:
+                    if self.closed: return
+                    self.cv.wait()
+                    continue
+                delay = self.heap[0][0] - time.time()
+                if delay > 0:
+                    self.cv.wait(min(delay, 1.0))   # wake now and then to notice STOP
+                    continue
+                _, _, fut, fn, args, attempt = heapq.heappop(self.heap)
+                self.pool.submit(self._run, fut, fn, args, attempt)
+
+def prefetch(pool, fn, items, ahead):
+    # Yield (item, future) in order while keeping `ahead` calls running
+    items, futs = iter(items), deque()
+    for item in items:
+        futs.append((item, pool.submit(fn, item)))
+        if len(futs) >= ahead: break
+    while futs:
+        item, fut = futs.popleft()
+        nxt = next(items, None)
+        if nxt is not None: futs.append((nxt, pool.submit(fn, nxt)))
+        yield item, fut
+
+# ============================================================
+# PIPELINE — bounded stages between fetching, CPU work and storage
+# ============================================================
+#
+#   discover  trees / pages           Scheduler threads (I/O)
+#   fetch     files / assets          Scheduler threads (I/O), REPO_WINDOW repos ahead
+#   filter    is_good_code, good_css/good_js  \
+#   clean     clean_css/clean_js,               CpuPool processes, chained onto each
+#             normalize + SimHash             /  fetch as it lands (then)
+#   write     JSONL shard appends        Stage thread behind a bounded queue
+#
+# Every stage registers in PIPELINE with depth(), peak and done; QueueMonitor
+# reports them. Dedup and output order stay in the collecting threads, in REPOS /
+# SITES order.
+
+CPU_WORKERS        = max(1, min(4, (os.cpu_count() or 2) - 1))   # 0 = filter/clean inline
+QUEUE_DEPTH        = 256   # examples waiting for the writer before producers block
+QUEUE_REPORT_EVERY = 30    # seconds between queue-depth lines (0 = only the final summary)
+
+PIPELINE = {}   # stage name -> Scheduler / CpuPool / Stage
+
+class CpuPool:
+    # Process pool for the regex / hashing work, so it runs beside the fetch threads
+    # instead of holding the GIL they need. workers=0 runs everything inline.
+    # Workers ignore Ctrl-C: the terminal sends SIGINT to the whole process group,
+    # and a worker killed by it breaks the pool under the still-draining scrape.
+
+    def __init__(self, workers):
+        self.pool = ProcessPoolExecutor(workers, initializer=ignore_sigint) if workers else None
+        self.lock, self.inflight, self.peak, self.done = threading.Lock(), 0, 0, 0
+        PIPELINE["cpu"] = self
+
+    def submit(self, fn, *args):
+        # Seconds spent in fn (in the worker, not queued) go to TELEMETRY per function
+        out = Future()
+        def settled(fut):
+            with self.lock: self.inflight -= 1; self.done += 1
+            if fut.cancelled(): Scheduler._cancel(out); return   # shutdown(wait=False)
+            if fut.exception() is not None: out.set_exception(fut.exception()); return
+            value, seconds = fut.result()
+            TELEMETRY.cpu_time(fn.__name__, seconds)
+            out.set_result(value)
+        with self.lock:
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        if self.pool is not None:
+            # A broken pool (BrokenProcessPool) fails this future instead of raising here,
+            # where it would be lost inside a done-callback (then) and hang the chain
+            try: self.pool.submit(timed, fn, *args).add_done_callback(settled); return out
+            except Exception as e: fut = Future(); fut.set_exception(e)
+        else:
+            fut = Future()
+            try: fut.set_result(timed(fn, *args))
+            except Exception as e: fut.set_exception(e)
+        settled(fut)
+        return out
+
+    def depth(self):
+        return self.inflight
+
+    def shutdown(self, wait=True):
+        if self.pool: self.pool.shutdown(wait=wait, cancel_futures=not wait)
+
+def ignore_sigint():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+_CPU = None
+
+def cpu():
+    global _CPU
+    with _ENGINE_LOCK:
+        if _CPU is None: _CPU = CpuPool(CPU_WORKERS)
+    return _CPU
+
+def resolved(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+def then(fut, fn, *args):
+    # Future of (value, fn(value, *args)): fn runs on the CPU pool as soon as fut lands
+    out = Future()
+    def landed(f):
+        if f.cancelled(): Scheduler._cancel(out); return
+        if f.exception() is not None: out.set_exception(f.exception()); return
+        value = f.result()
+        def worked(g):
+            if g.exception() is not None: out.set_exception(g.exception())
+            else: out.set_result((value, g.result()))
+        try: cpu().submit(fn, value, *args).add_done_callback(worked)
+        except Exception as e: out.set_exception(e)
+    fut.add_done_callback(landed)
+    return out
+
+_END = object()
+
+class Stage:
+    # One consumer thread behind a bounded queue. put() blocks while the queue is full,
+    # so producers slow to the consumer's pace instead of piling items up in memory.
+    # An error in fn is raised again on the next put() / join().
+
+    def __init__(self, name, fn, depth=QUEUE_DEPTH):
+        self.fn, self.queue, self.error = fn, queue.Queue(depth), None
+        self.peak = self.done = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+        PIPELINE[name] = self
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _END: return
+                if isinstance(item, threading.Event): item.set(); continue   # join() marker
+                self.fn(item)
+                self.done += 1
+            except Exception as e: self.error = e
+
+    def _raise(self):
+        if self.error is not None:
+            e, self.error = self.error, None
+            raise e
+
+    def put(self, item):
+        self._raise()
+        self.queue.put(item)
+        self.peak = max(self.peak, self.queue.qsize())
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def join(self):
+        # Wait until everything put before this call has been handled; later puts
+        # from other threads do not hold it up
+        if self.thread.is_alive():
+            marker = threading.Event()
+            self.queue.put(marker)
+            marker.wait()
+        self._raise()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(_END)
+            self.thread.join()
+        self._raise()
+
+class QueueMonitor:
+    # Prints every stage's queue depth each QUEUE_REPORT_EVERY seconds while the
+    # scrape runs; stop() returns the peaks and counts for the stats file
+
+    def __init__(self, every=QUEUE_REPORT_EVERY):
+        self.every = every
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        if every: self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.every):
+            say("  ⛓  queued: " + " · ".join(f"{name} {stage.depth()}" for name, stage in list(PIPELINE.items())))
+
+    def stop(self):
+        # -> {stage: {"peak": deepest queue seen, "done": items handled}}
+        self.stopped.set()
+        if self.thread.is_alive(): self.thread.join()
+        return {name: {"peak": stage.peak, "done": stage.done} for name, stage in PIPELINE.items()}
+
+# ============================================================
+# TELEMETRY — where a run's time, requests and bytes went
+# ============================================================
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)   # seconds; slower requests land in a last bucket
+TELEMETRY_ROWS  = 10     # slowest repos / sites shown in the printed table (the stats file has all)
+PROFILE_EVERY   = 0.005  # --profile sampling interval, seconds
+
+def histogram():
+    return [0] * (len(LATENCY_BUCKETS) + 1)
+
+def observe(hist, seconds):
+    hist[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+def labelled(hist):
+    # {"0.05": n, ..., "10": n, "inf": n}: requests at or under each bound (seconds)
+    return dict(zip([str(b) for b in LATENCY_BUCKETS] + ["inf"], hist))
+
+def percentile(hist, q):
+    # Upper bound of the bucket holding the q-th request, as text ("-" when empty)
+    total, seen = sum(hist), 0
+    for bound, n in zip(LATENCY_BUCKETS + (None,), hist):
+        seen += n
+        if total and seen >= q * total:
+            return f"≤{bound}s" if bound is not None else f">{LATENCY_BUCKETS[-1]}s"
+    return "-"
+
+class Telemetry:
+    # Per scope — ("github", repo) or ("sites", url): wall time from its first request
+    # until it was collected, requests, bytes, token-bucket sleep and a latency
+    # histogram. Also reject counts by reason, CPU-pool seconds per function and
+    # the phases of main(). Everything is written to rhiley-scrape-stats.json.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scopes = {"github": {}, "sites": {}}
+        self.rejects = {"github": defaultdict(int), "sites": defaultdict(int)}
+        self.cpu = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.phases, self.lapped = {}, time.perf_counter()
+
+    def _scope(self, scope):
+        kind, name = scope
+        return self.scopes[kind].setdefault(name, {"start": None, "end": None, "requests": 0, "bytes": 0,
+                                                   "sleep_s": 0.0, "latency_s": 0.0, "latency": histogram()})
+
+    def begin(self, scope):
+        with self.lock:
+            s = self._scope(scope)
+            if s["start"] is None: s["start"] = time.time()
+
+    def end(self, scope):
+        with self.lock:
+            s = self._scope(scope)
+            s["end"] = time.time()
+            if s["start"] is None: s["start"] = s["end"]
+
+    def request(self, scope, seconds, nbytes, slept):
+        if scope is None: return
+        with self.lock:
+            s = self._scope(scope)
+            s["requests"] += 1
+            s["bytes"] += nbytes
+            s["sleep_s"] += slept
+            s["latency_s"] += seconds
+            observe(s["latency"], seconds)
+
+    def add_bytes(self, scope, nbytes):
+        with self.lock: self._scope(scope)["bytes"] += nbytes
+
+    def reject(self, kind, reason, n=1):
+        with self.lock: self.rejects[kind][reason] += n
+
+    def cpu_time(self, fn, seconds):
+        with self.lock:
+            self.cpu[fn]["calls"] += 1
+            self.cpu[fn]["seconds"] += seconds
+
+    def lap(self, phase=None):
+        # Time since the previous lap goes to `phase` (None just restarts the clock)
+        now = time.perf_counter()
+        if phase: self.phases[phase] = round(self.phases.get(phase, 0) + now - self.lapped, 2)
+        self.lapped = now
+
+    def rows(self, kind):
+        with self.lock:
+            out = {}
+            for name, s in self.scopes[kind].items():
+                n = s["requests"]
+                out[name] = {"wall_s": round((s["end"] or time.time()) - s["start"], 2) if s["start"] else 0.0,
+                             "requests": n, "bytes": s["bytes"], "sleep_s": round(s["sleep_s"], 2),
+                             "latency_mean_ms": round(1000 * s["latency_s"] / n, 1) if n else None,
+                             "latency": labelled(s["latency"])}
+            return out
+
+    def summary(self, hosts=None):
+        rejects = {"github": dict(PREFILTER), "sites": {}}
+        with self.lock:
+            for kind, counts in self.rejects.items():
+                for why, n in counts.items(): rejects[kind][why] = rejects[kind].get(why, 0) + n
+            cpu = {fn: {"calls": c["calls"], "seconds": round(c["seconds"], 2)} for fn, c in self.cpu.items()}
+        hosts = hosts or {}
+        return {
+            "phases_s": dict(self.phases),
+            "sleep_s": {"token_bucket": round(sum(h["wait_s"] for h in hosts.values()), 2),
+                        "parked": round(sum(h["parked_s"] for h in hosts.values()), 2)},
+            "cpu_pool_s": cpu,
+            "rejects": rejects,
+            "hosts": hosts,
+            "repos": self.rows("github"),
+            "sites": self.rows("sites"),
+        }
+
+    def report(self, summary):
+        print("\n📊 Telemetry")
+        print("   phases      " + " · ".join(f"{n} {s:.1f}s" for n, s in summary["phases_s"].items()))
+        sleep = summary["sleep_s"]
+        print(f"   sleeping    token buckets {sleep['token_bucket']:.1f}s · parked on rate limits {sleep['parked']:.1f}s "
+              "(summed over threads)")
+        if summary["cpu_pool_s"]:
+            print("   CPU pool    " + " · ".join(f"{fn} {c['calls']}× {c['seconds']:.1f}s"
+                                              for fn, c in sorted(summary["cpu_pool_s"].items(), key=lambda kv: -kv[1]["seconds"])))
+        for kind in ("github", "sites"):
+            if summary["rejects"][kind]:
+                print(f"   rejects     {kind}: " + ", ".join(f"{n} {why}" for why, n in
+                                                      sorted(summary["rejects"][kind].items(), key=lambda kv: -kv[1])))
+        for kind, title in (("repos", "slowest repos"), ("sites", "slowest sites")):
+            rows = sorted(summary[kind].items(), key=lambda kv: -kv[1]["wall_s"])[:TELEMETRY_ROWS]
+            if not rows: continue
+            print(f"\n   {title:<40} {'wall s':>8} {'req':>6} {'MB':>7} {'sleep s':>8} {'mean ms':>8} {'p95':>7}")
+            for name, r in rows:
+                hist = [r["latency"][k] for k in r["latency"]]
+                mean = f"{r['latency_mean_ms']:.0f}" if r["latency_mean_ms"] is not None else "-"
+                print(f"   {name[-40:]:<40} {r['wall_s']:8.1f} {r['requests']:6} {r['bytes'] / 1e6:7.2f} "
+                      f"{r['sleep_s']:8.1f} {mean:>8} {percentile(hist, 0.95):>7}")
+
+TELEMETRY = Telemetry()
+
+class Sampler:
+    # --profile: samples the stack of every thread each PROFILE_EVERY seconds
+    # (cProfile only sees the thread that enabled it, and here that one just waits).
+    # Writes folded stacks — one "outer;...;inner count" line each, the input of
+    # flamegraph.pl and speedscope — and prints the functions seen most often.
+    # CpuPool work runs in other processes; profile it with --cpu-workers 0.
+
+    def __init__(self, path, every=PROFILE_EVERY):
+        self.path, self.every = Path(path), every
+        self.stacks = defaultdict(int)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stopped.wait(self.every):
+            for ident, frame in sys._current_frames().items():
+                if ident == me: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self, top=15):
+        self.stopped.set()
+        self.thread.join()
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda kv: -kv[1]): f.write(f"{stack} {n}\n")
+        # Idle pool threads park in threading / queue; leave them out of the table
+        inner, total = defaultdict(int), defaultdict(int)
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")
+            if re.search(r"\((threading|queue|thread)\.py:", frames[-1]): continue
+            inner[frames[-1]] += n
+            for name in set(frames): total[name] += n
+        busy = sum(inner.values()) or 1
+        print(f"\n🔬 Profile — {sum(self.stacks.values())} samples, folded stacks in {self.path}")
+        print(f"   {'self %':>7} {'total %':>8}  function")
+        for name, n in sorted(inner.items(), key=lambda kv: -kv[1])[:top]:
+            print(f"   {100 * n / busy:7.1f} {100 * total[name] / busy:8.1f}  {name}")
+
+# ============================================================
+# TREE PRE-FILTER — rank blobs before download, split the quota by priority
+# ============================================================
+
+# Paths that practically never survive is_good_code or are not design code
+SKIP_PATH_RE = re.compile(r"""
+    \.d\.ts$ | \.min\.(js|css)$ | \.(stories|story|test|spec|bench)\.[a-z]+$
+  | (^|/)(tests?|__mocks__|mocks?|fixtures|__fixtures__|e2e|cypress|\.storybook|stories|benchmarks?|scripts)/
+  | (^|/)[^/]*\.config\.[cm]?[jt]s$
+  | (^|/)(jest|babel|webpack|rollup|vite|vitest|eslint|prettier|tailwind|postcss|karma|gulpfile|gruntfile)[^/]*\.[cm]?[jt]s$
+""", re.VERBOSE | re.IGNORECASE)
+GOOD_PATH_RE = re.compile(r"(^|/)(components?|ui|hooks|animations?|effects?|styles|src)/", re.IGNORECASE)
+EXT_RANK     = {".tsx": 3.0, ".jsx": 3.0, ".ts": 2.0, ".js": 2.0}   # everything else 1.0
+
+PRIORITY_WEIGHT = {"high": 3, "medium": 2, "low": 1}
+# Blob downloads / bytes per run, shared across repos by priority. The defaults give
+# even the lowest-weight repo a MAX_PER_REPO share of files at MAX_FILE_SIZE each, so
+# an unrationed run yields what it did before budgets; pass --budget-* to ration.
+FILE_BUDGET     = MAX_PER_REPO * sum(PRIORITY_WEIGHT.get(cfg["priority"], 1) for cfg in REPOS) // min(PRIORITY_WEIGHT.values())
+BYTE_BUDGET     = FILE_BUDGET * MAX_FILE_SIZE
+
+PREFILTER = defaultdict(int)      # reject reason -> count, for the end-of-run summary
+
+def file_score(f):
+    path, size = f["path"], f.get("size", 0)
+    score = EXT_RANK.get(Path(path).suffix, 1.0)
+    if GOOD_PATH_RE.search(path): score += 0.5
+    if 1_000 <= size <= 30_000: score += 0.5        # real components, not stubs or bundles
+    elif size < 300: score -= 1.0
+    return score
+
+def skip_reason(path, size):
+    # None when the file is worth fetching; otherwise why not ("" = not counted)
+    if Path(path).suffix not in INCLUDE_EXT: return ""
+    if any(s in path.split("/") for s in SKIP_DIRS): return ""
+    if size > MAX_FILE_SIZE: return "too large"
+    if size < MIN_FILE_SIZE: return "too small"
+    if SKIP_PATH_RE.search(path): return "path"
+    return None
+
+def pick_files(tree):
+    # Candidates best-first; everything here is decided from the tree listing alone
+    files = []
+    for f in tree:
+        if f["type"] != "blob": continue
+        why = skip_reason(f["path"], f.get("size", 0))
+        if why is None: files.append(f)
+        elif why: PREFILTER[why] += 1
+    files.sort(key=file_score, reverse=True)
+    if len(files) > MAX_PER_REPO: PREFILTER["over repo cap"] += len(files) - MAX_PER_REPO
+    return files[:MAX_PER_REPO]
+
+class Budget:
+    # Each repo gets budget * weight / weight-still-to-come, so quota a repo leaves
+    # unused rolls forward to the rest, and high-priority repos get the larger share.
+    # Every repo calls take() or release() exactly once, or its share stays reserved.
+
+    def __init__(self, repos, files=FILE_BUDGET, nbytes=BYTE_BUDGET):
+        self.files, self.bytes = files, nbytes
+        self.weight = sum(PRIORITY_WEIGHT.get(cfg.get("priority"), 1) for cfg in repos)
+
+    def take(self, cfg, candidates):
+        w = PRIORITY_WEIGHT.get(cfg.get("priority"), 1)
+        share = w / max(self.weight, 1)
+        self.weight -= w
+        max_files, max_bytes = int(self.files * share), int(self.bytes * share)
+        picked, used = [], 0
+        for f in candidates:
+            if len(picked) >= max_files or used + f.get("size", 0) > max_bytes: break
+            picked.append(f)
+            used += f.get("size", 0)
+        self.files -= len(picked)
+        self.bytes -= used
+        return picked
+
+    def release(self, cfg):
+        # A repo that downloads nothing this run (unchanged, 404, failed) hands its share on
+        self.weight -= PRIORITY_WEIGHT.get(cfg.get("priority"), 1)
+
 # ============================================================
 # GITHUB FUNCTIONS
 # ============================================================
 
-def get_tree(repo):
-    import requests
+def get_tree(repo, etag=None):
+    # Returns (tree, etag, tree_sha); tree is None when the stored ETag still matches (304)
+    headers = dict(GH_HEADERS, **{"If-None-Match": etag}) if etag else GH_HEADERS
     try:
-        r = requests.get(f"https://api.github.com/repos/{repo}/git/trees/HEAD?recursive=1", headers=GH_HEADERS, timeout=30)
-        if r.status_code == 401: print("  ✗ Bad token"); return []
-        if r.status_code == 404: print(f"  ✗ Not found: {repo}"); return []
-        if r.status_code == 403: print(f"  ✗ Rate limited — wait 60s"); time.sleep(60); return []
-        return r.json().get("tree", []) if r.status_code == 200 else []
-    except: return []
+        r = http().get(f"{GITHUB_API}/repos/{repo}/git/trees/HEAD?recursive=1", scope=("github", repo), headers=headers, timeout=30)
+        if r.status_code == 304: return None, etag, None
+        if r.status_code == 401: raise FetchFailed("Bad token")
+        if r.status_code == 404: raise FetchFailed(f"Not found: {repo}")
+        if r.status_code == 403: raise FetchFailed(f"Forbidden: {repo}")
+        if r.status_code != 200: return [], None, None
+        data = r.json()
+        return data.get("tree", []), r.headers.get("ETag"), data.get("sha")
+    except (RateLimited, FetchFailed): raise
+    except: return [], None, None
 
 def get_file(repo, path, size):
-    import requests
     if size > MAX_FILE_SIZE: return None
     try:
-        r = requests.get(f"https://raw.githubusercontent.com/{repo}/HEAD/{path}", timeout=20)
+        r = http().get(f"{GITHUB_RAW}/{repo}/HEAD/{path}", scope=("github", repo), timeout=20)
         return r.text if r.status_code == 200 else None
+    except RateLimited: raise
     except: return None
 
 def is_good_code(content, ext):
@@ -257,6 +1013,21 @@ def is_good_code(content, ext):
     if ext in {".ts", ".js"}: return any(k in content for k in ["export", "function", "const ", "class "])
     return True
 
+def prepare_file(text, ext):
+    # CPU half of collect_repo (runs on the CpuPool): None unless the file is good code
+    if not text or not is_good_code(text, ext): return None
+    return fingerprint(text)
+
+def git_blob_sha(text):
+    # Same id GitHub puts in tree entries, so stored code can be matched without refetching
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def seed_manifest(manifest, item):
+    # Datasets scraped before the manifest existed still know their blob ids
+    blobs = manifest.setdefault(item["repo"], {}).setdefault("blobs", {})
+    if item["path"] not in blobs: blobs[item["path"]] = git_blob_sha(item.get("code", ""))
+
 def make_instruction(path, tag):
     ext = Path(path).suffix
     name = Path(path).name
@@ -265,167 +1036,1054 @@ def make_instruction(path, tag):
     if ext in {".css", ".scss"}: return f"Write CSS like {name} using {tag} design system"
     return f"Show code from {name} ({tag})"
 
-def scrape_github(seen_github=None):
-    print("\n🐙 GITHUB SCRAPER — 100 repos")
+def submit_repo(cfg, candidates, seen_github, manifest, pool, index=None, budget=None):
+    # Queue downloads for candidates that are new, or whose blob SHA moved since last run.
+    # Returns (files, held): held counts wanted files the budget left for a later run.
+    known = manifest.get(cfg["repo"], {}).get("blobs", {})
+    wanted = []
+    for f in candidates:
+        old_sha = known.get(f["path"])
+        if old_sha is not None and old_sha == f.get("sha"): continue
+        if old_sha is None and f"{cfg['repo']}:{f['path']}" in seen_github: continue
+        if index and index.known_blob(f.get("sha")): continue   # same bytes already stored elsewhere
+        wanted.append(f)
+    picked = budget.take(cfg, wanted) if budget else wanted
+    if len(picked) < len(wanted): PREFILTER["over budget"] += len(wanted) - len(picked)
+    # Each download is filtered and fingerprinted on the CPU pool as soon as it lands
+    files = [(f, then(pool.submit(get_file, cfg["repo"], f["path"], f.get("size", 0)), prepare_file, Path(f["path"]).suffix))
+             for f in picked]
+    return files, len(wanted) - len(picked)
+
+def collect_repo(job, seen_github, manifest, emit, index=None):
+    # True when the repo finished cleanly and can be checkpointed; a failed tree or a
+    # file that was rate limited or failed to download leaves it for --resume
+    cfg = job["cfg"]
+    repo, tag, priority = cfg["repo"], cfg["tag"], cfg["priority"]
+    head = f"\n  📦 {repo} [{tag}]"
+    if job["files"] is None:
+        if job.get("error"): head += f"\n     ✗ {job['error']}"
+        elif job["unchanged"]:
+            head += "\n     · unchanged since last run"
+            if job["etag"]:
+                with STATE_LOCK: manifest.setdefault(repo, {})["etag"] = job["etag"]
+        say(head)
+        return not job.get("error")
+    with STATE_LOCK:
+        blobs = {p: sha for p, sha in manifest.get(repo, {}).get("blobs", {}).items() if p in job["paths"]}
+    count, updated, limited, failed, dups = 0, 0, 0, 0, 0
+    for f, fut in job["files"]:
+        try: c, fp = fut.result()
+        except RateLimited: limited += 1; continue
+        except CancelledError: say(head, "     · interrupted"); return False
+        except BrokenProcessPool: raise   # fatal: stops the run (and saves a checkpoint)
+        if c is None: failed += 1; continue   # download failed: fetched again next run
+        # The blob id goes into the manifest only once the file is kept or deliberately
+        # rejected, so a file that fails before that is fetched again next run
+        if fp is None:
+            if c: TELEMETRY.reject("github", "not code")
+            if f.get("sha"): blobs[f["path"]] = f["sha"]
+            continue
+        key = f"{repo}:{f['path']}"
+        if index and not index.add(c, key, blob=f.get("sha"), fp=fp):
+            dups += 1
+            TELEMETRY.reject("github", "duplicate")
+            if f.get("sha"): blobs[f["path"]] = f["sha"]
+            continue
+        emit({
+            "type": "github", "tag": tag, "priority": priority,
+            "repo": repo, "path": f["path"],
+            "instruction": make_instruction(f["path"], tag),
+            "code": c,
+        })
+        if f.get("sha"): blobs[f["path"]] = f["sha"]
+        if key in seen_github: updated += 1
+        else: count += 1
+        seen_github.add(key)
+    deferred = job["held"] + limited
+    with STATE_LOCK:
+        entry = manifest.setdefault(repo, {})
+        entry["blobs"] = blobs
+        # Only trust the ETag / tree SHA once every candidate has been fetched;
+        # otherwise next run would skip the files that are still outstanding
+        if deferred or failed:
+            entry.pop("etag", None); entry.pop("tree_sha", None)
+        else:
+            entry["tree_sha"] = job["tree_sha"]
+            if job["etag"]: entry["etag"] = job["etag"]
+    say(head, f"     ✓ {count} files" + (f", {updated} refreshed" if updated else "")
+          + (f", {dups} duplicates skipped" if dups else "")
+          + (f" ({deferred} rate limited or over budget, left for next run)" if deferred else "")
+          + (f", {failed} failed" if failed else ""))
+    return not (limited or failed)
+
+def scrape_github(seen_github=None, manifest=None, emit=None, checkpoint=None, index=None,
+                  budget_files=FILE_BUDGET, budget_bytes=BYTE_BUDGET, source="api"):
+    # source: "api" (tree listing + one raw request per file), "tarball" (one archive
+    # per repo) or a folder of local clones / tarballs
+    print("\n🐙 GITHUB SCRAPER — 100 repos" + (f" ({source})" if source != "api" else ""))
     print("─" * 50)
 
-    if not GITHUB_TOKEN or "YOUR_GITHUB_TOKEN" in GITHUB_TOKEN:
+    if source == "api" and not http().rewrite and (not GITHUB_TOKEN or "YOUR_GITHUB_TOKEN" in GITHUB_TOKEN):
         print("⚠️  Set GITHUB_TOKEN at top of file!")
         print("   github.com/settings/tokens → public_repo")
         return []
 
+    # With a custom emit, examples go straight to storage and the list stays empty
     results = []
-    repo_seen = set()
+    if emit is None: emit = results.append
     if seen_github is None: seen_github = set()
+    if manifest is None: manifest = {}
 
+    repos, repo_seen = [], set()
+    done = checkpoint.done("repos") if checkpoint else set()
     for cfg in REPOS:
-        repo, tag, priority = cfg["repo"], cfg["tag"], cfg["priority"]
-        if repo in repo_seen: continue
-        repo_seen.add(repo)
-
-        print(f"\n  📦 {repo} [{tag}]")
-        tree = get_tree(repo)
-        if not tree: continue
-
-        files = [f for f in tree
-            if f["type"] == "blob"
-            and Path(f["path"]).suffix in INCLUDE_EXT
-            and not any(s in f["path"].split("/") for s in SKIP_DIRS)
-        ]
-        files.sort(key=lambda f: 0 if Path(f["path"]).suffix in {".tsx",".jsx"} else 1 if Path(f["path"]).suffix in {".ts",".js"} else 2)
-        files = files[:MAX_PER_REPO]
-
-        count = 0
-        for f in files:
-            file_key = f"{repo}:{f['path']}"
-            if file_key in seen_github:
-                # print(f"     · skip {f['path']}") # Too noisy
+        if cfg["repo"] in repo_seen: continue
+        repo_seen.add(cfg["repo"])
+        if cfg["repo"] in done: continue
+        repos.append(cfg)
+    if done: print(f"  ↻ Resuming — {len(done)} repos already done")
+    budget = Budget(repos, budget_files, budget_bytes)
+
+    def finish(job):
+        done = collect_repo(job, seen_github, manifest, emit, index)
+        TELEMETRY.end(("github", job["cfg"]["repo"]))
+        if done and checkpoint: checkpoint.mark("repos", job["cfg"]["repo"])
+
+    def fetch_tree(cfg):
+        TELEMETRY.begin(("github", cfg["repo"]))
+        return get_tree(cfg["repo"], manifest.get(cfg["repo"], {}).get("etag"))
+
+    if source != "api":
+        # Archives stream a few repos ahead and are collected in REPOS order
+        read = lambda cfg: read_archive(cfg, source, seen_github, manifest, index)
+        with Scheduler(ARCHIVE_WORKERS, "archives") as pool:
+            for cfg, fut in prefetch(pool, read, repos, ARCHIVE_WORKERS):
+                if STOP.is_set(): break
+                try: got = fut.result()
+                except CancelledError: break
+                except BrokenProcessPool: raise
+                except Exception as e: got = {"error": str(e)}
+                if got.get("error"):
+                    say(f"\n  📦 {cfg['repo']} [{cfg['tag']}]", f"     ✗ {got['error']}")
+                    TELEMETRY.end(("github", cfg["repo"]))
+                    budget.release(cfg)
+                    continue
+                finish(archive_job(cfg, got, budget))
+        if PREFILTER:
+            print("\n  🔎 Skipped while streaming: " + ", ".join(f"{n} {why}" for why, n in sorted(PREFILTER.items())))
+        return results
+
+    # Trees are prefetched a few repos ahead; blobs from the last REPO_WINDOW
+    # repos download together and are collected oldest-first so output order
+    # matches REPOS and memory stays bounded.
+    with Scheduler(TREE_WORKERS, "trees") as tree_pool, Scheduler(FILE_WORKERS, "files") as file_pool:
+        pending = deque()
+        for cfg, fut in prefetch(tree_pool, fetch_tree, repos, TREE_WORKERS):
+            if STOP.is_set(): break
+            failed = None
+            try: tree, etag, tree_sha = fut.result()
+            except CancelledError: break
+            except RateLimited as e: failed = f"{e} — gave up after {MAX_RETRIES} retries"
+            except FetchFailed as e: failed = str(e)
+            if failed: tree, etag, tree_sha = [], None, None
+            unchanged = tree is None or (tree_sha is not None and tree_sha == manifest.get(cfg["repo"], {}).get("tree_sha"))
+            job = {"cfg": cfg, "etag": etag, "tree_sha": tree_sha, "unchanged": unchanged, "files": None, "paths": set(), "held": 0,
+                   "error": failed}
+            if tree and not unchanged:
+                candidates = pick_files(tree)
+                job["paths"] = {f["path"] for f in candidates}
+                job["files"], job["held"] = submit_repo(cfg, candidates, seen_github, manifest, file_pool, index, budget)
+            else:
+                budget.release(cfg)
+            pending.append(job)
+            while len(pending) > REPO_WINDOW:
+                finish(pending.popleft())
+        # On Ctrl-C, in-flight downloads settle and every repo that still
+        # landed completely is saved; the rest are left for --resume
+        for job in pending:
+            if STOP.is_set():
+                futs = [f for _, f in job["files"] or []]
+                wait(futs)
+                if any(f.cancelled() for f in futs): continue
+            finish(job)
+
+    if PREFILTER:
+        print("\n  🔎 Skipped before download: " + ", ".join(f"{n} {why}" for why, n in sorted(PREFILTER.items())))
+    return results
+
+# ============================================================
+# GITHUB ARCHIVES — one tarball per repo, filtered while it streams
+# ============================================================
+
+def local_source(folder, repo):
+    # <folder>/<owner>/<repo> or <owner>__<repo> clone, or <owner>__<repo>.tar.gz / .tgz / .tar
+    folder, flat = Path(folder), repo.replace("/", "__")
+    for p in (folder / repo, folder / flat, *(folder / (flat + ext) for ext in (".tar.gz", ".tgz", ".tar"))):
+        if p.exists(): return p
+    return None
+
+class CountingReader:
+    # File-like wrapper adding what is read to a telemetry scope's downloaded bytes
+
+    def __init__(self, raw, scope):
+        self.raw, self.scope = raw, scope
+
+    def read(self, n=-1):
+        data = self.raw.read(n)
+        TELEMETRY.add_bytes(self.scope, len(data))
+        return data
+
+def tar_members(fileobj):
+    # Sequential read (r|*): nothing is written to disk and skipped members are never
+    # buffered. Names lose their top folder (GitHub's <owner>-<repo>-<sha>/, or ./)
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for m in tar:
+            if not m.isfile() or "/" not in m.name: continue
+            yield m.name.split("/", 1)[1], m.size, lambda m=m: tar.extractfile(m).read()
+
+def dir_members(root):
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            p = os.path.join(folder, name)
+            if os.path.islink(p): continue
+            yield Path(os.path.relpath(p, root)).as_posix(), os.path.getsize(p), lambda p=p: Path(p).read_bytes()
+
+def archive_members(source, repo):
+    # (path, size, read) for every regular file of the repo; read() only for the ones wanted
+    if source == "tarball":
+        headers = dict(WEB_HEADERS, **({"Authorization": f"Bearer {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}))
+        r = http().get(f"{CODELOAD}/{repo}/tar.gz/HEAD", scope=("github", repo), headers=headers, stream=True, timeout=60)
+        with r:
+            if r.status_code != 200: raise OSError(f"tarball: HTTP {r.status_code}")
+            yield from tar_members(CountingReader(r.raw, ("github", repo)))
+        return
+    path = local_source(source, repo)
+    if path is None: raise OSError(f"not found in {source}")
+    if path.is_dir(): yield from dir_members(path); return
+    with open(path, "rb") as f: yield from tar_members(f)
+
+def read_archive(cfg, source, seen_github, manifest, index=None):
+    # Applies the pick_files filters and is_good_code to each member as it goes past and
+    # keeps the MAX_PER_REPO best, so at most that many files are held per repo. Files
+    # already stored (same blob id) stay in the ranking without their text.
+    # Returns {"candidates": [(tree-style entry, text or None)] best-first, "paths", "skipped"}
+    repo = cfg["repo"]
+    TELEMETRY.begin(("github", repo))
+    with STATE_LOCK: known = dict(manifest.get(repo, {}).get("blobs", {}))
+    heap, paths, skipped, seq = [], set(), defaultdict(int), itertools.count()
+    try:
+        for path, size, read in archive_members(source, repo):
+            if STOP.is_set(): raise CancelledError()
+            why = skip_reason(path, size)
+            if why is not None:
+                if why: skipped[why] += 1
                 continue
+            data = read()
+            text = data.decode("utf-8", errors="replace")
+            if not is_good_code(text, Path(path).suffix): skipped["not code"] += 1; continue
+            f = {"path": path, "type": "blob", "size": size, "sha": git_blob_sha(data)}
+            paths.add(path)
+            if known.get(path) == f["sha"] or (path not in known and f"{repo}:{path}" in seen_github) \
+                    or (index and index.known_blob(f["sha"])):
+                text = None
+            item = (file_score(f), -next(seq), f, text)
+            if len(heap) < MAX_PER_REPO: heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]: heapq.heapreplace(heap, item)
+    except (RateLimited, CancelledError): raise
+    except Exception as e: return {"error": str(e)}
+    if len(paths) > MAX_PER_REPO: skipped["over repo cap"] += len(paths) - MAX_PER_REPO
+    heap.sort(reverse=True)
+    return {"candidates": [(f, text) for _, _, f, text in heap], "paths": paths, "skipped": skipped}
+
+def archive_job(cfg, got, budget=None):
+    # Same shape submit_repo gives collect_repo; the texts are already here, only the
+    # fingerprints go to the CPU pool
+    for why, n in got["skipped"].items(): PREFILTER[why] += n
+    wanted = [(f, text) for f, text in got["candidates"] if text is not None]
+    picked = len(budget.take(cfg, [f for f, _ in wanted])) if budget else len(wanted)
+    if picked < len(wanted): PREFILTER["over budget"] += len(wanted) - picked
+    files = [(f, then(resolved(text), prepare_file, Path(f["path"]).suffix)) for f, text in wanted[:picked]]
+    return {"cfg": cfg, "etag": None, "tree_sha": None, "unchanged": False,
+            "files": files, "paths": got["paths"], "held": len(wanted) - picked}
 
-            c = get_file(repo, f["path"], f.get("size", 0))
-            if not c or not is_good_code(c, Path(f["path"]).suffix): continue
-            results.append({
-                "type": "github", "tag": tag, "priority": priority,
-                "repo": repo, "path": f["path"],
-                "instruction": make_instruction(f["path"], tag),
-                "code": c,
-            })
-            count += 1
-            seen_github.add(file_key)
-            time.sleep(0.04)
-
-        print(f"     ✓ {count} files")
-        time.sleep(0.5)
+# ============================================================
+# ASSET CACHE — on-disk HTTP cache for site stylesheets/scripts
+# ============================================================
 
-    return results
+ASSET_CACHE_MB      = 256      # LRU-evicted by body bytes; 0 disables the cache
+ASSET_CACHE_ENTRIES = 50_000   # also caps remembered rejects, which have no body
+ASSET_REJECT_TTL    = 3 * 86400   # seconds a reject is skipped without asking, even with no validators
+
+def cache_lifetime(headers):
+    # Seconds the response may be reused without asking; None means do not store it
+    cc = headers.get("Cache-Control", "").lower()
+    if "no-store" in cc: return None
+    if "no-cache" in cc: return 0
+    m = re.search(r"(?:s-maxage|max-age)=(\d+)", cc)
+    return int(m.group(1)) if m else 0
+
+class AssetCache:
+    # index.json maps absolute asset URL -> {etag, last_modified, expires, size, rejected},
+    # least recently used first. Bodies live next to it as <sha1(url)>.body. Assets that
+    # failed good_css/good_js keep only their validators and are skipped without a request
+    # for at least ASSET_REJECT_TTL; after that a 304 skips them outright.
+
+    def __init__(self, folder, max_bytes, max_entries=ASSET_CACHE_ENTRIES):
+        self.folder, self.max_bytes, self.max_entries = folder, max_bytes, max_entries
+        folder.mkdir(parents=True, exist_ok=True)
+        self.index_path = folder / "index.json"
+        self.entries = read_json(self.index_path, {})
+        self.bytes = sum(e.get("size", 0) for e in self.entries.values())
+        self.lock = threading.Lock()
+        self.stats = defaultdict(int)
+        # Bodies written after the last index save are unknown; drop them
+        known = {self._file(u).name for u in self.entries}
+        for f in folder.glob("*.body"):
+            if f.name not in known: f.unlink(missing_ok=True)
+
+    def _file(self, url):
+        return self.folder / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".body")
+
+    def _read(self, url):
+        try: return self._file(url).read_text(encoding="utf-8")
+        except OSError: return None
+
+    def _drop(self, url):
+        e = self.entries.pop(url, None)
+        if e:
+            self.bytes -= e.get("size", 0)
+            self._file(url).unlink(missing_ok=True)
+
+    def fetch(self, url, scope=None):
+        with self.lock:
+            e = self.entries.pop(url, None)
+            if e: self.entries[url] = e              # most recently used goes last
+        text = None if e is None or e.get("rejected") else self._read(url)
+        if e and not e.get("rejected") and text is None: e = None   # body lost, refetch in full
+        if e and e["expires"] > time.time():
+            self.stats["rejected" if e.get("rejected") else "hits"] += 1
+            return text
+
+        headers = dict(WEB_HEADERS)
+        if e and e.get("etag"): headers["If-None-Match"] = e["etag"]
+        if e and e.get("last_modified"): headers["If-Modified-Since"] = e["last_modified"]
+        try: r = http().get(url, scope=scope, headers=headers, timeout=15)
+        except RateLimited: raise
+        except: return None
+
+        if r.status_code == 304 and e:
+            lifetime = cache_lifetime(r.headers) or 0
+            if e.get("rejected"): lifetime = max(lifetime, ASSET_REJECT_TTL)
+            with self.lock: e["expires"] = time.time() + lifetime
+            self.stats["rejected" if e.get("rejected") else "revalidated"] += 1
+            return text
+        if r.status_code != 200: return None
+        self.stats["misses"] += 1
+        self._store(url, r)
+        return r.text
+
+    def _store(self, url, r):
+        lifetime = cache_lifetime(r.headers)
+        with self.lock:
+            self._drop(url)
+            if lifetime is None: return
+            body = r.text.encode("utf-8")
+            tmp = self._file(url).with_suffix(".tmp")
+            tmp.write_bytes(body)
+            os.replace(tmp, self._file(url))
+            self.entries[url] = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                                 "expires": time.time() + lifetime, "size": len(body)}
+            self.bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        while self.entries and (self.bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            self._drop(next(iter(self.entries)))
+
+    def reject(self, url):
+        # Keep the validators, forget the body. A no-store asset gets an entry too, so
+        # either way it is skipped for ASSET_REJECT_TTL before anything is asked again
+        with self.lock:
+            e = self.entries.get(url)
+            if e and e.get("rejected"): return
+            if e is None:
+                e = self.entries[url] = {"etag": None, "last_modified": None, "expires": 0, "size": 0}
+            self.bytes -= e.get("size", 0)
+            self._file(url).unlink(missing_ok=True)
+            e.update(size=0, rejected=True, expires=max(e["expires"], time.time() + ASSET_REJECT_TTL))
+            self._evict()
+
+    def save(self):
+        with self.lock: write_json_atomic(self.index_path, self.entries)
+
+    def report(self):
+        st = self.stats
+        print(f"\n  📦 Asset cache: {st['hits']} hits, {st['revalidated']} revalidated, "
+              f"{st['misses']} downloaded, {st['rejected']} known rejects skipped "
+              f"({self.bytes / 1e6:.1f} MB cached)")
+
+_ASSET_CACHE = None
+
+def asset_cache():
+    global _ASSET_CACHE
+    with _ENGINE_LOCK:
+        if _ASSET_CACHE is None and ASSET_CACHE_MB:
+            _ASSET_CACHE = AssetCache(OUTPUT_FOLDER / "asset-cache", ASSET_CACHE_MB * 1_000_000)
+    return _ASSET_CACHE
 
 # ============================================================
 # DESIGN SITE FUNCTIONS
 # ============================================================
 
-def good_css(css):
-    signals = ["@keyframes","animation","transition","transform","cubic-bezier",
+CSS_SIGNALS = ["@keyframes","animation","transition","transform","cubic-bezier",
                "backdrop-filter","clip-path","perspective","will-change","gradient","blur"]
-    return sum(1 for s in signals if s in css.lower()) >= 2
+JS_SIGNALS  = ["requestAnimationFrame","gsap","three","ScrollTrigger",
+               "IntersectionObserver","canvas","WebGL","shader","animate","lerp","easing","tween"]
+
+# One scan per asset. The CSS pattern is a lookahead so overlapping signals are all
+# seen, exactly like the old `s in css.lower()` loop, and it stops at the second hit.
+CSS_SIGNAL_RE = re.compile("(?=(" + "|".join(map(re.escape, CSS_SIGNALS)) + "))", re.IGNORECASE)
+JS_SIGNAL_RE  = re.compile("|".join(map(re.escape, JS_SIGNALS)))
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+SOURCEMAP_RE   = re.compile(r"//# sourceMappingURL=.*$", re.MULTILINE)
+SPACE_RE       = re.compile(r"\s+")
+
+def good_css(css):
+    found = set()
+    for m in CSS_SIGNAL_RE.finditer(css):
+        found.add(m.group(1).lower())
+        if len(found) >= 2: return True
+    return False
 
 def good_js(js):
-    signals = ["requestAnimationFrame","gsap","three","ScrollTrigger",
-               "IntersectionObserver","canvas","WebGL","shader","animate","lerp","easing","tween"]
-    return any(s in js for s in signals)
+    return JS_SIGNAL_RE.search(js) is not None
 
 def clean_css(css):
-    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
-    return re.sub(r"\s+", " ", css).strip()
+    return SPACE_RE.sub(" ", CSS_COMMENT_RE.sub("", css)).strip()
 
 def clean_js(js):
-    js = re.sub(r"//# sourceMappingURL=.*$", "", js, flags=re.MULTILINE)
-    return re.sub(r"/\*.*?\*/", "", js, flags=re.DOTALL).strip()
+    return CSS_COMMENT_RE.sub("", SOURCEMAP_RE.sub("", js)).strip()
+
+class PageAssets(HTMLParser):
+    # Single streaming pass over the page keeping only what scrape_site reads:
+    # <style> text, <link rel=stylesheet> hrefs, inline <script> text and script srcs.
+    # Same tokenizer BeautifulSoup's html.parser backend uses, minus building the tree.
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.styles, self.stylesheets, self.scripts, self.script_srcs = [], [], [], []
+        self._open, self._buf = None, []
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ("style", "script", "link"): return
+        a = {k: v or "" for k, v in attrs}
+        if tag == "link":
+            if "stylesheet" in a.get("rel", "").split() and a.get("href"): self.stylesheets.append(a["href"])
+            return
+        if tag == "script" and "src" in a:
+            if a["src"]: self.script_srcs.append(a["src"]); return
+        self._open, self._buf = tag, []
+
+    def handle_data(self, data):
+        if self._open: self._buf.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == self._open: self._flush()
+
+    def _flush(self):
+        text = "".join(self._buf).strip()
+        (self.styles if self._open == "style" else self.scripts).append(text)
+        self._open, self._buf = None, []
+
+    def close(self):
+        super().close()
+        if self._open: self._flush()
+
+def fetch_asset(url, scope=None):
+    cache = asset_cache()
+    if cache: return cache.fetch(url, scope)
+    try:
+        r = http().get(url, scope=scope, headers=WEB_HEADERS, timeout=15)
+        return r.text if r.status_code == 200 else None
+    except RateLimited: raise
+    except: return None
 
-def scrape_site(url, tag, priority):
-    import requests
-    from bs4 import BeautifulSoup
-    domain = urlparse(url).netloc
-    examples = []
+def scrape_site(url, tag, priority, assets=None, seen=()):
+    # -> [(example, fingerprint)]. Linked stylesheets/scripts are all queued on `assets`
+    # up front, each filtered and cleaned on the CPU pool as it lands, and read back in
+    # page order, so the examples come out exactly as a serial crawl would.
+    # Assets already in `seen` would be dropped by scrape_sites anyway; skip the download.
+    # A page that fails raises FetchFailed; scrape_sites prints it with the site's block.
+    if assets is None:
+        with Scheduler(ASSET_WORKERS) as assets: return scrape_site(url, tag, priority, assets, seen)
+    domain, scope = urlparse(url).netloc, ("sites", url)
+    TELEMETRY.begin(scope)
     try:
-        res = requests.get(url, headers=WEB_HEADERS, timeout=20)
-        if res.status_code != 200: print(f"     ✗ {res.status_code}"); return []
-    except Exception as e: print(f"     ✗ {e}"); return []
-
-    soup = BeautifulSoup(res.text, "html.parser")
-
-    for style in soup.find_all("style"):
-        css = style.get_text(strip=True)
-        if len(css) >= MIN_CSS and good_css(css):
-            examples.append({"type":"css","tag":tag,"priority":priority,"source":url,
-                "instruction":f"Write CSS animations like {domain} ({tag} design)","code":clean_css(css[:8000])})
-
-    for link in soup.find_all("link", rel="stylesheet"):
-        href = link.get("href","")
-        if not href: continue
-        css_url = urljoin(url, href)
-        try:
-            r = requests.get(css_url, headers=WEB_HEADERS, timeout=15)
-            if r.status_code == 200 and len(r.text) >= MIN_CSS and good_css(r.text):
-                examples.append({"type":"css","tag":tag,"priority":priority,"source":css_url,
-                    "instruction":f"Write CSS like {Path(urlparse(css_url).path).name} from {domain} ({tag})",
-                    "code":clean_css(r.text[:10000])})
-            time.sleep(0.2)
-        except: continue
-
-    for script in soup.find_all("script"):
-        if script.get("src"): continue
-        js = script.get_text(strip=True)
-        if len(js) >= MIN_JS and good_js(js):
-            examples.append({"type":"js","tag":tag,"priority":priority,"source":url,
-                "instruction":f"Write JS animation code like {domain} ({tag})","code":clean_js(js[:8000])})
-
-    for script in soup.find_all("script", src=True):
-        src = script.get("src","")
-        if not src or any(s in src for s in SKIP_JS): continue
-        js_url = urljoin(url, src)
-        try:
-            r = requests.get(js_url, headers=WEB_HEADERS, timeout=15)
-            if r.status_code == 200 and len(r.text) >= MIN_JS and good_js(r.text):
-                examples.append({"type":"js","tag":tag,"priority":priority,"source":js_url,
-                    "instruction":f"Write JS like {Path(urlparse(js_url).path).name} from {domain} ({tag})",
-                    "code":clean_js(r.text[:10000])})
-            time.sleep(0.2)
-        except: continue
+        res = http().get(url, scope=scope, headers=WEB_HEADERS, timeout=20)
+        if res.status_code != 200: raise FetchFailed(res.status_code)
+    except (RateLimited, FetchFailed): raise
+    except Exception as e: raise FetchFailed(str(e))
+    styles, stylesheets, scripts, script_srcs = cpu().submit(parse_page, res.text).result()
+
+    css_urls = [urljoin(url, href) for href in stylesheets]
+    js_urls  = [urljoin(url, src) for src in script_srcs if not any(k in src for k in SKIP_JS)]
+    fetches  = {u: assets.submit(fetch_asset, u, scope) for u in css_urls + js_urls if u not in seen}
+    if len(js_urls) < len(script_srcs): TELEMETRY.reject("sites", "js tracking", len(script_srcs) - len(js_urls))
+    linked   = {(u, kind): then(fetches[u], prepare_asset, kind, 10000)
+                for urls, kind in ((css_urls, "css"), (js_urls, "js")) for u in urls if u in fetches}
+    inline   = {kind: [cpu().submit(prepare_asset, text, kind, 8000) for text in blocks]
+                for kind, blocks in (("css", styles), ("js", scripts))}
+    cache    = asset_cache()
+
+    def ready(fut):
+        try: return fut.result()
+        except (CancelledError, BrokenProcessPool): raise
+        except Exception: return None
 
+    examples = []
+    def keep(kind, source, instruction, prep):
+        # prep: (code, fingerprint), or (None, reject reason)
+        code, fp = prep
+        if code is None: TELEMETRY.reject("sites", f"{kind} {fp}"); return False
+        examples.append((asset_example(kind, tag, priority, source, instruction, code), fp))
+        return True
+
+    for kind, urls in (("css", css_urls), ("js", js_urls)):
+        instruction = INLINE_INSTRUCTION[kind].format(domain=domain, tag=tag)
+        for fut in inline[kind]:
+            keep(kind, url, instruction, ready(fut) or (None, "failed"))
+        for u in urls:
+            if (u, kind) not in linked: continue
+            text, prep = ready(linked[(u, kind)]) or (None, (None, "failed"))
+            said = LINKED_INSTRUCTION[kind].format(name=Path(urlparse(u).path).name, domain=domain, tag=tag)
+            if not keep(kind, u, said, prep) and text and cache: cache.reject(u)
     return examples
 
-def scrape_sites(seen_sites=None):
+INLINE_INSTRUCTION = {"css": "Write CSS animations like {domain} ({tag} design)", "js": "Write JS animation code like {domain} ({tag})"}
+LINKED_INSTRUCTION = {"css": "Write CSS like {name} from {domain} ({tag})", "js": "Write JS like {name} from {domain} ({tag})"}
+
+def asset_example(kind, tag, priority, source, instruction, code):
+    return {"type": kind, "tag": tag, "priority": priority, "source": source, "instruction": instruction, "code": code}
+
+def asset_reject(text, kind):
+    # Why a stylesheet / script is not kept, or None
+    if not text: return "empty or failed"
+    if len(text) < (MIN_CSS if kind == "css" else MIN_JS): return "too short"
+    if not (good_css(text) if kind == "css" else good_js(text)): return "no design signals"
+    return None
+
+def clean_asset(text, kind, limit):
+    # Cleaned code (cut to `limit` first) when the stylesheet / script has design signals, else None
+    if asset_reject(text, kind): return None
+    return clean_css(text[:limit]) if kind == "css" else clean_js(text[:limit])
+
+def prepare_asset(text, kind, limit):
+    # CPU half of scrape_site (runs on the CpuPool): (cleaned code, fingerprint),
+    # or (None, reject reason)
+    why = asset_reject(text, kind)
+    if why: return None, why
+    code = clean_asset(text, kind, limit)
+    return code, fingerprint(code)
+
+def parse_page(html):
+    page = PageAssets(html)
+    return page.styles, page.stylesheets, page.scripts, page.script_srcs
+
+def inline_examples(url, tag, priority, blocks, kind):
+    # Inline <style>/<script> blocks; each is cut to 8KB before it is cleaned
+    domain = urlparse(url).netloc
+    instruction = INLINE_INSTRUCTION[kind].format(domain=domain, tag=tag)
+    return [asset_example(kind, tag, priority, url, instruction, code)
+            for code in (clean_asset(text, kind, 8000) for text in blocks) if code is not None]
+
+def scrape_sites(seen_sites=None, emit=None, checkpoint=None, index=None):
     print("\n🎨 DESIGN SITES — Behance + Dribbble quality")
     print("─" * 50)
     results = []
+    if emit is None: emit = results.append
     if seen_sites is None: seen_sites = set()
+    done = checkpoint.done("sites") if checkpoint else set()
+    todo = []
     for site in SITES:
-        url, tag, priority = site["url"], site["tag"], site["priority"]
-        domain = urlparse(url).netloc
-        
-        if url in seen_sites:
-            print(f"\n  🌐 {domain} [{tag}] — Already scraped, skipping...")
+        if site["url"] in done: continue
+        if site["url"] in seen_sites:
+            print(f"\n  🌐 {urlparse(site['url']).netloc} [{site['tag']}] — Already scraped, skipping...")
             continue
-            
-        print(f"\n  🌐 {domain} [{tag}]")
-        ex = scrape_site(url, tag, priority)
-        
-        # Site deduplication for sub-assets
-        filtered_ex = []
-        for e in ex:
-            if e["source"] in seen_sites: continue
-            filtered_ex.append(e)
-            seen_sites.add(e["source"])
-            
-        results.extend(filtered_ex)
-        seen_sites.add(url)
-        
-        css = sum(1 for e in filtered_ex if e["type"]=="css")
-        js  = sum(1 for e in filtered_ex if e["type"]=="js")
-        print(f"     ✓ {css} CSS + {js} JS")
-        time.sleep(1.2)
+        todo.append(site)
+
+    # Sites crawl side by side; results are consumed in SITES order so dedup
+    # decisions match the serial crawl. Per-domain spacing comes from the engine.
+    fetch = lambda site: scrape_site(site["url"], site["tag"], site["priority"], assets, seen_sites)
+    cache = asset_cache()
+    with Scheduler(ASSET_WORKERS, "assets") as assets, Scheduler(SITE_WORKERS, "pages") as pages:
+        for site, fut in prefetch(pages, fetch, todo, SITE_WORKERS):
+            if STOP.is_set(): break
+            url, tag = site["url"], site["tag"]
+            domain = urlparse(url).netloc
+            head, failed = f"\n  🌐 {domain} [{tag}]", None
+            try: ex = fut.result()
+            except CancelledError: break
+            except BrokenProcessPool: raise
+            except FetchFailed as e: ex, failed = [], e
+            except Exception as e:
+                say(head, f"     ✗ {e}")
+                TELEMETRY.end(("sites", url))
+                continue
+
+            if url in seen_sites:
+                say(head + " — Already scraped, skipping...")
+                TELEMETRY.end(("sites", url))
+                continue
+
+            # Site deduplication for sub-assets
+            filtered_ex = []
+            for e, fp in ex:
+                if e["source"] in seen_sites: TELEMETRY.reject("sites", "already stored"); continue
+                if index and not index.add(e["code"], e["source"], fp=fp): TELEMETRY.reject("sites", "duplicate"); continue
+                filtered_ex.append(e)
+                seen_sites.add(e["source"])
+                emit(e)
+
+            seen_sites.add(url)
+
+            css = sum(1 for e in filtered_ex if e["type"]=="css")
+            js  = sum(1 for e in filtered_ex if e["type"]=="js")
+            say(head, f"     ✗ {domain}: {failed}" if failed else f"     ✓ {css} CSS + {js} JS")
+            TELEMETRY.end(("sites", url))
+            if checkpoint: checkpoint.mark("sites", url)
+    if cache and todo:
+        cache.save()
+        cache.report()
     return results
 
+# ============================================================
+# STORAGE — append-only JSONL shards + master manifest
+# ============================================================
+
+DATASETS    = {"github": "rhiley-github-dataset.json", "behance": "rhiley-behance-dataset.json"}
+SHARD_BYTES = 16_000_000
+
+def read_json(path, default):
+    if not path.exists(): return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except: return default
+
+def write_json_atomic(path, data, **kw):
+    # Write next to the target then rename, so a crash never leaves half a file
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, **kw)
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def example_key(e):
+    # Identity of a GitHub file; a newer line with the same key supersedes the old one
+    return f"{e['repo']}:{e['path']}" if "repo" in e and "path" in e else None
+
+def iter_json_array(path, chunk=1 << 16):
+    # Stream items out of a `[...]` dataset without loading the whole file
+    dec = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk).lstrip()
+        if not buf.startswith("["): return
+        buf = buf[1:]
+        while True:
+            buf = buf.lstrip()
+            if buf.startswith(","): buf = buf[1:].lstrip()
+            if buf.startswith("]"): return
+            try:
+                obj, end = dec.raw_decode(buf)
+            except json.JSONDecodeError:
+                more = f.read(chunk)
+                if not more: return
+                buf += more
+                continue
+            yield obj
+            buf = buf[end:]
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try: yield json.loads(line)
+            except ValueError: continue   # torn last line after a crash
+
+def write_json_array(path, items):
+    # Same layout as json.dump(indent=2), one item in memory at a time
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            f.write(",\n  " if n else "\n  ")
+            f.write(json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+            n += 1
+        f.write("\n]" if n else "]")
+    os.replace(tmp, path)
+    return n
+
+class ShardStore:
+    # Examples are appended to shards/<kind>-NNNN.jsonl as they are scraped.
+    # rhiley-master-manifest.json lists the shards; the master dataset is the
+    # github shards followed by the behance shards, never a third copy. A key
+    # appended again (a refreshed file) supersedes its earlier line. Scrapers hand
+    # examples to the "write" stage; only its thread touches the shard files.
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.manifest_path = folder / "rhiley-master-manifest.json"
+        self.manifest = read_json(self.manifest_path, {"format": "jsonl-shards", "datasets": {}})
+        self.lock = threading.Lock()
+        self.handles = {}
+        (folder / "shards").mkdir(parents=True, exist_ok=True)
+        self.migrate()
+        self.writer = Stage("write", lambda item: self.append(*item))
+
+    def shards(self, kind):
+        return self.manifest["datasets"].setdefault(kind, {"shards": []})["shards"]
+
+    def migrate(self):
+        # One-off import of the legacy JSON datasets into shards
+        for kind, name in DATASETS.items():
+            if self.manifest["datasets"].get(kind, {}).get("shards") or not (self.folder / name).exists(): continue
+            n = 0
+            for item in iter_json_array(self.folder / name):
+                self.append(kind, item)
+                n += 1
+            print(f"📦 Migrated {n} examples from {name} into shards/")
+            self.close_handle(kind)
+        self.save()
+
+    def open_shard(self, kind, need):
+        shards = self.shards(kind)
+        if not shards or shards[-1]["bytes"] + need > SHARD_BYTES:
+            self.close_handle(kind)
+            shards.append({"file": f"shards/{kind}-{len(shards):04d}.jsonl", "count": 0, "bytes": 0})
+        if kind not in self.handles:
+            path = self.folder / shards[-1]["file"]
+            f = open(path, "ab")
+            if f.tell():
+                # A torn last line (killed mid-write) gets its newline before we append
+                with open(path, "rb") as g:
+                    g.seek(-1, os.SEEK_END)
+                    if g.read(1) != b"\n": f.write(b"\n")
+            shards[-1]["bytes"] = f.tell()
+            self.handles[kind] = f
+        return shards[-1], self.handles[kind]
+
+    def append(self, kind, example):
+        line = (json.dumps(example, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            shard, f = self.open_shard(kind, len(line))
+            f.write(line)
+            f.flush()
+            shard["count"] += 1
+            shard["bytes"] += len(line)
+
+    def sink(self, kind):
+        return lambda example: self.writer.put((kind, example))
+
+    def checkpoint_state(self):
+        # Shards are already durable once the writer has caught up; a checkpoint
+        # only needs the frontier
+        self.writer.join()
+        self.save()
+        return {}
+
+    def restore(self, state):
+        pass
+
+    def iter(self, kind):
+        files = [self.folder / s["file"] for s in self.shards(kind)]
+        files = [p for p in files if p.exists()]
+        last = {}
+        for pos, item in enumerate(e for p in files for e in iter_jsonl(p)):
+            key = example_key(item)
+            if key: last[key] = pos
+        for pos, item in enumerate(e for p in files for e in iter_jsonl(p)):
+            key = example_key(item)
+            if key is None or last[key] == pos: yield item
+
+    def size_mb(self):
+        return round(sum(s["bytes"] for k in DATASETS for s in self.shards(k)) / 1_000_000, 2)
+
+    def close_handle(self, kind):
+        f = self.handles.pop(kind, None)
+        if f: f.close()
+
+    def save(self):
+        with self.lock:
+            self.manifest["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            write_json_atomic(self.manifest_path, self.manifest, indent=2)
+
+    def close(self):
+        self.writer.close()
+        for kind in list(self.handles): self.close_handle(kind)
+        self.save()
+        for kind in DATASETS:
+            shards = self.shards(kind)
+            print(f"  ✓ {kind}: {len(shards)} shards, {round(sum(s['bytes'] for s in shards) / 1_000_000, 2)} MB")
+
+    def json_stale(self):
+        # True when a JSON view is missing or older than a shard (an earlier run that
+        # was interrupted or skipped the export), so export_json has work to do
+        views = [self.folder / name for name in DATASETS.values()]
+        if not all(p.exists() for p in views): return True
+        shards = [self.folder / s["file"] for k in DATASETS for s in self.shards(k)]
+        newest = max((p.stat().st_mtime for p in shards if p.exists()), default=0)
+        return newest > min(p.stat().st_mtime for p in views)
+
+    def export_json(self):
+        # Rebuild the per-kind JSON views (streams, one item at a time). The master is
+        # the manifest itself (chat/lib/masterDataset.ts reads it), never a third copy.
+        for kind, name in DATASETS.items():
+            n = write_json_array(self.folder / name, self.iter(kind))
+            print(f"  ✓ {name} - {n} items")
+
+class JsonStore:
+    # Legacy mode: whole datasets in memory, rewritten as JSON at the end
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.data = {kind: read_json(folder / name, []) for kind, name in DATASETS.items()}
+        self.new = {kind: [] for kind in DATASETS}
+
+    def sink(self, kind):
+        return self.new[kind].append
+
+    def iter(self, kind):
+        yield from self.data[kind]
+        yield from self.new[kind]
+
+    def checkpoint_state(self):
+        # Nothing is on disk until close(), so checkpoints carry the new examples
+        return {"pending": {kind: list(items) for kind, items in self.new.items()}}
+
+    def restore(self, state):
+        for kind, items in state.get("pending", {}).items(): self.new[kind].extend(items)
+
+    def size_mb(self):
+        paths = [self.folder / name for name in DATASETS.values()]
+        return round(sum(p.stat().st_size for p in paths if p.exists()) / 1_000_000, 2)
+
+    def close(self):
+        # Merge — a refreshed file replaces its old copy in place
+        for kind, items in self.data.items():
+            index = {example_key(item): i for i, item in enumerate(items) if example_key(item)}
+            for item in self.new[kind]:
+                i = index.get(example_key(item))
+                if i is None: items.append(item)
+                else: items[i] = item
+            self.new[kind] = []
+        self.export_json()
+
+    def export_json(self):
+        # No master copy — chat/lib/masterDataset.ts reads the two views in order
+        files = {name: self.data[kind] for kind, name in DATASETS.items()}
+        for name, data in files.items():
+            path = self.folder / name
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            size = round(path.stat().st_size / 1_000_000, 2)
+            print(f"  ✓ {name} ({size} MB) - {len(data)} items total")
+
+# ============================================================
+# CONTENT INDEX — normalized-code hash + SimHash near-dup check
+# ============================================================
+
+NEAR_DUP      = True    # also drop near-identical copies (forks, re-minified bundles)
+NEAR_DUP_BITS = 3       # max SimHash Hamming distance that still counts as a copy
+NEAR_DUP_MIN  = 400     # shorter code is only checked for exact duplicates
+
+COMMENT_RE = re.compile(r"/\*.*?\*/|<!--.*?-->|(?<![:\"'\\])//[^\n]*", re.DOTALL)
+TOKEN_RE   = re.compile(r"\w+|[^\w\s]")
+
+def normalize_code(code):
+    return re.sub(r"\s+", " ", COMMENT_RE.sub("", code)).strip()
+
+def fingerprint(code):
+    # (content hash, SimHash or None): the CPU-heavy half of ContentIndex.add
+    norm = normalize_code(code)
+    sim = simhash(norm) if NEAR_DUP and len(norm) >= NEAR_DUP_MIN else None
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest(), sim
+
+def example_fingerprint(item):
+    return fingerprint(item.get("code", ""))
+
+def simhash(text, n=4):
+    tokens = TOKEN_RE.findall(text)
+    shingles = {" ".join(tokens[i:i + n]) for i in range(max(len(tokens) - n + 1, 1))}
+    rows = [format(int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big"), "064b") for s in shingles]
+    # Column-wise majority vote over the 64 bit positions
+    half = len(rows) / 2
+    return int("".join("1" if col.count("1") > half else "0" for col in zip(*rows)), 2)
+
+class ContentIndex:
+    # Persisted next to the datasets as rhiley-content-index.json:
+    #   entries  [content_hash, simhash, key]  — one per kept example
+    #   blobs    {git blob sha: content_hash}  — lets forks skip the download entirely
+    # SimHashes are split into 4 x 16-bit bands; any copy within 3 bits shares a band.
+    # Each key keeps only its latest content, so a refreshed file is never a
+    # near-copy of its own previous version.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hashes, self.blobs, self.keys = {}, {}, {}   # keys: key -> (content_hash, simhash)
+        self.bands = [defaultdict(list) for _ in range(4)]
+        self.skipped = defaultdict(int)
+        data = read_json(path, None)
+        self.fresh = data is None
+        for h, sim, key in (data or {}).get("entries", []):
+            self._insert(h, int(sim, 16) if sim else None, key)
+        self.blobs.update((data or {}).get("blobs", {}))
+
+    def _insert(self, h, sim, key):
+        old = self.keys.pop(key, None)
+        if old is not None: self._drop(key, *old)
+        self.keys[key] = (h, sim)
+        self.hashes[h] = key
+        if sim is not None:
+            for b in range(4): self.bands[b][(sim >> (16 * b)) & 0xFFFF].append((sim, key))
+
+    def _drop(self, key, h, sim):
+        if self.hashes.get(h) == key: del self.hashes[h]
+        if sim is not None:
+            for b in range(4):
+                band = self.bands[b].get((sim >> (16 * b)) & 0xFFFF)
+                if band and (sim, key) in band: band.remove((sim, key))
+
+    def _near(self, sim, key):
+        for b in range(4):
+            for other, owner in self.bands[b].get((sim >> (16 * b)) & 0xFFFF, ()):
+                if owner != key and bin(sim ^ other).count("1") <= NEAR_DUP_BITS: return True
+        return False
+
+    def known_blob(self, sha):
+        return sha is not None and sha in self.blobs
+
+    def add(self, code, key, blob=None, fp=None):
+        # False when the code duplicates an example stored under another key.
+        # fp: fingerprint(code) when it was already computed on the CPU pool
+        h, sim = fp or fingerprint(code)
+        with self.lock:
+            if blob: self.blobs[blob] = h
+            owner = self.hashes.get(h)
+            if owner is not None:
+                if owner == key: return True
+                self.skipped["exact"] += 1
+                return False
+            if sim is not None and self._near(sim, key):
+                self.skipped["near"] += 1
+                return False
+            self._insert(h, sim, key)
+            return True
+
+    def save(self):
+        with self.lock:
+            entries = [[h, format(sim, "016x") if sim is not None else None, key] for key, (h, sim) in self.keys.items()]
+            data = {"entries": entries, "blobs": dict(self.blobs)}
+        write_json_atomic(self.path, data)
+
+# ============================================================
+# CHECKPOINTS — crawl frontier (+ unsaved examples) for --resume
+# ============================================================
+
+CHECKPOINT_EVERY = 30   # seconds between periodic checkpoints
+
+class Checkpoint:
+    def __init__(self, folder, store, manifest, manifest_path, index=None, resume=False):
+        self.path = folder / "rhiley-scrape-checkpoint.json"
+        self.store, self.manifest, self.manifest_path, self.index = store, manifest, manifest_path, index
+        self.lock = threading.Lock()
+        self.state = {"repos": [], "sites": []}
+        self.saved_at = time.time()
+        if resume:
+            saved = read_json(self.path, None)
+            if saved:
+                self.state = {"repos": saved.get("repos", []), "sites": saved.get("sites", [])}
+                store.restore(saved)
+                print(f"↻ Resuming checkpoint from {saved.get('saved_at', '?')}")
+            else: print("↻ No checkpoint found — starting fresh")
+
+    def done(self, kind):
+        return set(self.state[kind])
+
+    def mark(self, kind, name):
+        with self.lock: self.state[kind].append(name)
+        if time.time() - self.saved_at >= CHECKPOINT_EVERY: self.save()
+
+    def save(self):
+        with self.lock:
+            data = dict(self.store.checkpoint_state(), saved_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        repos=list(self.state["repos"]), sites=list(self.state["sites"]))
+            with STATE_LOCK: manifest = json.dumps(self.manifest)
+            write_json_atomic(self.path, data, ensure_ascii=False)
+            tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+            tmp.write_text(manifest, encoding="utf-8")
+            os.replace(tmp, self.manifest_path)
+            if self.index: self.index.save()
+            self.saved_at = time.time()
+
+    def clear(self):
+        if self.path.exists(): self.path.unlink()
+
+# ============================================================
+# BENCHMARK — page extraction, old BeautifulSoup path vs PageAssets
+# ============================================================
+
+def _legacy_extract(html):
+    # What scrape_site did before PageAssets: full soup + per-signal lowercase scans
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    good_css = lambda css: sum(1 for s in CSS_SIGNALS if s in css.lower()) >= 2
+    good_js  = lambda js: any(s in js for s in JS_SIGNALS)
+    clean_css = lambda css: re.sub(r"\s+", " ", re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)).strip()
+    clean_js  = lambda js: re.sub(r"/\*.*?\*/", "", re.sub(r"//# sourceMappingURL=.*$", "", js, flags=re.MULTILINE), flags=re.DOTALL).strip()
+    styles  = [st.get_text(strip=True) for st in soup.find_all("style")]
+    links   = [l.get("href", "") for l in soup.find_all("link", rel="stylesheet") if l.get("href", "")]
+    scripts = [sc.get_text(strip=True) for sc in soup.find_all("script") if not sc.get("src")]
+    srcs    = [sc.get("src", "") for sc in soup.find_all("script", src=True) if sc.get("src", "")]
+    code = [clean_css(c[:8000]) for c in styles if len(c) >= MIN_CSS and good_css(c)] + \
+           [clean_js(j[:8000]) for j in scripts if len(j) >= MIN_JS and good_js(j)]
+    return links, srcs, code
+
+def _fast_extract(html):
+    page = PageAssets(html)
+    code = [e["code"] for e in inline_examples("", "", "", page.styles, "css") + inline_examples("", "", "", page.scripts, "js")]
+    return page.stylesheets, page.script_srcs, code
+
+EXTRACT_FIXTURES = Path(__file__).with_name("tests") / "fixtures" / "html"
+
+def bench_extract(folder=EXTRACT_FIXTURES, repeat=5):
+    # Times both paths over saved pages (the committed fixtures, or your own, e.g.
+    # `curl -o linear.html https://linear.app`) and checks they pull out the same
+    # assets and inline examples
+    try: import bs4
+    except ImportError: print("beautifulsoup4 is needed for the comparison: pip install beautifulsoup4"); return
+    files = sorted(Path(folder).glob("*.htm*"))
+    if not files: print(f"No .html fixtures in {folder}"); return
+    print(f"\n⏱  Extraction benchmark — best of {repeat}")
+    print(f"   {'page':<32} {'KB':>7} {'soup ms':>9} {'fast ms':>9} {'speedup':>8}  same")
+    total_old = total_new = 0.0
+    for f in files:
+        html = f.read_text(encoding="utf-8", errors="replace")
+        timings = []
+        for fn in (_legacy_extract, _fast_extract):
+            best = float("inf")
+            for _ in range(repeat):
+                t = time.perf_counter(); out = fn(html); best = min(best, time.perf_counter() - t)
+            timings.append((best, out))
+        (t_old, out_old), (t_new, out_new) = timings
+        total_old += t_old; total_new += t_new
+        print(f"   {f.name[:32]:<32} {len(html) / 1024:7.0f} {t_old * 1000:9.1f} {t_new * 1000:9.1f} "
+              f"{t_old / max(t_new, 1e-9):7.1f}x  {'✓' if out_old == out_new else '✗'}")
+    print(f"   {'TOTAL':<32} {'':>7} {total_old * 1000:9.1f} {total_new * 1000:9.1f} {total_old / max(total_new, 1e-9):7.1f}x")
+
 # ============================================================
 # MAIN
 # ============================================================
@@ -434,91 +2092,211 @@ def install_deps():
     pkgs = []
     try: import requests
     except: pkgs.append("requests")
-    try: import bs4
-    except: pkgs.append("beautifulsoup4")
     if pkgs:
         print(f"Installing: {pkgs}")
         subprocess.run([sys.executable, "-m", "pip", "install"] + pkgs, check=True)
         print("Done. Restarting...")
         os.execv(sys.executable, [sys.executable] + sys.argv)
 
-def main():
-    import datetime
+def update_search_index(store):
+    # Index the shard lines this run appended (rhiley_index.py; needs numpy). The
+    # legacy JSON store has no stable line offsets to point at, so it is not indexed.
+    if not isinstance(store, ShardStore): return None
+    try: import rhiley_index
+    except ImportError as e:
+        print(f"⚠️  Search index not updated ({e.name} is not installed)")
+        return None
+    info = rhiley_index.update(OUTPUT_FOLDER)
+    TELEMETRY.lap("index")
+    return info
+
+def parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Rhiley mega scraper")
+    ap.add_argument("--storage", choices=["jsonl", "json"], default="jsonl",
+                    help="jsonl: append to shards as examples arrive (default); json: legacy full rewrite")
+    ap.add_argument("--export-json", action="store_true",
+                    help="also rebuild rhiley-github-dataset.json / rhiley-behance-dataset.json from the shards "
+                         "when they are behind (the chat app reads the master manifest and needs neither)")
+    ap.add_argument("--resume", action="store_true",
+                    help="skip repos and sites finished by an interrupted run (rhiley-scrape-checkpoint.json)")
+    ap.add_argument("--budget-files", type=int, default=FILE_BUDGET,
+                    help=f"GitHub blob downloads this run, split across repos by priority (default {FILE_BUDGET})")
+    ap.add_argument("--budget-mb", type=float, default=BYTE_BUDGET / 1e6,
+                    help=f"GitHub blob megabytes this run (default {BYTE_BUDGET / 1e6:.0f})")
+    ap.add_argument("--source", default="api", metavar="api|tarball|DIR",
+                    help="api: tree listing + one request per file (default); tarball: one archive per repo; "
+                         "DIR: local clones (<owner>/<repo> or <owner>__<repo>) and <owner>__<repo>.tar.gz files")
+    ap.add_argument("--cpu-workers", type=int, default=CPU_WORKERS,
+                    help=f"processes for filtering, cleaning and fingerprinting (default {CPU_WORKERS}, 0 = inline)")
+    ap.add_argument("--output", metavar="DIR", default=str(OUTPUT_FOLDER),
+                    help="dataset folder (default: OUTPUT_FOLDER at the top of this file)")
+    ap.add_argument("--record", metavar="DIR",
+                    help="save every HTTP response into a cassette folder for scraper_bench.py")
+    ap.add_argument("--replay", metavar="URL",
+                    help="fetch everything from a scraper_bench.py stub server instead of the network")
+    ap.add_argument("--no-throttle", action="store_true",
+                    help="lift the per-host request rates (meant for --replay benchmarks)")
+    ap.add_argument("--no-index", action="store_true",
+                    help="skip updating the search index (rhiley_index.py) after the run")
+    ap.add_argument("--profile", metavar="FILE",
+                    help="sample every thread's stack while scraping; folded stacks go to FILE (flamegraph / speedscope)")
+    ap.add_argument("--bench-extract", metavar="DIR", nargs="?", const=str(EXTRACT_FIXTURES),
+                    help="time page extraction over saved .html files in DIR (default: tests/fixtures/html) and exit")
+    args = ap.parse_args(argv)
+    if args.source not in ("api", "tarball") and not Path(args.source).is_dir():
+        ap.error(f"--source: no such folder: {args.source}")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.bench_extract: return bench_extract(args.bench_extract)
     install_deps()
+    sampler = Sampler(args.profile) if args.profile else None
+    try: run(args)
+    finally:
+        if sampler: sampler.stop()
+        if _ENGINE and _ENGINE.recorder: _ENGINE.recorder.save()
+
+def run(args):
+    global CPU_WORKERS, OUTPUT_FOLDER, DEFAULT_RATE
+    import datetime
+    OUTPUT_FOLDER = Path(args.output)
+    if args.no_throttle:
+        HOST_RATES.clear()
+        DEFAULT_RATE = (1e9, 1e9)
+    if args.record: http().recorder = Cassette(args.record)
+    if args.replay: http().rewrite = replay_rewrite(args.replay)
     OUTPUT_FOLDER.mkdir(parents=True, exist_ok=True)
     start = time.time()
+    CPU_WORKERS = max(0, args.cpu_workers)
+    monitor = QueueMonitor()
 
     print("\n" + "="*60)
     print("🧠 RHILEY MEGA SCRAPER (Deduplication Enabled)")
     print(f"📁 Saving to: {OUTPUT_FOLDER}")
     print("="*60)
 
-    # Load existing data
-    github_dataset_path = OUTPUT_FOLDER / "rhiley-github-dataset.json"
-    behance_dataset_path = OUTPUT_FOLDER / "rhiley-behance-dataset.json"
-    
-    existing_github = []
-    if github_dataset_path.exists():
-        try:
-            with open(github_dataset_path, "r", encoding="utf-8") as f:
-                existing_github = json.load(f)
-        except: existing_github = []
-        
-    existing_behance = []
-    if behance_dataset_path.exists():
-        try:
-            with open(behance_dataset_path, "r", encoding="utf-8") as f:
-                existing_behance = json.load(f)
-        except: existing_behance = []
-
-    # Map existing to seen sets
-    seen_github = {f"{item['repo']}:{item['path']}" for item in existing_github if 'repo' in item and 'path' in item}
-    seen_sites = {item['source'] for item in existing_behance if 'source' in item}
-    
+    # Load existing data — streamed, only keys stay in memory
+    TELEMETRY.lap()
+    store = ShardStore(OUTPUT_FOLDER) if args.storage == "jsonl" else JsonStore(OUTPUT_FOLDER)
+    manifest_path = OUTPUT_FOLDER / "rhiley-github-manifest.json"
+    manifest = read_json(manifest_path, {})
+    index = ContentIndex(OUTPUT_FOLDER / "rhiley-content-index.json")
+    checkpoint = Checkpoint(OUTPUT_FOLDER, store, manifest, manifest_path, index, resume=args.resume)
+
+    # First run with the content index: hash everything already in the corpus,
+    # fingerprints computed on the CPU pool a window ahead of the (ordered) inserts
+    if index.fresh: print("📍 Building content index from existing examples...")
+    def with_fingerprints(items):
+        if not index.fresh: return ((item, None) for item in items)
+        return ((item, fut.result()) for item, fut in prefetch(cpu(), example_fingerprint, items, QUEUE_DEPTH))
+    seen_github, seen_sites = set(), set()
+    existing_github = existing_behance = 0
+    for item, fp in with_fingerprints(store.iter("github")):
+        existing_github += 1
+        if "repo" not in item or "path" not in item: continue
+        key = f"{item['repo']}:{item['path']}"
+        seen_github.add(key)
+        seed_manifest(manifest, item)
+        if index.fresh: index.add(item.get("code", ""), key, blob=manifest[item["repo"]]["blobs"].get(item["path"]), fp=fp)
+    for item, fp in with_fingerprints(store.iter("behance")):
+        existing_behance += 1
+        if "source" in item: seen_sites.add(item["source"])
+        if index.fresh and "source" in item: index.add(item.get("code", ""), item["source"], fp=fp)
+    index.skipped.clear()
+
     print(f"📍 Found {len(seen_github)} existing GitHub files.")
     print(f"📍 Found {len(seen_sites)} existing design assets.")
-
-    # Scrape NEW data
-    new_github_data = scrape_github(seen_github)
-    new_site_data   = scrape_sites(seen_sites)
-    
-    # Merge
-    total_github = existing_github + new_github_data
-    total_behance = existing_behance + new_site_data
-    master         = total_github + total_behance
-
-    # Save all 3 files
-    files = {
-        "rhiley-github-dataset.json":  total_github,
-        "rhiley-behance-dataset.json": total_behance,
-        "rhiley-master-dataset.json":  master,
-    }
-    for name, data in files.items():
-        path = OUTPUT_FOLDER / name
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        size = round(path.stat().st_size / 1_000_000, 2)
-        print(f"  ✓ {name} ({size} MB) - {len(data)} items total")
+    TELEMETRY.lap("load")
+
+    counts = defaultdict(int)
+    def sink(kind):
+        write = store.sink(kind)
+        def emit(item):
+            if kind == "github" and example_key(item) in seen_github: counts["refreshed"] += 1
+            write(item)
+            counts[kind] += 1
+        return emit
+
+    # Scrape NEW data — GitHub and sites run side by side so a parked
+    # GitHub host never stalls the design-site crawl
+    pool = ThreadPoolExecutor(2)
+    jobs = [pool.submit(scrape_github, seen_github, manifest, sink("github"), checkpoint, index,
+                        args.budget_files, int(args.budget_mb * 1e6), args.source),
+            pool.submit(scrape_sites, seen_sites, sink("behance"), checkpoint, index)]
+    interrupted = finished = False
+    try:
+        for job in jobs: job.result()
+        finished = True
+    except KeyboardInterrupt:
+        interrupted = True
+        print("\n⏸  Interrupted — letting in-flight requests finish, then saving a checkpoint...")
+    finally:
+        # Ctrl-C or a crash: nothing new starts, the scrape jobs drain and what was kept
+        # is saved. A second Ctrl-C only skips the drain; close + save still run.
+        if not finished:
+            STOP.set()
+            for job in jobs: job.cancel()
+            try: wait(jobs)
+            except KeyboardInterrupt: print("⏩ Not waiting for in-flight requests")
+            try: store.close()
+            finally: checkpoint.save()
+        pool.shutdown(wait=finished)
+        cpu().shutdown(wait=finished)
+        queues = monitor.stop()
+        TELEMETRY.lap("scrape")
+
+    if interrupted:
+        print(f"💾 Checkpoint saved — {counts['github']} GitHub + {counts['behance']} site examples kept.")
+        print("   Run again with --resume to continue.")
+        return
+
+    updated_github = counts["refreshed"]
+    new_github = counts["github"] - updated_github
+    new_sites = counts["behance"]
+    total = existing_github + new_github + existing_behance + new_sites
+
+    store.close()
+    write_json_atomic(manifest_path, manifest)
+    index.save()
+    checkpoint.clear()
+    TELEMETRY.lap("save")
+    if args.export_json and isinstance(store, ShardStore) and store.json_stale():
+        store.export_json()
+        TELEMETRY.lap("export")
+    search_index = update_search_index(store) if not args.no_index else None
 
     # Stats
     elapsed = round(time.time() - start, 1)
     stats = {
         "scraped_at": datetime.datetime.now().isoformat(),
         "time_seconds": elapsed,
-        "new_github_count": len(new_github_data),
-        "new_sites_count": len(new_site_data),
-        "cumulative_total": len(master),
-        "master_mb": round((OUTPUT_FOLDER/"rhiley-master-dataset.json").stat().st_size/1_000_000, 2),
+        "storage": args.storage,
+        "new_github_count": new_github,
+        "updated_github_count": updated_github,
+        "new_sites_count": new_sites,
+        "duplicates_skipped": dict(index.skipped),
+        "skipped_before_download": dict(PREFILTER),
+        "pipeline": queues,
+        "cumulative_total": total,
+        "master_mb": store.size_mb(),
+        "search_index": search_index,
+        "telemetry": TELEMETRY.summary(_ENGINE.summary() if _ENGINE else {}),
     }
     with open(OUTPUT_FOLDER / "rhiley-scrape-stats.json", "w") as f:
         json.dump(stats, f, indent=2)
 
     print(f"\n{'='*60}")
     print("✅ DONE!")
-    print(f"   New GitHub:  {len(new_github_data)} files")
-    print(f"   New Sites:   {len(new_site_data)} assets")
-    print(f"   Grand Total: {len(master)} examples")
+    print(f"   New GitHub:  {new_github} files ({updated_github} refreshed)")
+    print(f"   New Sites:   {new_sites} assets")
+    print(f"   Duplicates:  {index.skipped['exact']} exact + {index.skipped['near']} near copies skipped")
+    print(f"   Grand Total: {total} examples")
     print(f"   Time:        {elapsed}s")
+    if _ENGINE: _ENGINE.report()
+    print("\n⛓  Stages (peak queue / items): " + ", ".join(f"{n} {q['peak']}/{q['done']}" for n, q in queues.items()))
+    TELEMETRY.report(stats["telemetry"])
     print(f"{'='*60}\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,570 @@
+"""
+============================================================
+RHILEY SEARCH INDEX
+BM25 over the scraped master dataset, with tag / priority facets
+Built and updated by mega_scraper.py after every run
+
+  python rhiley_index.py search "UI COMP" "glass card hover" --tag saas-dark
+  python rhiley_index.py update "UI COMP"        # index shard lines added since last time
+  python rhiley_index.py build "UI COMP"         # from scratch
+  python rhiley_index.py bench --synthetic 100000
+============================================================
+"""
+
+import os, re, json, time, shutil, hashlib, tempfile
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+import mega_scraper as ms
+
+# ============================================================
+# LAYOUT
+# ============================================================
+#
+# <dataset folder>/rhiley-search-index/
+#   meta.json        segments, shard files and how many bytes of each are indexed,
+#                    tag vocabulary, generation
+#   seg-NNNNNN/      one immutable segment per update, every array an .npy file
+#                    opened with mmap_mode="r", so opening the index reads no postings:
+#     terms          uint64  sorted hashes of the segment's terms
+#     offsets        int64   postings of terms[i] are docs/tfs[offsets[i]:offsets[i + 1]]
+#     docs, tfs      uint32 / uint16, doc ids ascending within a term
+#     doclen         field-weighted term count per doc
+#     tag, priority  facet ids per doc (meta.json tags / PRIORITIES)
+#     source, offset, length   where the doc's JSON line sits in the shards
+#     keys           hash of repo:path (0 for site assets), to find superseded lines
+#   live-<segment>-<generation>.npy   docs not superseded by a later line
+#
+# Updates read the shards from the last indexed byte, write one new segment and
+# new live files, then swap meta.json in one rename; readers holding the old
+# meta.json keep a consistent view. Past MAX_SEGMENTS the small segments are merged
+# and superseded docs dropped.
+
+INDEX_DIR     = "rhiley-search-index"
+K1, B         = 1.2, 0.75
+FIELD_WEIGHTS = (("instruction", 3), ("tag", 3), ("path", 2), ("code", 1))
+CODE_CHARS    = 20_000     # identifiers are taken from the first 20KB of code
+SEGMENT_DOCS  = 65_536
+MAX_SEGMENTS  = 8
+PRIORITIES    = ("high", "medium", "low")   # anything else is "other"
+
+WORD_RE = re.compile(r"[A-Za-z_$][\w$]*")
+PART_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+STOP = set("""
+a an and are as at be by for from in is it of on or the this that to with like using write show code
+var let const function return if else new import export default true false null undefined this void
+typeof instanceof await async try catch finally throw for while do break continue switch case
+""".split())
+
+# ============================================================
+# TERMS
+# ============================================================
+
+_WORDS = {}
+
+def word_terms(word):
+    # "useSpringValue" -> hashes of usespringvalue, use, spring, value (cached per word)
+    hit = _WORDS.get(word)
+    if hit is not None: return hit
+    if len(_WORDS) > 1_000_000: _WORDS.clear()
+    out = []
+    for t in dict.fromkeys([word.lower().strip("_$")] + [p.lower() for p in PART_RE.findall(word)]):
+        if 2 <= len(t) <= 40 and t not in STOP and not t.isdigit(): out.append(term_hash(t))
+    _WORDS[word] = out = tuple(out)
+    return out
+
+def term_hash(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+def key_hash(key):
+    return term_hash(key) if key else 0
+
+def field_text(example, field):
+    if field == "path": return example.get("path") or urlparse(example.get("source") or "").path
+    if field == "code": return (example.get("code") or "")[:CODE_CHARS]
+    return example.get(field) or ""
+
+def doc_terms(example):
+    # {term hash: field-weighted count}
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for word, n in Counter(WORD_RE.findall(field_text(example, field))).items():
+            for h in word_terms(word): counts[h] += n * weight
+    return counts
+
+def query_terms(text):
+    # {term hash: repeats}; a query is short, so no field weights
+    counts = Counter()
+    for word in WORD_RE.findall(text):
+        for h in word_terms(word): counts[h] += 1
+    return counts
+
+# ============================================================
+# SEGMENTS
+# ============================================================
+
+DOC_ARRAYS = ("doclen", "tag", "priority", "source", "offset", "length", "keys")
+
+class SegmentWriter:
+    # Collects docs, then writes them as one segment sorted by (term, doc)
+
+    def __init__(self):
+        self.terms, self.docs, self.tfs = [], [], []
+        self.cols = {name: [] for name in DOC_ARRAYS}
+
+    def __len__(self):
+        return len(self.cols["doclen"])
+
+    def add(self, counts, tag, priority, source, offset, length, key):
+        doc = len(self)
+        self.terms.append(np.fromiter(counts.keys(), np.uint64, len(counts)))
+        self.tfs.append(np.fromiter(counts.values(), np.int64, len(counts)))
+        self.docs.append(np.full(len(counts), doc, np.uint32))
+        for name, value in zip(DOC_ARRAYS, (sum(counts.values()), tag, priority, source, offset, length, key)):
+            self.cols[name].append(value)
+        return doc
+
+    def arrays(self):
+        empty = (np.zeros(0, np.uint64), np.zeros(0, np.uint32), np.zeros(0, np.int64))
+        terms, docs, tfs = (np.concatenate(parts) if parts else e for parts, e in zip((self.terms, self.docs, self.tfs), empty))
+        cols = {name: np.array(values, DTYPES[name]) for name, values in self.cols.items()}
+        return terms, docs, tfs, cols
+
+    def write(self, folder):
+        write_segment(folder, *self.arrays())
+
+DTYPES = {"doclen": np.uint32, "tag": np.uint16, "priority": np.uint8, "source": np.uint32,
+          "offset": np.int64, "length": np.uint32, "keys": np.uint64}
+
+def write_segment(folder, terms, docs, tfs, cols):
+    # terms / docs / tfs: one entry per (term, doc) pair, any order
+    order = np.lexsort((docs, terms))
+    terms, docs, tfs = terms[order], docs[order], np.minimum(tfs[order], 65535)
+    uniq, starts = np.unique(terms, return_index=True)
+    tmp = folder.with_name(folder.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    arrays = {"terms": uniq, "offsets": np.append(starts, len(terms)).astype(np.int64),
+              "docs": docs.astype(np.uint32), "tfs": tfs.astype(np.uint16)}
+    arrays.update(cols)
+    for name, a in arrays.items(): np.save(tmp / f"{name}.npy", a)
+    os.replace(tmp, folder)
+
+class Segment:
+
+    def __init__(self, folder, live):
+        self.folder = folder
+        for name in ("terms", "offsets", "docs", "tfs") + DOC_ARRAYS:
+            setattr(self, name, np.load(folder / f"{name}.npy", mmap_mode="r"))
+        self.live = np.load(folder.parent / live) if live else np.ones(len(self.doclen), bool)
+
+    def __len__(self):
+        return len(self.doclen)
+
+    def postings(self, h):
+        # (doc ids, term counts) of one term hash; empty arrays when absent
+        h = np.uint64(h)
+        i = int(np.searchsorted(self.terms, h))
+        if i == len(self.terms) or self.terms[i] != h: return self.docs[:0], self.tfs[:0]
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.docs[start:end], self.tfs[start:end]
+
+    def live_arrays(self):
+        # Postings and doc columns without superseded docs, doc ids renumbered
+        keep = np.asarray(self.live)
+        new_id = np.cumsum(keep, dtype=np.int64) - 1
+        counts = np.diff(np.asarray(self.offsets))
+        terms = np.repeat(np.asarray(self.terms), counts)
+        docs, tfs = np.asarray(self.docs), np.asarray(self.tfs)
+        alive = keep[docs]
+        cols = {name: np.asarray(getattr(self, name))[keep] for name in DOC_ARRAYS}
+        return terms[alive], new_id[docs[alive]].astype(np.uint32), tfs[alive].astype(np.int64), cols
+
+# ============================================================
+# SEARCH
+# ============================================================
+
+class SearchIndex:
+    # Read side. Opening maps the segments and builds three per-doc vectors
+    # (BM25 length norm, live mask, facets); a query touches only the postings of
+    # its own terms. Reopen to see later updates.
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.root = self.folder / INDEX_DIR
+        self.meta = read_meta(self.root)
+        self.segments = [Segment(self.root / s["dir"], s.get("live")) for s in self.meta["segments"]]
+        self.bases = np.cumsum([0] + [len(s) for s in self.segments])
+        self.n = int(self.bases[-1])
+        self.tags = self.meta["tags"]
+        self.tag_ids = {t: i for i, t in enumerate(self.tags)}
+        cat = lambda name, dtype: (np.concatenate([np.asarray(getattr(s, name)) for s in self.segments]).astype(dtype)
+                                   if self.segments else np.zeros(0, dtype))
+        self.live = cat("live", bool)
+        self.tag, self.priority = cat("tag", np.uint16), cat("priority", np.uint8)
+        doclen = cat("doclen", np.float32)
+        self.docs_live = int(self.live.sum())
+        self.spans = [(seg, slice(int(lo), int(hi)), bool(seg.live.all()))
+                      for seg, lo, hi in zip(self.segments, self.bases, self.bases[1:])]
+        avgdl = float(doclen[self.live].mean()) if self.docs_live else 1.0
+        self.norm = (K1 * (1 - B + B * doclen / max(avgdl, 1.0))).astype(np.float32)
+        self.files = self.meta["files"]
+
+    def mask(self, tag=None, priority=None):
+        # Live docs passing the facet filters; tag / priority may be a value or a list
+        keep = self.live.copy()
+        for values, column, ids in ((tag, self.tag, self.tag_ids), (priority, self.priority, PRIORITY_IDS)):
+            if values is None: continue
+            values = [values] if isinstance(values, str) else values
+            wanted = [ids[v] for v in values if v in ids]
+            keep &= np.isin(column, wanted) if len(wanted) != 1 else column == wanted[0]
+        return keep
+
+    def scores(self, query, tag=None, priority=None):
+        # Dense BM25 scores over every doc, 0 for docs filtered out or not matching.
+        # Each segment is scored through its slice of the array, in place.
+        scores = np.zeros(self.n, np.float32)
+        for h, repeats in query_terms(query).items():
+            postings = [(span, whole, *seg.postings(h)) for seg, span, whole in self.spans]
+            # Superseded docs count neither in N nor in df, so an updated index
+            # scores exactly like one rebuilt from scratch
+            df = sum(len(docs) if whole else int(np.count_nonzero(self.live[span][docs]))
+                     for span, whole, docs, _ in postings)
+            if not df: continue
+            weight = np.float32(repeats * np.log(1 + (self.docs_live - df + 0.5) / (df + 0.5)) * (K1 + 1))
+            for span, _, docs, tfs in postings:
+                if not len(docs): continue
+                docs, tf = docs.astype(np.intp), tfs.astype(np.float32)
+                denom = self.norm[span][docs]
+                denom += tf
+                tf *= weight
+                tf /= denom
+                scores[span][docs] += tf
+        if tag is not None or priority is not None or self.docs_live < self.n:
+            scores *= self.mask(tag, priority)
+        return scores
+
+    def search(self, query, k=10, tag=None, priority=None, facets=False, fetch=True):
+        # -> {"total": matching docs, "hits": [example + score, best first],
+        #     "facets": {"tag": {tag: n}, "priority": {priority: n}} (facets=True)}
+        scores = self.scores(query, tag, priority)
+        total = int(np.count_nonzero(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if total > k else np.flatnonzero(scores)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        hits = [self.hit(int(i), float(scores[i]), fetch) for i in top if scores[i] > 0]
+        out = {"total": total, "hits": hits}
+        if facets:
+            matched = np.flatnonzero(scores)
+            out["facets"] = {
+                "tag": {self.tags[t]: int(n) for t, n in enumerate(np.bincount(self.tag[matched], minlength=len(self.tags))) if n},
+                "priority": {PRIORITY_NAMES[p]: int(n) for p, n in enumerate(np.bincount(self.priority[matched], minlength=len(PRIORITY_NAMES))) if n},
+            }
+        return out
+
+    def locate(self, doc):
+        s = int(np.searchsorted(self.bases, doc, side="right")) - 1
+        return self.segments[s], doc - int(self.bases[s])
+
+    def hit(self, doc, score, fetch=True):
+        seg, local = self.locate(doc)
+        if not fetch:
+            return {"id": doc, "score": round(score, 3), "tag": self.tags[int(seg.tag[local])],
+                    "priority": PRIORITY_NAMES[int(seg.priority[local])]}
+        with open(self.folder / self.files[int(seg.source[local])], "rb") as f:
+            f.seek(int(seg.offset[local]))
+            example = json.loads(f.read(int(seg.length[local])))
+        return dict(example, id=doc, score=round(score, 3))
+
+PRIORITY_NAMES = PRIORITIES + ("other",)
+PRIORITY_IDS   = {p: i for i, p in enumerate(PRIORITY_NAMES)}
+
+# ============================================================
+# UPDATES
+# ============================================================
+
+def read_meta(root):
+    return ms.read_json(root / "meta.json", None) or {"version": 1, "generation": 0, "segments": [],
+                                                       "files": [], "indexed": {}, "tags": []}
+
+def shard_files(folder):
+    # Shard files in master order (github, then behance), as listed by ShardStore
+    manifest = ms.read_json(folder / "rhiley-master-manifest.json", {"datasets": {}})
+    return [s["file"] for kind in ms.DATASETS for s in manifest["datasets"].get(kind, {}).get("shards", [])]
+
+def new_lines(path, start):
+    # (offset, length, line) of every complete line after byte `start`
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if not line.endswith(b"\n"): return   # still being written
+            yield pos, len(line), line
+            pos += len(line)
+
+def update(folder, verbose=True):
+    # Index every shard line added since the last update. A line whose repo:path
+    # was indexed before supersedes the older doc. Returns a summary dict.
+    folder = Path(folder)
+    root = folder / INDEX_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    meta = read_meta(root)
+    segments = [Segment(root / s["dir"], s.get("live")) for s in meta["segments"]]
+    lives = [np.array(s.live) for s in segments]
+    changed = set()
+
+    # key hash -> (segment number, local doc); the segment being written is len(segments)
+    latest = {}
+    for n, seg in enumerate(segments):
+        keys = np.asarray(seg.keys)
+        for local in np.flatnonzero((keys != 0) & lives[n]).tolist():
+            latest[int(keys[local])] = (n, local)
+
+    tag_ids = {t: i for i, t in enumerate(meta["tags"])}
+    file_ids = {f: i for i, f in enumerate(meta["files"])}
+    writer, pending_live, added, superseded, written = SegmentWriter(), [], 0, 0, []
+
+    def flush():
+        nonlocal writer, pending_live
+        if not len(writer): return
+        name = f"seg-{meta['generation'] + len(written) + 1:06d}"
+        writer.write(root / name)
+        written.append((name, np.array(pending_live, bool)))
+        writer, pending_live = SegmentWriter(), []
+
+    for file in shard_files(folder):
+        path = folder / file
+        if not path.exists(): continue
+        start = meta["indexed"].get(file, 0)
+        if path.stat().st_size <= start: continue
+        if file not in file_ids:
+            file_ids[file] = len(meta["files"])
+            meta["files"].append(file)
+        for offset, length, line in new_lines(path, start):
+            start = offset + length
+            try: example = json.loads(line)
+            except ValueError: continue
+            tag = example.get("tag") or ""
+            if tag not in tag_ids:
+                tag_ids[tag] = len(meta["tags"])
+                meta["tags"].append(tag)
+            key = key_hash(ms.example_key(example))
+            if key:
+                old = latest.get(key)
+                if old is not None:
+                    n, local = old
+                    if n < len(segments): lives[n][local] = False; changed.add(n)
+                    elif n == len(segments) + len(written): pending_live[local] = False
+                    else: written[n - len(segments)][1][local] = False
+                    superseded += 1
+            local = writer.add(doc_terms(example), tag_ids[tag], PRIORITY_IDS.get(example.get("priority"), 3),
+                               file_ids[file], offset, length, key)
+            pending_live.append(True)
+            if key: latest[key] = (len(segments) + len(written), local)
+            added += 1
+            if len(writer) >= SEGMENT_DOCS: flush()
+        meta["indexed"][file] = start
+    flush()
+
+    if not added and not changed:
+        ms.write_json_atomic(root / "meta.json", meta)
+        return summarize(meta, added, superseded, started, verbose)
+
+    meta["generation"] += len(written) + 1
+    gen = meta["generation"]
+    for n in changed:
+        meta["segments"][n].update(live=save_live(root, meta["segments"][n]["dir"], gen, lives[n]), dead=int((~lives[n]).sum()))
+    for name, live in written:
+        meta["segments"].append({"dir": name, "docs": len(live), "dead": int((~live).sum()),
+                                 "live": save_live(root, name, gen, live) if not live.all() else None})
+    ms.write_json_atomic(root / "meta.json", meta)
+    if len(meta["segments"]) > MAX_SEGMENTS: merge_small(root, meta)
+    clean(root, meta)
+    return summarize(meta, added, superseded, started, verbose)
+
+def save_live(root, segment, gen, live):
+    name = f"live-{segment}-{gen}.npy"
+    np.save(root / name, live)
+    return name
+
+def merge_small(root, meta):
+    # Fold every segment smaller than SEGMENT_DOCS into one, dropping superseded docs
+    small = [i for i, s in enumerate(meta["segments"]) if s["docs"] < SEGMENT_DOCS]
+    if len(small) < 2: return
+    parts = [Segment(root / meta["segments"][i]["dir"], meta["segments"][i].get("live")).live_arrays() for i in small]
+    base, terms, docs, tfs = 0, [], [], []
+    for t, d, f, cols in parts:
+        terms.append(t); docs.append(d.astype(np.int64) + base); tfs.append(f)
+        base += len(cols["doclen"])
+    cols = {name: np.concatenate([p[3][name] for p in parts]) for name in DOC_ARRAYS}
+    meta["generation"] += 1
+    name = f"seg-{meta['generation']:06d}"
+    write_segment(root / name, np.concatenate(terms), np.concatenate(docs).astype(np.uint32), np.concatenate(tfs), cols)
+    first = small[0]
+    keep = [s for i, s in enumerate(meta["segments"]) if i not in small]
+    keep.insert(first, {"dir": name, "docs": base, "dead": 0, "live": None})
+    meta["segments"] = keep
+    ms.write_json_atomic(root / "meta.json", meta)
+
+def clean(root, meta):
+    # Segments and live files meta.json no longer names (an open reader may still
+    # hold them on Windows; they go on a later update)
+    used = {s["dir"] for s in meta["segments"]} | {s["live"] for s in meta["segments"] if s.get("live")}
+    for p in root.iterdir():
+        if p.name == "meta.json" or p.name in used: continue
+        try: shutil.rmtree(p) if p.is_dir() else p.unlink()
+        except OSError: pass
+
+def summarize(meta, added, superseded, started, verbose):
+    out = {"docs": sum(s["docs"] - s.get("dead", 0) for s in meta["segments"]), "segments": len(meta["segments"]),
+           "added": added, "superseded": superseded, "seconds": round(time.perf_counter() - started, 2)}
+    if verbose:
+        print(f"🔎 Search index: +{added} docs ({superseded} superseded) → {out['docs']} in "
+              f"{out['segments']} segments, {out['seconds']}s")
+    return out
+
+def build(folder, verbose=True):
+    shutil.rmtree(Path(folder) / INDEX_DIR, ignore_errors=True)
+    return update(folder, verbose)
+
+# ============================================================
+# BENCHMARK — python rhiley_index.py bench [FOLDER | --synthetic N]
+# ============================================================
+
+def synthetic(folder, n=100_000, vocab=50_000, seed=0):
+    # Shards the way ShardStore writes them, with identifiers drawn from a Zipf
+    # distribution so a few terms are in most docs and most terms in very few
+    rng = np.random.default_rng(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "zo", "pe", "su", "gra", "flo", "mor", "tin", "vex", "qua"]
+    words = ["".join(rng.choice(syllables, rng.integers(2, 5))) for _ in range(vocab)]
+    tags = sorted({c["tag"] for c in ms.REPOS} | {c["tag"] for c in ms.SITES})
+    (folder / "shards").mkdir(parents=True, exist_ok=True)
+    shards, f, size = [], None, ms.SHARD_BYTES
+    for i in range(n):
+        if size >= ms.SHARD_BYTES:
+            if f: f.close()
+            shards.append({"file": f"shards/github-{len(shards):04d}.jsonl", "count": 0, "bytes": 0})
+            f, size = open(folder / shards[-1]["file"], "wb"), 0
+        ids = np.minimum(rng.zipf(1.3, int(rng.integers(30, 300))), vocab) - 1
+        code = " ".join(words[j] + ("" if k % 3 else words[(j * 7) % vocab].title()) for k, j in enumerate(ids.tolist()))
+        tag = tags[int(rng.integers(len(tags)))]
+        name = words[int(ids[0])].title() + ".tsx"
+        line = (json.dumps({"type": "github", "tag": tag, "priority": PRIORITIES[int(rng.integers(3))],
+                            "repo": f"synthetic/{tag}", "path": f"src/{i}/{name}",
+                            "instruction": ms.make_instruction(name, tag), "code": code}) + "\n").encode()
+        f.write(line)
+        shards[-1]["count"] += 1
+        shards[-1]["bytes"] += len(line)
+        size += len(line)
+    if f: f.close()
+    ms.write_json_atomic(folder / "rhiley-master-manifest.json",
+                         {"format": "jsonl-shards", "datasets": {"github": {"shards": shards}, "behance": {"shards": []}}})
+    return words, tags
+
+def timings(fn, queries):
+    out = []
+    for q in queries:
+        started = time.perf_counter()
+        fn(q)
+        out.append((time.perf_counter() - started) * 1000)
+    return np.array(out)
+
+def bench(folder=None, n=100_000, queries=500, seed=0):
+    scratch = None
+    if folder is None:
+        scratch = folder = Path(tempfile.mkdtemp(prefix="rhiley-index-"))
+        started = time.perf_counter()
+        synthetic(folder, n, seed=seed)
+        print(f"📦 {n} synthetic examples in {time.perf_counter() - started:.1f}s")
+    folder = Path(folder)
+    try:
+        if not (folder / INDEX_DIR / "meta.json").exists():
+            started = time.perf_counter()
+            build(folder, verbose=False)
+            print(f"🏗  built in {time.perf_counter() - started:.1f}s")
+        size = sum(p.stat().st_size for p in (folder / INDEX_DIR).rglob("*") if p.is_file()) / 1e6
+        started = time.perf_counter()
+        index = SearchIndex(folder)
+        print(f"📂 opened {index.docs_live} docs, {len(index.segments)} segments, {size:.0f} MB on disk "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        # Queries: 1-4 words of real docs, so common and rare terms both show up
+        rng = np.random.default_rng(seed + 1)
+        picks = rng.integers(0, index.n, queries)
+        docs = [index.hit(int(i), 0.0) for i in picks]
+        words = [[w for w in WORD_RE.findall(d["code"] + " " + d["instruction"]) if word_terms(w)] or ["card"] for d in docs]
+        texts = [" ".join(rng.choice(w, min(len(w), int(rng.integers(1, 5))))) for w in words]
+        tags = [d["tag"] for d in docs]
+        for q in texts[:20]: index.search(q, fetch=False)   # warm the page cache
+        cases = [
+            ("top-10 ids", lambda i: index.search(texts[i], fetch=False)),
+            ("top-10 + examples", lambda i: index.search(texts[i])),
+            ("tag facet", lambda i: index.search(texts[i], tag=tags[i], fetch=False)),
+            ("priority + counts", lambda i: index.search(texts[i], priority="high", facets=True, fetch=False)),
+        ]
+        print(f"\n   {queries} queries of 1-4 terms over {index.docs_live} docs")
+        print(f"   {'case':<20} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+        for name, fn in cases:
+            t = timings(fn, range(queries))
+            print(f"   {name:<20} {np.percentile(t, 50):7.2f} {np.percentile(t, 95):7.2f} "
+                  f"{np.percentile(t, 99):7.2f} {t.max():7.2f}")
+
+        if scratch:
+            # Incremental path: the next scrape appends 1000 lines, 100 of them refreshes
+            shard = folder / shard_files(folder)[-1]
+            lines = shard.read_bytes().splitlines(keepends=True)
+            with open(shard, "ab") as f:
+                f.writelines(lines[-100:])
+                for line in lines[:900]:
+                    e = json.loads(line)
+                    e["path"] = "next-run/" + e["path"]
+                    f.write((json.dumps(e) + "\n").encode())
+            started = time.perf_counter()
+            info = update(folder, verbose=False)
+            print(f"\n🔁 update: +{info['added']} docs ({info['superseded']} superseded) in "
+                  f"{(time.perf_counter() - started) * 1000:.0f} ms → {info['segments']} segments")
+    finally:
+        if scratch: shutil.rmtree(scratch, ignore_errors=True)
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Rhiley search index over the scraped dataset")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, help in (("build", "index every shard from scratch"), ("update", "index shard lines added since last time")):
+        sub.add_parser(name, help=help).add_argument("folder", nargs="?", default=str(ms.OUTPUT_FOLDER))
+    p = sub.add_parser("search", help="top-k examples for a query")
+    p.add_argument("folder")
+    p.add_argument("query")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--tag", action="append")
+    p.add_argument("--priority", action="append", choices=PRIORITY_NAMES)
+    p.add_argument("--json", action="store_true", help="print the full results as JSON")
+    p = sub.add_parser("bench", help="query latency over a dataset folder or a synthetic corpus")
+    p.add_argument("folder", nargs="?")
+    p.add_argument("--synthetic", type=int, default=100_000, metavar="N",
+                   help="examples to generate when no folder is given (default 100000)")
+    p.add_argument("--queries", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build": return build(args.folder)
+    if args.cmd == "update": return update(args.folder)
+    if args.cmd == "bench": return bench(args.folder, args.synthetic, args.queries)
+    started = time.perf_counter()
+    res = SearchIndex(args.folder).search(args.query, args.k, args.tag, args.priority, facets=True)
+    took = (time.perf_counter() - started) * 1000
+    if args.json: print(json.dumps(res, indent=2, ensure_ascii=False)); return
+    print(f"🔎 {res['total']} matches in {took:.1f} ms (including opening the index)")
+    for h in res["hits"]:
+        where = f"{h['repo']}/{h['path']}" if "repo" in h else h.get("source", "")
+        print(f"   {h['score']:7.2f}  [{h['tag']}/{h['priority']}]  {where}")
+    print("   tags: " + ", ".join(f"{t} {n}" for t, n in sorted(res["facets"]["tag"].items(), key=lambda kv: -kv[1])[:8]))
+
+if __name__ == "__main__":
+    main()
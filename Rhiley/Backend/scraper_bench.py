@@ -0,0 +1,383 @@
+"""
+============================================================
+RHILEY SCRAPER BENCH
+Record / replay harness + end-to-end benchmark for mega_scraper.py
+Runs offline against a cassette: no GitHub token, no network
+
+  python mega_scraper.py --record cassettes/live        # a real scrape, every response saved
+  python scraper_bench.py synth cassettes/synthetic     # or a generated corpus, fully offline
+  python scraper_bench.py serve cassettes/live --latency-ms 80 --rate-403 0.01
+  python scraper_bench.py run cassettes/live --warm --json before.json
+  python scraper_bench.py run cassettes/live --compare before.json
+============================================================
+"""
+
+import os, io, sys, json, time, random, shlex, hashlib, tarfile, tempfile, shutil, subprocess, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote
+
+import mega_scraper as ms
+
+SCRAPER = Path(__file__).with_name("mega_scraper.py")
+
+# ============================================================
+# REPLAY SERVER — cassette entries over local HTTP
+# ============================================================
+
+# mega_scraper --replay URL sends every request here as /<quoted original URL>, so
+# its per-host limits, pools and parking still see the real hosts. Each request
+# can be delayed and turned into a rate-limit 403 or a 500 first:
+#
+#   latency_ms / jitter_ms   fixed + uniform extra delay per request
+#   rate_403                 share answered 403 with X-RateLimit-Remaining: 0, so the
+#                            scraper parks the host until X-RateLimit-Reset
+#   fail_rate                share answered 500
+#
+# URLs missing from the cassette get a 404; matching If-None-Match gets a 304.
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real hosts
+
+    def do_GET(self):
+        status, headers, body = self.server.respond(unquote(self.path[1:]), self.headers)
+        self.send_response(status)
+        for k, v in headers.items(): self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cassette, port=0, latency_ms=0, jitter_ms=0, rate_403=0.0, fail_rate=0.0, reset_s=1, seed=0):
+        super().__init__(("127.0.0.1", port), ReplayHandler)
+        self.cassette = cassette if isinstance(cassette, ms.Cassette) else ms.Cassette(cassette)
+        self.latency_ms, self.jitter_ms, self.reset_s = latency_ms, jitter_ms, reset_s
+        self.rate_403, self.fail_rate = rate_403, fail_rate
+        self.lock = threading.Lock()
+        self.reset(seed)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self, seed=0):
+        # Same seed, same sequence of injected delays and errors
+        with self.lock:
+            self.rng = random.Random(seed)
+            self.counts = {"requests": 0, "bytes": 0, "injected_403": 0, "injected_500": 0, "not_recorded": 0, "not_modified": 0}
+
+    def count(self, name, n=1):
+        with self.lock: self.counts[name] += n
+
+    def respond(self, url, headers):
+        with self.lock:
+            self.counts["requests"] += 1
+            limit, fail, jitter = self.rng.random(), self.rng.random(), self.rng.random()
+        delay = self.latency_ms + jitter * self.jitter_ms
+        if delay: time.sleep(delay / 1000)
+        if limit < self.rate_403:
+            self.count("injected_403")
+            return 403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time() + self.reset_s) + 1),
+                         "Content-Type": "application/json"}, b'{"message": "API rate limit exceeded (injected)"}'
+        if fail < self.fail_rate:
+            self.count("injected_500")
+            return 500, {}, b"injected failure"
+        hit = self.cassette.lookup(url)
+        if hit is None:
+            self.count("not_recorded")
+            return 404, {}, b"not in cassette"
+        status, saved, body = hit
+        etag = saved.get("ETag")
+        if status == 200 and etag and headers.get("If-None-Match") == etag:
+            self.count("not_modified")
+            return 304, {"ETag": etag}, b""
+        self.count("bytes", len(body))
+        return status, saved, body
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections on exit are not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError): super().handle_error(request, client_address)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+# ============================================================
+# SYNTHETIC CASSETTE — a fixed corpus without recording one
+# ============================================================
+
+# Trees, raw files and tarballs for the first `repos` of REPOS, pages and their
+# stylesheets / scripts for the first `sites` of SITES. Everything comes from one
+# seed, so two machines benchmark the same bytes. Trees carry the usual noise the
+# prefilter drops (node_modules, images, huge bundles, stubs) and each page has
+# one tracking script.
+
+WORDS = ("card panel hero modal drawer toast menu tab slider marquee cursor glow blur fade spring stagger "
+         "orbit ripple magnet parallax reveal tilt shimmer wave noise grain beam spotlight dock grid bento "
+         "badge avatar chip tooltip popover sheet carousel timeline stepper meter ring halo trail morph "
+         "velocity offset scale rotate opacity easing progress scroll pointer hover focus press drag").split()
+
+def ident(rng, n=2):
+    return rng.choice(WORDS) + "".join(w.title() for w in rng.sample(WORDS, n - 1))
+
+def synth_tsx(rng):
+    name = ident(rng, 3).title()
+    lines = ["import { motion, useSpring } from 'framer-motion'", "import { useMemo, useRef } from 'react'", "",
+             f"export function {name}({{ {', '.join(ident(rng) for _ in range(rng.randint(1, 4)))} }}) {{",
+             "  const ref = useRef(null)"]
+    for _ in range(rng.randint(4, 120)):
+        lines.append(f"  const {ident(rng)} = useMemo(() => {rng.random():.4f} * {ident(rng)}.{rng.choice(WORDS)}, [{ident(rng)}])")
+    lines += ["  return (",
+              f"    <motion.div ref={{ref}} className=\"{ident(rng)}\" animate={{{{ opacity: {rng.random():.2f}, "
+              f"y: {rng.randint(-40, 40)} }}}} transition={{{{ type: 'spring', stiffness: {rng.randint(80, 400)} }}}} />",
+              "  )", "}", ""]
+    return "\n".join(lines)
+
+def synth_css(rng, rules=None):
+    out = []
+    for _ in range(rules or rng.randint(3, 80)):
+        cls = "-".join(rng.sample(WORDS, 2))
+        out.append(f".{cls} {{\n  transition: transform {rng.randint(100, 900)}ms cubic-bezier({rng.random():.2f}, 0, {rng.random():.2f}, 1);\n"
+                   f"  transform: translateY({rng.randint(-30, 30)}px) scale({rng.uniform(0.8, 1.2):.3f});\n"
+                   f"  backdrop-filter: blur({rng.randint(2, 24)}px);\n}}\n"
+                   f"@keyframes {cls}-in {{ from {{ opacity: 0 }} to {{ opacity: {rng.random():.2f} }} }}\n")
+    return "\n".join(out)
+
+def synth_js(rng):
+    body = "\n".join(f"  {ident(rng)} += ({ident(rng)} - {ident(rng)}) * {rng.random():.3f} // lerp"
+                     for _ in range(rng.randint(5, 80)))
+    return (f"function {ident(rng, 3)}(t) {{\n{body}\n  requestAnimationFrame({ident(rng)})\n}}\n"
+            f"new IntersectionObserver(e => e.forEach(x => x.target.classList.toggle('{ident(rng)}', x.isIntersecting)))\n")
+
+def synth_repo(rng, files):
+    # -> {path: text} with the kept files and the prefilter's usual noise
+    out = {}
+    for i in range(files):
+        folder = rng.choice(("src/components", "src/ui", "packages/core/src", "examples", "src/hooks", "styles"))
+        ext = rng.choice((".tsx", ".tsx", ".ts", ".jsx", ".js", ".css", ".scss"))
+        text = synth_css(rng) if ext in (".css", ".scss") else synth_tsx(rng)
+        out[f"{folder}/{ident(rng).title()}{i}{ext}"] = text
+    for i in range(max(1, files // 10)):
+        out[f"node_modules/{rng.choice(WORDS)}/index{i}.js"] = synth_js(rng)
+        out[f"public/img{i}.png"] = "\x89PNG" + "x" * 200
+        out[f"src/stub{i}.ts"] = "export {}\n"
+        out[f"dist/bundle{i}.js"] = synth_js(rng) + "//" + "x" * ms.MAX_FILE_SIZE
+    return out
+
+def synth_tarball(repo, tree_sha, files):
+    buf = io.BytesIO()
+    top = f"{repo.replace('/', '-')}-{tree_sha[:7]}"
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for path, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"{top}/{path}")
+            info.size, info.mtime = len(data), 0
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+def synth_site(rng, cassette, url):
+    page_css, page_js = [], []
+    for i in range(rng.randint(2, 5)):
+        asset = f"{url}/_next/static/css/{ident(rng)}{i}.css"
+        cassette.add(asset, 200, {"Content-Type": "text/css", "Cache-Control": "public, max-age=31536000",
+                                  "ETag": f'"{i}{rng.getrandbits(40):x}"'}, synth_css(rng).encode())
+        page_css.append(asset)
+    for i in range(rng.randint(1, 4)):
+        asset = f"https://cdn.{ms.urlparse(url).netloc}/js/{ident(rng)}{i}.js"
+        cassette.add(asset, 200, {"Content-Type": "application/javascript", "Cache-Control": "public, max-age=86400",
+                                  "ETag": f'"{i}{rng.getrandbits(40):x}"'}, synth_js(rng).encode())
+        page_js.append(asset)
+    html = ["<!doctype html><html><head>", f"<style>{synth_css(rng, 4)}</style>"]
+    html += [f'<link rel="stylesheet" href="{u}">' for u in page_css]
+    html += ['<script src="https://www.googletagmanager.com/gtag/js?id=G-0"></script>']
+    html += [f'<script src="{u}" defer></script>' for u in page_js]
+    html += ["</head><body>", f"<script>{synth_js(rng)}</script>", "</body></html>"]
+    cassette.add(url, 200, {"Content-Type": "text/html; charset=utf-8"}, "\n".join(html).encode())
+
+def synthesize(folder, repos=20, files=150, sites=10, seed=0):
+    rng = random.Random(seed)
+    cassette = ms.Cassette(folder)
+    for cfg in ms.REPOS[:repos]:
+        repo = cfg["repo"]
+        content = synth_repo(rng, files)
+        tree = [{"path": p, "mode": "100644", "type": "blob", "sha": ms.git_blob_sha(t), "size": len(t.encode("utf-8"))}
+                for p, t in content.items()]
+        tree_sha = hashlib.sha1(json.dumps(tree, sort_keys=True).encode()).hexdigest()
+        cassette.add(f"{ms.GITHUB_API}/repos/{repo}/git/trees/HEAD?recursive=1", 200,
+                     {"Content-Type": "application/json", "ETag": f'W/"{tree_sha}"'},
+                     json.dumps({"sha": tree_sha, "tree": tree, "truncated": False}).encode())
+        for path, text in content.items():
+            cassette.add(f"{ms.GITHUB_RAW}/{repo}/HEAD/{path}", 200, {"Content-Type": "text/plain; charset=utf-8"},
+                         text.encode("utf-8"))
+        cassette.add(f"{ms.CODELOAD}/{repo}/tar.gz/HEAD", 200,
+                     {"Content-Type": "application/x-gzip", "ETag": f'"{tree_sha}"'}, synth_tarball(repo, tree_sha, content))
+    for site in ms.SITES[:sites]:
+        synth_site(rng, cassette, site["url"])
+    cassette.save()
+    mb = sum(p.stat().st_size for p in Path(folder).glob("*.body")) / 1e6
+    print(f"📼 {folder}: {len(cassette.entries)} responses, {mb:.1f} MB ({repos} repos × {files} files, {sites} sites)")
+
+# ============================================================
+# BENCHMARK — the real scraper, one process per run
+# ============================================================
+
+# Each run is `mega_scraper.py --replay` into an empty temp folder (--warm reruns
+# it into the same folder, so the manifest, ETags and asset cache are hit). The
+# scraper's own stats file gives files written and bytes downloaded; the server
+# counts requests, including retries after injected errors. Peak RSS is the child's
+# ru_maxrss from wait4 (Linux: the largest process of the tree, CPU workers included).
+
+DEFAULT_CONFIGS = [
+    ("api", []),
+    ("api inline cpu", ["--cpu-workers", "0"]),
+    ("tarball", ["--source", "tarball"]),
+]
+
+def run_scraper(server, out, extra, seed, log, throttle=False):
+    server.reset(seed)
+    cmd = [sys.executable, str(SCRAPER), "--replay", server.url, "--output", str(out), *extra]
+    if not throttle: cmd.append("--no-throttle")
+    started = time.perf_counter()
+    with open(log, "a") as f:
+        p = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT, env=dict(os.environ, PYTHONIOENCODING="utf-8"))
+        _, status, usage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - started
+    if p.returncode: raise RuntimeError(f"scraper exited {p.returncode}, see {log}")
+    stats = json.loads((Path(out) / "rhiley-scrape-stats.json").read_text())
+    tel = stats["telemetry"]
+    files = stats["new_github_count"] + stats["updated_github_count"] + stats["new_sites_count"]
+    nbytes = sum(r["bytes"] for kind in ("repos", "sites") for r in tel[kind].values())
+    return {
+        "wall_s": round(wall, 2),
+        "files": files,
+        "mb": round(nbytes / 1e6, 2),
+        "files_per_s": round(files / wall, 1),
+        "mb_per_s": round(nbytes / 1e6 / wall, 2),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 2),
+        "requests": server.counts["requests"],
+        "client_requests": sum(h["requests"] for h in tel["hosts"].values()),
+        "server": dict(server.counts),
+        "phases_s": tel["phases_s"],
+    }
+
+def median_run(runs):
+    # The run with the median wall time, so every number in a row comes from one run
+    return sorted(runs, key=lambda r: r["wall_s"])[len(runs) // 2]
+
+def bench(cassette, configs=DEFAULT_CONFIGS, repeat=1, warm=False, throttle=False, seed=0, keep=False, **server_opts):
+    server = ReplayServer(cassette, seed=seed, **server_opts).start()
+    scratch = Path(tempfile.mkdtemp(prefix="rhiley-bench-"))
+    log = scratch / "scraper.log"
+    print(f"📼 replaying {cassette} from {server.url} ({len(server.cassette.entries)} responses) · log {log}")
+    results = {}
+    try:
+        for name, extra in configs:
+            cold, hot = [], []
+            for i in range(repeat):
+                out = scratch / f"{name.replace(' ', '-')}-{i}"
+                cold.append(run_scraper(server, out, extra, seed, log, throttle))
+                if warm: hot.append(run_scraper(server, out, extra, seed, log, throttle))
+                if not keep: shutil.rmtree(out, ignore_errors=True)
+            results[name] = median_run(cold)
+            print_row(name, results[name])
+            if warm:
+                results[f"{name} (warm)"] = median_run(hot)
+                print_row(f"{name} (warm)", results[f"{name} (warm)"])
+    finally:
+        server.shutdown()
+        if not keep: shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+HEADER = f"   {'config':<24} {'wall s':>7} {'files':>6} {'files/s':>8} {'MB':>7} {'MB/s':>6} {'RSS MB':>7} {'CPU s':>6} {'requests':>9}"
+
+def print_row(name, r, base=None):
+    if print_row.first: print(HEADER); print_row.first = False
+    line = (f"   {name[:24]:<24} {r['wall_s']:7.1f} {r['files']:6} {r['files_per_s']:8.1f} {r['mb']:7.1f} "
+            f"{r['mb_per_s']:6.2f} {r['peak_rss_mb']:7.0f} {r['cpu_s']:6.1f} {r['requests']:9}")
+    if base: line += f"   {base['wall_s'] / r['wall_s']:.2f}x vs before"
+    print(line)
+print_row.first = True
+
+def compare(results, before):
+    print("\n⚖️  Against " + before)
+    before = json.loads(Path(before).read_text())["results"]
+    print_row.first = True
+    for name, r in results.items():
+        print_row(name, r, before.get(name))
+
+# ============================================================
+# CLI
+# ============================================================
+
+def server_args(ap):
+    ap.add_argument("cassette", help="cassette folder (mega_scraper.py --record or synth)")
+    ap.add_argument("--latency-ms", type=float, default=30, help="delay added to every response (default 30)")
+    ap.add_argument("--jitter-ms", type=float, default=0, help="uniform extra delay up to this much")
+    ap.add_argument("--rate-403", type=float, default=0.0, help="share of requests answered with a rate-limit 403")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with a 500")
+    ap.add_argument("--reset-s", type=float, default=1, help="seconds until an injected rate limit resets (default 1)")
+    ap.add_argument("--seed", type=int, default=0)
+
+def server_opts(args):
+    return {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "rate_403": args.rate_403,
+            "fail_rate": args.fail_rate, "reset_s": args.reset_s}
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Record / replay benchmark for mega_scraper.py")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("synth", help="write a generated cassette (no network needed)")
+    p.add_argument("cassette")
+    p.add_argument("--repos", type=int, default=20)
+    p.add_argument("--files", type=int, default=150, help="kept files per repo (default 150)")
+    p.add_argument("--sites", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+
+    p = sub.add_parser("serve", help="serve a cassette for mega_scraper.py --replay URL")
+    server_args(p)
+    p.add_argument("--port", type=int, default=8765)
+
+    p = sub.add_parser("run", help="run the scraper against a cassette and report throughput")
+    server_args(p)
+    p.add_argument("--config", action="append", metavar='NAME="FLAGS"',
+                   help='scraper flags to benchmark, e.g. --config "json=--storage json" (repeatable; '
+                        "default: api, api with --cpu-workers 0, tarball)")
+    p.add_argument("--repeat", type=int, default=1, help="runs per config; the median is reported")
+    p.add_argument("--warm", action="store_true", help="also rerun each config over its own output (manifest / cache hits)")
+    p.add_argument("--throttle", action="store_true", help="keep the scraper's per-host request rates")
+    p.add_argument("--keep", action="store_true", help="keep the output folders and log")
+    p.add_argument("--json", metavar="FILE", help="save the results for a later --compare")
+    p.add_argument("--compare", metavar="FILE", help="results saved by an earlier --json")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "synth":
+        return synthesize(args.cassette, args.repos, args.files, args.sites, args.seed)
+    if args.cmd == "serve":
+        server = ReplayServer(args.cassette, port=args.port, seed=args.seed, **server_opts(args))
+        print(f"📼 {len(server.cassette.entries)} responses on {server.url} — python mega_scraper.py --replay {server.url}")
+        try: server.serve_forever()
+        except KeyboardInterrupt: print("\n", server.counts)
+        return
+
+    configs = DEFAULT_CONFIGS
+    if args.config:
+        configs = []
+        for spec in args.config:
+            name, _, flags = spec.partition("=")
+            configs.append((name.strip(), shlex.split(flags)))
+    results = bench(args.cassette, configs, max(1, args.repeat), args.warm, args.throttle, args.seed, args.keep,
+                    **server_opts(args))
+    if args.compare: compare(results, args.compare)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"cassette": str(args.cassette), "server": server_opts(args),
+                                               "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
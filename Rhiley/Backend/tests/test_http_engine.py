@@ -0,0 +1,110 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # Rhiley/Backend
+import mega_scraper as ms
+import scraper_bench as bench
+
+# HttpEngine + Scheduler against the replay server: quota answers park the work
+# item until the host reopens instead of failing it or sleeping in the worker,
+# and every request goes over the engine's one keep-alive Session.
+
+HOST = "https://raw.githubusercontent.com"
+URLS = [f"{HOST}/owner/repo/HEAD/src/file{i}.ts" for i in range(6)]
+
+class LimitedServer(bench.ReplayServer):
+    # The first `limited` requests get a rate-limit answer, the rest the cassette.
+    # Also counts accepted connections, to see whether the client reuses them.
+
+    def __init__(self, cassette, limited=0, status=403, **kw):
+        super().__init__(cassette, **kw)
+        self.limited, self.status, self.connections = limited, status, 0
+
+    def process_request(self, request, client_address):
+        with self.lock: self.connections += 1
+        super().process_request(request, client_address)
+
+    def respond(self, url, headers):
+        with self.lock:
+            limit = self.limited > 0
+            self.limited -= limit
+        if not limit:
+            return super().respond(url, headers)
+        self.count("requests")
+        if self.status == 429:
+            return 429, {"Retry-After": "0.3"}, b"slow down"
+        reset = str(int(time.time() + self.reset_s) + 1)
+        return 403, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}, b"rate limited"
+
+@pytest.fixture
+def cassette(tmp_path):
+    c = ms.Cassette(tmp_path / "cassette")
+    for url in URLS:
+        c.add(url, 200, {"Content-Type": "text/plain"}, f"export const x = '{url}'".encode())
+    return c
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(ms, "BACKOFF_BASE", 0.05)
+    ms.STOP.clear()
+
+def serve(cassette, **kw):
+    server = LimitedServer(cassette, **kw).start()
+    engine = ms.HttpEngine()
+    engine.rewrite = ms.replay_rewrite(server.url)
+    return server, engine
+
+def fetch_all(engine, urls, workers=4):
+    with ms.Scheduler(workers) as pool:
+        futs = [pool.submit(engine.get, url) for url in urls]
+        return [f.result(timeout=30) for f in futs]
+
+def test_quota_403_parks_until_reset(cassette):
+    server, engine = serve(cassette, limited=2, reset_s=0)
+    try:
+        started = time.time()
+        responses = fetch_all(engine, URLS)
+    finally:
+        server.shutdown()
+    assert [r.status_code for r in responses] == [200] * len(URLS)
+    assert [r.text for r in responses] == [f"export const x = '{url}'" for url in URLS]
+    st = engine.stats["raw.githubusercontent.com"]
+    assert st["rate_limited"] >= 1 and st["parked_s"] > 0
+    assert st["wait_s"] < 1   # parked on the Scheduler's heap, not slept in a worker
+    assert time.time() - started < 10
+
+def test_429_retry_after_parks_and_resumes(cassette):
+    server, engine = serve(cassette, limited=1, status=429)
+    try:
+        responses = fetch_all(engine, URLS[:2], workers=1)
+    finally:
+        server.shutdown()
+    assert [r.status_code for r in responses] == [200, 200]
+    assert engine.stats["raw.githubusercontent.com"]["rate_limited"] == 1
+    assert server.counts["requests"] == 3
+
+def test_gives_up_after_max_retries(cassette, monkeypatch):
+    monkeypatch.setattr(ms, "MAX_RETRIES", 1)
+    server, engine = serve(cassette, limited=100, status=429)
+    try:
+        with ms.Scheduler(1) as pool:
+            fut = pool.submit(engine.get, URLS[0])
+            with pytest.raises(ms.RateLimited):
+                fut.result(timeout=30)
+    finally:
+        server.shutdown()
+
+def test_session_is_reused(cassette):
+    server, engine = serve(cassette)
+    session = engine.session
+    try:
+        for url in URLS * 2:
+            assert engine.get(url).status_code == 200
+    finally:
+        server.shutdown()
+    assert engine.session is session
+    assert server.connections == 1
+    assert engine.stats["raw.githubusercontent.com"]["requests"] == 2 * len(URLS)
@@ -1,3 +1,5 @@
+import { fetchDatasetText, loadMasterDataset } from "./masterDataset";
+
 // ── TYPES ─────────────────────────────────────────────────
 
 export interface ScrapedExample {
@@ -38,21 +40,24 @@ export async function initDatasetIntelligence(): Promise<void> {
             const fs = require("fs");
             const path = require("path");
 
-            const filePath = path.join(process.cwd(), "public", "datasets", "rhiley-master-dataset.json");
-            if (fs.existsSync(filePath)) {
-                data = JSON.parse(fs.readFileSync(filePath, "utf-8"));
-            } else {
-                console.warn("[Rhiley] Master dataset not found at:", filePath);
+            const folder = path.join(process.cwd(), "public", "datasets");
+            const loaded = await loadMasterDataset<ScrapedExample>(async (name) => {
+                const filePath = path.join(folder, name);
+                return fs.existsSync(filePath) ? fs.readFileSync(filePath, "utf-8") : null;
+            });
+            if (!loaded) {
+                console.warn("[Rhiley] Master dataset not found in:", folder);
                 return;
             }
+            data = loaded;
         } else {
-            // Load master dataset (all 8,017 examples)
-            const res = await fetch("/datasets/rhiley-master-dataset.json");
-            if (!res.ok) {
+            // Load master dataset (manifest + shards)
+            const loaded = await loadMasterDataset<ScrapedExample>(fetchDatasetText);
+            if (!loaded) {
                 console.warn("[Rhiley] Master dataset not found in public/datasets/");
                 return;
             }
-            data = await res.json();
+            data = loaded;
         }
 
         MASTER_DATA.length = 0;
@@ -2,8 +2,10 @@
 // Reads scraped JSON datasets from public/datasets/
 // Fast in-memory cache — lookup in <1ms
 
+import { fetchDatasetText, loadMasterDataset } from "./masterDataset";
+
 const DATASET_KEYS = [
-    "rhiley-master-dataset",    // everything merged
+    "rhiley-master-dataset",    // everything merged (read from the shard manifest)
     "rhiley-github-dataset",    // GitHub repos only
     "rhiley-behance-dataset",   // CSS/JS from design sites
     "rhiley-3000-dataset",      // Framer Motion variants
@@ -57,6 +59,11 @@ export async function loadAllDatasets(): Promise<void> {
         await Promise.allSettled(
             DATASET_KEYS.map(async (key) => {
                 try {
+                    if (key === "rhiley-master-dataset") {
+                        const data = await loadMasterDataset<ScrapedExample>(fetchDatasetText);
+                        if (data) CACHE.set(key, data);
+                        return;
+                    }
                     const res = await fetch(`/datasets/${key}.json`);
                     if (res.ok) {
                         const data = await res.json();
@@ -0,0 +1,71 @@
+// chat/lib/masterDataset.ts
+// The master dataset is never stored as one file. The scraper writes
+// rhiley-master-manifest.json, which lists JSONL shards per kind (github, then
+// behance); a repo:path line appended again later supersedes the earlier one.
+// Older exports without a manifest fall back to the per-kind JSON views, then
+// to a legacy rhiley-master-dataset.json.
+
+export const MASTER_MANIFEST = "rhiley-master-manifest.json";
+export const MASTER_VIEWS = ["rhiley-github-dataset.json", "rhiley-behance-dataset.json"];
+export const LEGACY_MASTER = "rhiley-master-dataset.json";
+
+// Returns a file's text, or null when it doesn't exist
+export type ReadText = (name: string) => Promise<string | null>;
+
+interface ShardManifest {
+    format?: string;
+    datasets?: Record<string, { shards?: { file: string }[] }>;
+}
+
+function exampleKey(item: any): string | null {
+    return item && item.repo && item.path ? `${item.repo}:${item.path}` : null;
+}
+
+// Parse JSONL shards in order, keeping each key at its last occurrence
+export function mergeShards<T>(texts: string[]): T[] {
+    const items: T[] = [];
+    for (const text of texts) {
+        for (const line of text.split("\n")) {
+            if (!line.trim()) continue;
+            try {
+                items.push(JSON.parse(line));
+            } catch {
+                // Torn last line from an interrupted scrape
+            }
+        }
+    }
+    const last = new Map<string, number>();
+    items.forEach((item, i) => {
+        const key = exampleKey(item);
+        if (key) last.set(key, i);
+    });
+    return items.filter((item, i) => {
+        const key = exampleKey(item);
+        return key === null || last.get(key) === i;
+    });
+}
+
+export async function loadMasterDataset<T>(read: ReadText): Promise<T[] | null> {
+    const manifestText = await read(MASTER_MANIFEST);
+    if (manifestText) {
+        const manifest: ShardManifest = JSON.parse(manifestText);
+        const files = Object.values(manifest.datasets ?? {})
+            .flatMap(d => (d.shards ?? []).map(s => s.file));
+        const texts = await Promise.all(files.map(read));
+        return mergeShards<T>(texts.filter((t): t is string => t !== null));
+    }
+
+    const views = await Promise.all(MASTER_VIEWS.map(read));
+    if (views.some(v => v !== null)) {
+        return views.flatMap(v => (v === null ? [] : (JSON.parse(v) as T[])));
+    }
+
+    const legacy = await read(LEGACY_MASTER);
+    return legacy === null ? null : JSON.parse(legacy);
+}
+
+// Reader for the browser: files are served from /datasets/
+export const fetchDatasetText: ReadText = async (name) => {
+    const res = await fetch(`/datasets/${name}`);
+    return res.ok ? res.text() : null;
+};